@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Blog.settings")
 
 application = get_asgi_application()
+
+# Write buffered post views on graceful shutdown.
+from webBlog.view_counter import register_exit_flush  # noqa: E402
+
+register_exit_flush()
@@ -46,12 +46,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "webBlog.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "webBlog.middleware.MemoryProfilingMiddleware",
+    "webBlog.middleware.SlowQueryLogMiddleware",
 ]
 
 ROOT_URLCONF = "Blog.urls"
@@ -87,6 +90,181 @@ DATABASES = {
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS=replica1.internal,replica2.internal adds one
+# alias per host with the primary's credentials. Only the views listed in
+# REPLICA_READ_VIEWS read from them (see webBlog/db_routers.py).
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    _alias = f"replica{_index}"
+    DATABASES[_alias] = {
+        **DATABASES["default"],
+        "HOST": _host.strip(),
+        # Tests run against the primary's test database.
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ["webBlog.db_routers.ReplicaRouter"]
+
+REPLICA_READ_VIEWS = [
+    "blog:post_list",
+    "blog:post_detail",
+    "api:api_status",
+    "api:posts_list",
+    "api:post_detail",
+    "api:post_comments",
+]
+# After a successful write the client reads from the primary for this long.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+# A replica that refuses connections is skipped for this long.
+REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', '30'))
+
+
+# Cache
+# Sessions are served from the cache, so production needs a cache shared by
+# all workers: Redis (set REDIS_URL) or, for the workers of a single host,
+# files under CACHE_DIR. The local-memory fallback is for development.
+
+if os.environ.get('REDIS_URL'):
+    _CACHE_BACKEND = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ['REDIS_URL'],
+    }
+elif os.environ.get('CACHE_DIR'):
+    _CACHE_BACKEND = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ['CACHE_DIR'],
+    }
+else:
+    _CACHE_BACKEND = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+
+# "default" keeps hot objects in a per-process LRU in front of "shared" (see
+# webBlog/cache_backends.py). Keys in LOCAL_EXCLUDE are changed in place
+# (namespace versions, pending view counts, stale-while-revalidate pointers
+# and locks) and always read from "shared".
+CACHES = {
+    "default": {
+        "BACKEND": "webBlog.cache_backends.TwoTierCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "LOCAL_TIMEOUT": int(os.environ.get('CACHE_LOCAL_TIMEOUT', '60')),
+            "LOCAL_MAX_ENTRIES": int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', '10000')),
+            "LOCAL_MAX_BYTES": int(os.environ.get('CACHE_LOCAL_MAX_BYTES', str(64 * 1024 * 1024))),
+            "LOCAL_EXCLUDE": ["ns-version:", "post-views:", "swr:", "swr-lock:"],
+        },
+    },
+    "shared": {**_CACHE_BACKEND, "KEY_PREFIX": "blog"},
+    "sessions": {**_CACHE_BACKEND, "KEY_PREFIX": "session"},
+}
+
+
+# Sessions and messages
+# cached_db reads sessions from the cache and only falls back to the
+# django_session table on a miss; "cache" skips the database entirely.
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = "sessions"
+
+# Flash messages live in a signed cookie so that setting one never forces a
+# session write (and anonymous visitors never get a session at all).
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+
+# Lifetime of rendered markdown cached for rows whose stored HTML is outdated
+# (see cached_html() in webBlog/caching.py).
+MARKDOWN_CACHE_TIMEOUT = int(os.environ.get('MARKDOWN_CACHE_TIMEOUT', '86400'))
+
+# Posts per page on the post list (and in the static export).
+POSTS_PER_PAGE = int(os.environ.get('POSTS_PER_PAGE', '20'))
+
+# Largest number of ids accepted by the multi-get endpoint (/api/posts/?ids=),
+# and how long it caches each post.
+API_MULTI_GET_MAX = int(os.environ.get('API_MULTI_GET_MAX', '100'))
+POST_JSON_CACHE_TIMEOUT = int(os.environ.get('POST_JSON_CACHE_TIMEOUT', '300'))
+
+# Post lists and the post API are cached for about VIEW_CACHE_TIMEOUT
+# seconds, and until posts or comments change. For VIEW_CACHE_STALE_TIMEOUT
+# more seconds the previous result is served while one request recomputes
+# it (see cached_or_stale() in webBlog/caching.py). Lifetimes are shortened
+# by up to CACHE_TTL_JITTER of themselves so entries don't expire together.
+VIEW_CACHE_TIMEOUT = int(os.environ.get('VIEW_CACHE_TIMEOUT', '30'))
+VIEW_CACHE_STALE_TIMEOUT = int(os.environ.get('VIEW_CACHE_STALE_TIMEOUT', '300'))
+CACHE_TTL_JITTER = float(os.environ.get('CACHE_TTL_JITTER', '0.1'))
+
+# Unfiltered tables larger than this are counted from pg_class statistics
+# instead of COUNT(*) when paginating (see webBlog/pagination.py).
+ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ESTIMATED_COUNT_THRESHOLD', '100000'))
+
+
+# Comments removed per transaction by webBlog/fast_delete.py
+FAST_DELETE_BATCH_SIZE = int(os.environ.get('FAST_DELETE_BATCH_SIZE', '1000'))
+
+
+# Post view counter (see webBlog/view_counter.py). "local" buffers views in
+# each worker; "cache" shares pending views between workers through CACHES.
+VIEW_COUNT_BUFFER = os.environ.get('VIEW_COUNT_BUFFER', 'local')
+VIEW_COUNT_FLUSH_INTERVAL = float(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', '10'))
+VIEW_COUNT_FLUSH_THRESHOLD = int(os.environ.get('VIEW_COUNT_FLUSH_THRESHOLD', '1000'))
+
+
+# RSS/Atom feeds (see webBlog/feeds.py). Cached feeds are invalidated when
+# posts or comments change; FEED_MAX_AGE is the Cache-Control max-age.
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = int(os.environ.get('FEED_CACHE_TIMEOUT', '86400'))
+FEED_MAX_AGE = int(os.environ.get('FEED_MAX_AGE', '60'))
+# Scheme and host feeds are re-rendered for after each change (must be in
+# ALLOWED_HOSTS); empty renders them on the next poll instead.
+FEED_BASE_URL = os.environ.get('FEED_BASE_URL', '')
+
+
+# sitemap.xml (see webBlog/sitemaps.py). Each section is cached whole, so keep
+# it well below the protocol limit of 50,000 URLs.
+SITEMAP_SECTION_SIZE = int(os.environ.get('SITEMAP_SECTION_SIZE', '10000'))
+SITEMAP_CACHE_TIMEOUT = int(os.environ.get('SITEMAP_CACHE_TIMEOUT', '86400'))
+
+
+# Background tasks for the side effects of saves (see webBlog/tasks.py).
+# TASK_RUNNER "thread" runs them on TASK_WORKERS threads of the process that
+# queued them (0 runs them right after the commit); "worker" leaves them to
+# `python manage.py runtasks`.
+TASK_RUNNER = os.environ.get('TASK_RUNNER', 'thread')
+TASK_WORKERS = int(os.environ.get('TASK_WORKERS', '2'))
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', '5'))
+TASK_RETRY_DELAY = float(os.environ.get('TASK_RETRY_DELAY', '10'))
+# Seconds before a task whose worker died is run again.
+TASK_LOCK_TIMEOUT = int(os.environ.get('TASK_LOCK_TIMEOUT', '300'))
+
+
+# Live comments (see webBlog/comment_stream.py; needs the ASGI app).
+# "local" only reaches watchers in the same process; "redis" fans out through
+# REDIS_URL. Limits are per process.
+COMMENT_STREAM_BACKEND = os.environ.get('COMMENT_STREAM_BACKEND', 'local')
+COMMENT_STREAM_MAX_CONNECTIONS = int(os.environ.get('COMMENT_STREAM_MAX_CONNECTIONS', '5000'))
+COMMENT_STREAM_QUEUE_SIZE = int(os.environ.get('COMMENT_STREAM_QUEUE_SIZE', '50'))
+COMMENT_STREAM_HEARTBEAT = float(os.environ.get('COMMENT_STREAM_HEARTBEAT', '15'))
+COMMENT_STREAM_POLL_TIMEOUT = float(os.environ.get('COMMENT_STREAM_POLL_TIMEOUT', '25'))
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+
+# A comment's weight in the trending sort halves after this many hours.
+# Changing it requires Post.objects.all().refresh_comment_activity().
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '24'))
+
+
+# Slow query log (see webBlog/query_log.py)
+SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'False').lower() in ('true', '1', 'yes')
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100'))
+SLOW_QUERY_STACK_DEPTH = 5
+
+# tracemalloc request sampling (see webBlog/memory_profiling.py)
+MEMORY_PROFILING_ENABLED = os.environ.get('MEMORY_PROFILING_ENABLED', 'False').lower() in ('true', '1', 'yes')
+MEMORY_PROFILING_SAMPLE_RATE = float(os.environ.get('MEMORY_PROFILING_SAMPLE_RATE', '0.01'))
+MEMORY_PROFILING_FRAMES = 10
+MEMORY_PROFILING_TOP_SITES = 10
+MEMORY_SNAPSHOT_DIR = os.environ.get('MEMORY_SNAPSHOT_DIR', str(BASE_DIR / 'memory_snapshots'))
+
 
 # Password validation
 
@@ -134,6 +312,21 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads through /api/media/ (see webBlog/uploads.py). With
+# MEDIA_SENDFILE_HEADER set to "X-Accel-Redirect" (nginx, serving MEDIA_ROOT
+# as an internal location at MEDIA_ACCEL_PREFIX) or "X-Sendfile", the front
+# server sends the files instead of Django.
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Resized variants of local images embedded in posts (see webBlog/images.py;
+# needs Pillow). IMAGE_SIZES is the <img sizes> hint for picking a variant.
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(',')]
+IMAGE_SIZES = os.environ.get('IMAGE_SIZES', '(max-width: 800px) 100vw, 800px')
+# Image metadata kept in memory per process, in entries.
+IMAGE_META_CACHE_SIZE = int(os.environ.get('IMAGE_META_CACHE_SIZE', '1000'))
+
 # Default primary key field type
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
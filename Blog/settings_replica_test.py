@@ -0,0 +1,29 @@
+"""Settings for testing replica routing against real database connections.
+
+Two SQLite aliases, ``default`` and ``replica``; in tests ``replica`` is a
+separate connection to the primary's test database (``TEST.MIRROR``)::
+
+    python manage.py test webBlog.tests.test_db_routers --settings=Blog.settings_replica_test
+"""
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+
+# A file rather than SQLite's in-memory test database, so that each alias
+# opens (and can fail to open) its own connection.
+_DB_PATH = Path(tempfile.gettempdir()) / "blog_replica_test.sqlite3"
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": _DB_PATH,
+        "TEST": {"NAME": _DB_PATH},
+    },
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": _DB_PATH,
+        "TEST": {"MIRROR": "default"},
+    },
+}
+DATABASE_REPLICAS = ["replica"]
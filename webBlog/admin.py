@@ -1,26 +1,176 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from django.utils.text import capfirst
 from .models import Post, Comment
+from .admin_filters import AutocompleteFilter, autocomplete_filter_media
+from .caching import comments_namespace, versioned_key
+from .fast_delete import delete_comments, delete_posts, delete_user
 from .forms import PostForm
+from .pagination import EstimatedCountPaginator
 
 
-class CommentInline(admin.TabularInline):
-    model = Comment
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset that only builds forms for one page of related objects.
+
+    ``per_page``, ``page_param``, ``page_number``, ``query`` (the request's
+    GET parameters) and ``count`` (the number of related objects, or None to
+    count them) are set on the class by ``PaginatedTabularInline.get_formset()``.
+    """
+    per_page = 20
+    page_param = 'page'
+    page_number = 1
+    query = None
+    count = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self.paginator = Paginator(super().get_queryset(), self.per_page)
+            if self.count is not None:
+                self.paginator.count = self.count
+            self.page = self.paginator.get_page(self.page_number)
+            self._queryset = list(self.page.object_list)
+            # Rows render str(obj), which usually refers back to the parent.
+            for obj in self._queryset:
+                setattr(obj, self.fk.name, self.instance)
+        return self._queryset
+
+    def _page_query(self, number):
+        query = self.query.copy() if self.query is not None else QueryDict(mutable=True)
+        query[self.page_param] = number
+        return query.urlencode()
+
+    @property
+    def previous_page_query(self):
+        return self._page_query(self.page.previous_page_number())
+
+    @property
+    def next_page_query(self):
+        return self._page_query(self.page.next_page_number())
+
+
+class PaginatedTabularInline(admin.TabularInline):
+    """Read-only tabular inline that renders one page of rows at a time.
+
+    Set ``editable = True`` to allow changing rows through the inline, and
+    override ``get_count()`` to supply the number of rows without a COUNT.
+    """
+    formset = PaginatedInlineFormSet
+    template = 'admin/webBlog/paginated_tabular.html'
     extra = 0
+    per_page = 20
+    page_param = 'page'
+    editable = False
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_param = self.page_param
+        formset.page_number = request.GET.get(self.page_param, 1)
+        formset.query = request.GET.copy()
+        formset.count = self.get_count(request, obj) if obj is not None else None
+        return formset
+
+    def get_count(self, request, obj):
+        """Number of rows related to ``obj``, or None to COUNT them."""
+        return None
+
+    def has_add_permission(self, request, obj=None):
+        return self.editable and super().has_add_permission(request, obj)
+
+    def has_change_permission(self, request, obj=None):
+        return self.editable and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return self.editable and super().has_delete_permission(request, obj)
+
+
+def summarize_deleted_objects(request, objs, comment_count, post_counts=None):
+    """Build the delete confirmation summary without collecting every comment.
+
+    Args:
+        comment_count (int): comments deleted along with ``objs``.
+        post_counts (dict): ``{obj.pk: posts deleted along with obj}``, for
+            objects whose posts cascade (users).
+
+    Returns the same ``(deleted_objects, model_count, perms_needed, protected)``
+    tuple as ``ModelAdmin.get_deleted_objects()``.
+    """
+    post_counts = post_counts or {}
+    opts = objs[0]._meta if objs else None
+    deleted_objects = []
+    for obj in objs:
+        deleted_objects.append(format_html(
+            '{}: <a href="{}">{}</a>',
+            capfirst(opts.verbose_name),
+            reverse(f'admin:{opts.app_label}_{opts.model_name}_change', args=[obj.pk]),
+            obj,
+        ))
+        if post_counts.get(obj.pk):
+            deleted_objects.append([format_html(
+                '{} {}', post_counts[obj.pk], Post._meta.verbose_name_plural
+            )])
+    if comment_count:
+        deleted_objects.append(format_html(
+            '{} {} (including replies)', comment_count, Comment._meta.verbose_name_plural
+        ))
+    post_count = sum(post_counts.values())
+    model_count = {Comment._meta.verbose_name_plural: comment_count}
+    if post_count:
+        model_count = {Post._meta.verbose_name_plural: post_count, **model_count}
+    if opts is not None:
+        model_count = {opts.verbose_name_plural: len(objs), **model_count}
+    perms_needed = set()
+    if post_count and not request.user.has_perm('webBlog.delete_post'):
+        perms_needed.add(Post._meta.verbose_name)
+    if comment_count and not request.user.has_perm('webBlog.delete_comment'):
+        perms_needed.add(Comment._meta.verbose_name)
+    return deleted_objects, model_count, perms_needed, []
+
+
+class CommentInline(PaginatedTabularInline):
+    model = Comment
+    per_page = 25
+    page_param = 'comments_page'
     readonly_fields = ('author', 'created_at')
-    fields = ('author', 'content', 'created_at')
+    fields = ('author', 'content', 'created_at', 'is_approved')
+    show_change_link = True
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author')
+
+    def get_count(self, request, obj):
+        # Counted once per change to the post's comments rather than per page.
+        key, _ = versioned_key('admin-comment-count', [comments_namespace(obj.pk)], obj.pk)
+        count = cache.get(key)
+        if count is None:
+            count = Comment.objects.filter(post=obj).count()
+            cache.set(key, count, settings.VIEW_CACHE_STALE_TIMEOUT)
+        return count
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     form = PostForm
-    list_display = ('title', 'author', 'created_at', 'comment_count', 'view_on_site')
-    list_filter = ('created_at', 'author')
+    list_display = ('title', 'author', 'created_at', 'comment_count', 'view_count', 'view_on_site')
+    list_filter = ('created_at', ('author', AutocompleteFilter))
+    list_select_related = ('author',)
+    date_hierarchy = 'created_at'
     search_fields = ('title', 'content')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'view_count')
+    autocomplete_fields = ('author',)
     inlines = [CommentInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         (None, {
@@ -50,8 +200,12 @@ class PostAdmin(admin.ModelAdmin):
         }),
     )
     
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self.admin_site)
+    
     def comment_count(self, obj):
-        count = obj.comments.count()
+        count = obj.comment_total
         if count > 0:
             url = reverse('admin:webBlog_comment_changelist')
             return format_html(
@@ -60,6 +214,7 @@ class PostAdmin(admin.ModelAdmin):
             )
         return "0 comments"
     comment_count.short_description = "Comments"
+    comment_count.admin_order_field = 'comment_total'
     
     def view_on_site(self, obj):
         url = reverse('blog:post_detail', args=[obj.pk])
@@ -70,19 +225,109 @@ class PostAdmin(admin.ModelAdmin):
         if not obj.author_id:
             obj.author = request.user
         super().save_model(request, obj, form, change)
+    
+    # Deleting goes through fast_delete so that comments are removed with
+    # batched raw DELETEs instead of being loaded by the collector.
+    
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return summarize_deleted_objects(request, objs, sum(obj.comment_total for obj in objs))
+    
+    def delete_model(self, request, obj):
+        delete_posts(Post.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        delete_posts(queryset)
 
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ('post_link', 'author', 'created_at', 'content_preview', 'view_on_site')
-    list_filter = ('created_at', 'author', 'post')
+    list_display = ('post_link', 'author', 'created_at', 'content_preview', 'is_approved', 'view_on_site')
+    list_filter = ('is_approved', 'created_at', ('author', AutocompleteFilter), ('post', AutocompleteFilter))
+    list_select_related = ('post', 'author')
+    date_hierarchy = 'created_at'
     search_fields = ('content', 'post__title', 'author__username')
     readonly_fields = ('created_at', 'post', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        'approve_comments', 'unapprove_comments',
+        'approve_by_author', 'unapprove_by_author', 'delete_by_author',
+        'approve_on_post', 'unapprove_on_post', 'delete_on_post',
+    ]
+    
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self.admin_site)
+    
+    # Moderation actions. Each one is a single set-based UPDATE (or a batched
+    # fast delete), so "select all" across tens of thousands of rows is fine.
+    
+    def _report(self, request, verb, count):
+        self.message_user(request, f'{count} comment{"s" if count != 1 else ""} {verb}.')
+    
+    def _selected_authors(self, queryset):
+        return Comment.objects.filter(author_id__in=list(queryset.values_list('author_id', flat=True).distinct()))
+    
+    def _selected_posts(self, queryset):
+        return Comment.objects.filter(post_id__in=list(queryset.values_list('post_id', flat=True).distinct()))
+    
+    def approve_comments(self, request, queryset):
+        self._report(request, 'approved', queryset.approve())
+    approve_comments.short_description = "Approve selected comments"
+    approve_comments.allowed_permissions = ('change',)
+    
+    def unapprove_comments(self, request, queryset):
+        self._report(request, 'hidden', queryset.unapprove())
+    unapprove_comments.short_description = "Unapprove selected comments"
+    unapprove_comments.allowed_permissions = ('change',)
+    
+    def approve_by_author(self, request, queryset):
+        self._report(request, 'approved', self._selected_authors(queryset).approve())
+    approve_by_author.short_description = "Approve everything by the selected comments' authors"
+    approve_by_author.allowed_permissions = ('change',)
+    
+    def unapprove_by_author(self, request, queryset):
+        self._report(request, 'hidden', self._selected_authors(queryset).unapprove())
+    unapprove_by_author.short_description = "Unapprove everything by the selected comments' authors"
+    unapprove_by_author.allowed_permissions = ('change',)
+    
+    def delete_by_author(self, request, queryset):
+        self._report(request, 'deleted', delete_comments(self._selected_authors(queryset)))
+    delete_by_author.short_description = "Delete everything by the selected comments' authors"
+    delete_by_author.allowed_permissions = ('delete',)
+    
+    def approve_on_post(self, request, queryset):
+        self._report(request, 'approved', self._selected_posts(queryset).approve())
+    approve_on_post.short_description = "Approve everything on the selected comments' posts"
+    approve_on_post.allowed_permissions = ('change',)
+    
+    def unapprove_on_post(self, request, queryset):
+        self._report(request, 'hidden', self._selected_posts(queryset).unapprove())
+    unapprove_on_post.short_description = "Unapprove everything on the selected comments' posts"
+    unapprove_on_post.allowed_permissions = ('change',)
+    
+    def delete_on_post(self, request, queryset):
+        self._report(request, 'deleted', delete_comments(self._selected_posts(queryset)))
+    delete_on_post.short_description = "Delete everything on the selected comments' posts"
+    delete_on_post.allowed_permissions = ('delete',)
+    
+    def get_deleted_objects(self, objs, request):
+        count = len(objs) if isinstance(objs, list) else objs.count()
+        deleted_objects = [format_html('{} {} and their replies', count, Comment._meta.verbose_name_plural)]
+        return deleted_objects, {Comment._meta.verbose_name_plural: count}, set(), []
+    
+    def delete_model(self, request, obj):
+        delete_comments(Comment.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        delete_comments(queryset)
     
     def post_link(self, obj):
-        url = reverse('admin:webBlog_post_change', args=[obj.post.pk])
+        url = reverse('admin:webBlog_post_change', args=[obj.post_id])
         return format_html('<a href="{}">{}</a>', url, obj.post.title)
     post_link.short_description = "Post"
+    post_link.admin_order_field = 'post__title'
     
     def content_preview(self, obj):
         content = obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
@@ -90,9 +335,38 @@ class CommentAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Content Preview'
     
     def view_on_site(self, obj):
-        url = reverse('blog:post_detail', args=[obj.post.pk])
+        url = reverse('blog:post_detail', args=[obj.post_id])
         return format_html('<a href="{}#comment-{}" target="_blank">View on site</a>', url, obj.id)
     view_on_site.short_description = "View"
     
     def has_add_permission(self, request):
-        return False
\ No newline at end of file
+        return False
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class BlogUserAdmin(UserAdmin):
+    """Django's UserAdmin with the fast comment-deleting path"""
+    
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        comment_count = Comment.objects.filter(
+            Q(author__in=objs) | Q(post__author__in=objs)
+        ).count()
+        post_counts = dict(
+            Post.objects.filter(author__in=objs)
+            .order_by()
+            .values('author')
+            .annotate(total=Count('pk'))
+            .values_list('author', 'total')
+        )
+        return summarize_deleted_objects(request, objs, comment_count, post_counts)
+    
+    def delete_model(self, request, obj):
+        delete_user(obj)
+    
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            delete_user(user)
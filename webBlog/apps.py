@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WebblogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "webBlog"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,311 @@
+"""A two-tier cache: a bounded in-process LRU in front of a shared cache.
+
+``TwoTierCache`` is configured as the ``default`` cache with ``LOCATION``
+naming the alias of the shared cache (Redis, files or, in development and
+tests, local memory). Reads are answered from the process's own LRU when
+they can, and otherwise from the shared cache, whose answer is kept locally
+for ``LOCAL_TIMEOUT`` seconds at most. Writes go to both tiers.
+
+Invalidation across processes relies on the key scheme of
+``webBlog/caching.py``. Almost everything cached is stored under a
+versioned or content-addressed key that is never overwritten with different
+content, so a local copy can't go stale. The few keys that are changed in
+place, namespace versions and pending view counts, are listed in
+``LOCAL_EXCLUDE`` and always read from the shared cache. Deleting, clearing
+or incrementing any other key also changes an epoch stored in the shared
+cache. Every process checks the epoch at most every ``SYNC_INTERVAL``
+seconds and empties its LRU when it has changed.
+
+The LRU holds pickled values, like Django's local-memory cache, so callers
+can't modify each other's copies. It is limited to ``LOCAL_MAX_ENTRIES``
+entries and ``LOCAL_MAX_BYTES`` pickled bytes. Values bigger than
+``LOCAL_MAX_ITEM_BYTES`` stay in the shared tier only. ``stats()`` counts
+hits and misses per tier for the whole process.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+EPOCH_KEY = 'two-tier-epoch'
+
+_MISSING = object()
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """Process-wide LRU of pickled values with per-entry expiry."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._data = OrderedDict()
+        self._bytes = 0
+        self.epoch = None
+        self.next_sync = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = self.flushes = 0
+        self.shared_hits = self.shared_misses = 0
+
+    def get(self, key):
+        """Return the pickled value for ``key``, or None."""
+        with self.lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, pickled, expires_at):
+        with self.lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, pickled)
+            self._bytes += len(pickled)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self, flush=False):
+        with self.lock:
+            self._data.clear()
+            self._bytes = 0
+            if flush:
+                self.flushes += 1
+
+    def count_shared(self, hits, misses):
+        with self.lock:
+            self.shared_hits += hits
+            self.shared_misses += misses
+
+    def _remove(self, key):
+        self._bytes -= len(self._data.pop(key)[1])
+
+    def stats(self):
+        with self.lock:
+            return {
+                'local': {
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'entries': len(self._data),
+                    'bytes': self._bytes,
+                    'evictions': self.evictions,
+                    'flushes': self.flushes,
+                },
+                'shared': {'hits': self.shared_hits, 'misses': self.shared_misses},
+            }
+
+
+def _tier(location, max_entries, max_bytes):
+    # Django creates cache instances per thread; the LRU is per process.
+    with _tiers_lock:
+        if location not in _tiers:
+            _tiers[location] = LocalTier(max_entries, max_bytes)
+        return _tiers[location]
+
+
+class TwoTierCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._max_item_bytes = options.get('LOCAL_MAX_ITEM_BYTES', 1024 * 1024)
+        self._exclude = tuple(options.get('LOCAL_EXCLUDE', ()))
+        self._sync_interval = options.get('SYNC_INTERVAL', 1.0)
+        self._tier = _tier(
+            location, options.get('LOCAL_MAX_ENTRIES', 10000), options.get('LOCAL_MAX_BYTES', 64 * 1024 * 1024)
+        )
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _shared_version(self, version):
+        return self.version if version is None else version
+
+    def _cacheable(self, key):
+        return not key.startswith(self._exclude)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _keep(self, key, version, value, timeout):
+        """Store ``value`` locally for up to LOCAL_TIMEOUT (and ``timeout``) seconds."""
+        local_key = self.make_key(key, version)
+        if not self._cacheable(key) or (timeout is not None and timeout <= 0):
+            self._tier.delete(local_key)
+            return
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        if len(pickled) > self._max_item_bytes:
+            self._tier.delete(local_key)
+            return
+        ttl = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        self._tier.set(local_key, pickled, time.monotonic() + ttl)
+
+    def _sync(self):
+        """Empty the LRU if another process changed the epoch."""
+        tier = self._tier
+        now = time.monotonic()
+        if now < tier.next_sync:
+            return
+        tier.next_sync = now + self._sync_interval
+        epoch = self.shared.get(EPOCH_KEY)
+        if epoch is None:
+            epoch = uuid.uuid4().hex
+            if not self.shared.add(EPOCH_KEY, epoch, timeout=None):
+                epoch = self.shared.get(EPOCH_KEY, epoch)
+        if epoch != tier.epoch:
+            if tier.epoch is not None:
+                tier.clear(flush=True)
+            tier.epoch = epoch
+
+    def _invalidate_everywhere(self):
+        epoch = uuid.uuid4().hex
+        self.shared.set(EPOCH_KEY, epoch, timeout=None)
+        self._tier.clear()
+        self._tier.epoch = epoch
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._cacheable(key):
+            self._sync()
+            pickled = self._tier.get(local_key)
+            if pickled is not None:
+                return pickle.loads(pickled)
+        value = self.shared.get(key, _MISSING, version=self._shared_version(version))
+        if value is _MISSING:
+            self._tier.count_shared(0, 1)
+            return default
+        self._tier.count_shared(1, 0)
+        self._keep(key, version, value, self._local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        synced = False
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            pickled = None
+            if self._cacheable(key):
+                if not synced:
+                    self._sync()
+                    synced = True
+                pickled = self._tier.get(local_key)
+            if pickled is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(pickled)
+        if missing:
+            shared = self.shared.get_many(missing, version=self._shared_version(version))
+            self._tier.count_shared(len(shared), len(missing) - len(shared))
+            for key, value in shared.items():
+                self._keep(key, version, value, self._local_timeout)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        self.shared.set(key, value, timeout, version=self._shared_version(version))
+        self._keep(key, version, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.shared.set_many(data, timeout, version=self._shared_version(version))
+        for key, value in data.items():
+            if key not in failed:
+                self._keep(key, version, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout, version=self._shared_version(version))
+        if added:
+            self._keep(key, version, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._tier.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, self._timeout(timeout), version=self._shared_version(version))
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._cacheable(key):
+            self._sync()
+            if self._tier.get(local_key) is not None:
+                return True
+        return self.shared.has_key(key, version=self._shared_version(version))
+
+    def delete(self, key, version=None):
+        self.make_and_validate_key(key, version=version)
+        deleted = self.shared.delete(key, version=self._shared_version(version))
+        self._changed([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=self._shared_version(version))
+        self._changed(keys, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.make_and_validate_key(key, version=version)
+        value = self.shared.incr(key, delta, version=self._shared_version(version))
+        self._changed([key], version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def _changed(self, keys, version):
+        """Drop ``keys`` here, and everywhere if other processes may hold them."""
+        if any(self._cacheable(key) for key in keys):
+            self._invalidate_everywhere()
+        else:
+            for key in keys:
+                self._tier.delete(self.make_key(key, version))
+
+    def clear(self):
+        self.shared.clear()
+        self._invalidate_everywhere()
+
+    def stats(self):
+        """Hit and miss counts of both tiers for this process."""
+        return self._tier.stats()
+
+    def reset_stats(self):
+        with self._tier.lock:
+            self._tier.reset_stats()
+
+
+def cache_stats():
+    """``{alias: stats}`` for every two-tier cache configured."""
+    from django.conf import settings
+
+    return {
+        alias: caches[alias].stats()
+        for alias, config in settings.CACHES.items()
+        if config['BACKEND'] == f'{__name__}.TwoTierCache'
+    }
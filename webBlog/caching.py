@@ -0,0 +1,266 @@
+"""Versioned cache namespaces and cached markdown rendering.
+
+Cached pages are keyed on the version of every namespace they depend on
+(``POSTS`` for anything listing posts, ``POST_STATS`` for the comment counts
+and activity that order and annotate post lists,
+``comments_namespace(post_id)`` for a post's comments). Changing the data only needs ``bump(namespace)``, which
+makes every dependent key unreachable without having to know or delete them;
+the stale entries simply expire. Each version also records when it was
+created, which serves as ``Last-Modified`` for conditional GETs.
+
+The signal handlers in ``webBlog/signals.py`` bump namespaces on model
+saves and deletes; bulk paths that bypass signals call ``bump`` themselves.
+
+``cached_or_stale()`` caches expensive results without stampedes. When an
+entry has expired or its namespaces were bumped, one caller recomputes it
+while every other caller is served the previous result. Threads of one
+process that miss the same key together wait for a single computation, and
+freshness lifetimes are jittered so entries filled together don't all expire
+together.
+"""
+import hashlib
+import logging
+import pickle
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .templatetags.markdown_extras import MARKDOWN_VERSION
+
+logger = logging.getLogger(__name__)
+
+POSTS = 'posts'
+POST_STATS = 'post-stats'
+
+VERSION_KEY_PREFIX = 'ns-version'
+# Entries of cached_or_stale(): a pointer that is overwritten on refresh, a
+# lock, and immutable bodies. The first two are changed in place (see
+# LOCAL_EXCLUDE in settings.CACHES).
+POINTER_KEY_PREFIX = 'swr'
+LOCK_KEY_PREFIX = 'swr-lock'
+BODY_KEY_PREFIX = 'swr-body'
+# Seconds a recomputation may hold the lock, and that callers without
+# anything to serve wait for another process to finish one.
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def comments_namespace(post_id):
+    return f'comments:{post_id}'
+
+
+def _version_key(namespace):
+    return f'{VERSION_KEY_PREFIX}:{namespace}'
+
+
+def _new_version():
+    return uuid.uuid4().hex, time.time()
+
+
+def bump(*namespaces):
+    """Invalidate everything cached under ``namespaces``."""
+    cache.set_many({_version_key(namespace): _new_version() for namespace in namespaces}, timeout=None)
+
+
+def versions(*namespaces):
+    """Return ``{namespace: (version, modified_timestamp)}``.
+
+    A namespace without a version (new, or evicted from the cache) gets a
+    fresh one, so whatever was cached under its old version is not reused.
+    """
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    missing = {key: _new_version() for key in keys if key not in found}
+    for key, version in missing.items():
+        if not cache.add(key, version, timeout=None):
+            # Another process created it first.
+            version = cache.get(key, version)
+        found[key] = version
+    return {keys[key]: found[key] for key in keys}
+
+
+def versioned_key(prefix, namespaces, *parts):
+    """Cache key for ``parts`` that changes whenever a namespace is bumped.
+
+    Returns:
+        tuple: ``(key, last_modified_timestamp)``
+    """
+    current = versions(*namespaces)
+    digest = hashlib.sha1(
+        '|'.join([*map(str, parts), *(current[namespace][0] for namespace in namespaces)]).encode()
+    ).hexdigest()
+    return f'{prefix}:{digest}', max(modified for _, modified in current.values())
+
+
+def versioned_keys(prefix, namespaces_by_item, *parts):
+    """``versioned_key()`` for many items, reading every version at once.
+
+    Args:
+        namespaces_by_item (dict): ``{item: [namespace, ...]}``.
+
+    Returns:
+        dict: ``{item: key}``
+    """
+    current = versions(*{namespace for namespaces in namespaces_by_item.values() for namespace in namespaces})
+    keys = {}
+    for item, namespaces in namespaces_by_item.items():
+        digest = hashlib.sha1(
+            '|'.join([str(item), *map(str, parts), *(current[namespace][0] for namespace in namespaces)]).encode()
+        ).hexdigest()
+        keys[item] = f'{prefix}:{digest}'
+    return keys
+
+
+def cached_html(text, render, timeout=None):
+    """Return ``render(text)``, cached by the text's content hash.
+
+    ``render`` must return safe HTML, such as the markdown filters in
+    ``templatetags/markdown_extras.py``. The key changes with the text
+    itself and with ``MARKDOWN_VERSION``, so edits never need invalidating.
+    Entries live for ``timeout`` seconds, by default
+    ``settings.MARKDOWN_CACHE_TIMEOUT``, so HTML that depends on more than
+    the text (such as image dimensions) is eventually rendered again.
+    """
+    if not text:
+        return render(text)
+    key = f'html:{MARKDOWN_VERSION}:{render.__name__}:{hashlib.sha1(text.encode()).hexdigest()}'
+    html = cache.get(key)
+    if html is None:
+        html = render(text)
+        cache.set(key, str(html), settings.MARKDOWN_CACHE_TIMEOUT if timeout is None else timeout)
+    return mark_safe(html)
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def single_flight(key, compute):
+    """Return ``compute()``, run once at a time per ``key`` in this process.
+
+    Threads that ask for a key while it is being computed wait for that
+    computation and share its result (or exception).
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    try:
+        flight.value = compute()
+        return flight.value
+    except BaseException as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def jittered(timeout):
+    """``timeout`` shortened by up to ``CACHE_TTL_JITTER`` of itself."""
+    return timeout * (1 - random.uniform(0, settings.CACHE_TTL_JITTER))
+
+
+def _store(pointer_key, token, value, timeout, stale_timeout):
+    # Bodies are never overwritten, so the in-process cache tier may keep them.
+    body_key = f'{BODY_KEY_PREFIX}:{uuid.uuid4().hex}'
+    cache.set(body_key, (value,), timeout + stale_timeout)
+    cache.set(pointer_key, (token, time.time() + jittered(timeout), body_key), timeout + stale_timeout)
+
+
+def _recompute(pointer_key, lock_key, token, compute, timeout, stale_timeout):
+    try:
+        value = compute()
+        _store(pointer_key, token, value, timeout, stale_timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def _cached_entry(pointer_key):
+    """Return ``(token, fresh_until, value)``, or None."""
+    entry = cache.get(pointer_key)
+    if entry is None:
+        return None
+    body = cache.get(entry[2])
+    if body is None:
+        return None
+    return entry[0], entry[1], body[0]
+
+
+def cached_or_stale(prefix, namespaces, compute, *parts, timeout=None, stale_timeout=None):
+    """Return ``compute()``, cached for ``parts`` until a namespace is bumped.
+
+    A result is fresh for about ``timeout`` seconds (jittered) and until one
+    of ``namespaces`` is bumped. After that it may be served stale for
+    ``stale_timeout`` more seconds: the first caller to take the lock
+    recomputes it, and callers arriving meanwhile get the stale result. If
+    the recomputation fails, the error is logged and the stale result
+    returned as well.
+    Callers with nothing cached compute once per process, waiting up to
+    ``LOCK_WAIT`` seconds for another process already computing it.
+
+    Args:
+        compute: callable returning a picklable value (None included).
+        timeout (float): defaults to ``settings.VIEW_CACHE_TIMEOUT``.
+        stale_timeout (float): defaults to
+            ``settings.VIEW_CACHE_STALE_TIMEOUT``.
+    """
+    timeout = settings.VIEW_CACHE_TIMEOUT if timeout is None else timeout
+    stale_timeout = settings.VIEW_CACHE_STALE_TIMEOUT if stale_timeout is None else stale_timeout
+    token, _ = versioned_key(prefix, namespaces, *parts)
+    digest = hashlib.sha1('|'.join([prefix, *map(str, parts)]).encode()).hexdigest()
+    pointer_key = f'{POINTER_KEY_PREFIX}:{prefix}:{digest}'
+    lock_key = f'{LOCK_KEY_PREFIX}:{prefix}:{digest}'
+
+    entry = _cached_entry(pointer_key)
+    if entry is not None:
+        entry_token, fresh_until, value = entry
+        if entry_token == token and fresh_until > time.time():
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            # Someone else is refreshing it.
+            return value
+        try:
+            return _recompute(pointer_key, lock_key, token, compute, timeout, stale_timeout)
+        except Exception:
+            logger.exception('Could not refresh %s, serving the stale value', pointer_key)
+            return value
+
+    def fill():
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                # The other computation is taking too long; do our own.
+                value = compute()
+                _store(pointer_key, token, value, timeout, stale_timeout)
+                return value
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = _cached_entry(pointer_key)
+            if entry is not None and entry[0] == token:
+                return entry[2]
+        return _recompute(pointer_key, lock_key, token, compute, timeout, stale_timeout)
+
+    # Threads sharing the computation each get their own copy, as from the cache.
+    return pickle.loads(single_flight(pointer_key, lambda: pickle.dumps(fill(), pickle.HIGHEST_PROTOCOL)))
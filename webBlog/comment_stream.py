@@ -0,0 +1,317 @@
+"""Live comments for post pages: Server-Sent Events with a long-poll fallback.
+
+Readers of a post subscribe to ``/post/<pk>/comments/stream/`` (an
+``EventSource``) or, where SSE isn't available, call
+``/post/<pk>/comments/poll/?after=<id>`` in a loop. Both are async views and
+need the ASGI application (``Blog/asgi.py``); under WSGI a stream would never
+end and hold a worker thread, so they answer 501 there and post pages leave
+the live comments script out (see ``live_comments_available()``).
+
+Newly created approved comments are published once, after their transaction
+commits, to the configured backend:
+
+* ``'local'`` hands them straight to this process's ``hub``; enough for a
+  single worker, development and tests.
+* ``'redis'`` publishes them on a Redis channel. Each process keeps a single
+  subscription for all posts and feeds its own ``hub``, so watchers cost no
+  database or Redis work of their own.
+
+The hub keeps one small bounded queue per watcher. A watcher that falls
+``COMMENT_STREAM_QUEUE_SIZE`` events behind is sent an ``overflow`` event
+and disconnected rather than buffered without limit; browsers reconnect with
+``Last-Event-ID`` and catch up with one query. Streams send a heartbeat
+comment every ``COMMENT_STREAM_HEARTBEAT`` seconds to keep proxies from
+closing idle connections, and each process accepts at most
+``COMMENT_STREAM_MAX_CONNECTIONS`` watchers, answering 503 beyond that.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .models import Comment, Post
+from .streaming import is_asgi
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'comment-stream:'
+# Milliseconds browsers wait before reconnecting.
+RETRY_MS = 3000
+# Comments sent to a reconnecting client at most.
+BACKLOG_LIMIT = 100
+
+_OVERFLOW = object()
+
+
+def comment_event(comment):
+    """The JSON-ready payload sent to watchers for ``comment``."""
+    return {
+        'id': comment.pk,
+        'post_id': comment.post_id,
+        'parent_id': comment.parent_id,
+        'author': comment.author.username,
+        'content': comment.content,
+        'content_html': str(comment.rendered_content()),
+        'created_at': comment.created_at.isoformat(),
+    }
+
+
+class Subscription:
+    """One watcher of one post, owned by the event loop serving it."""
+
+    __slots__ = ('post_id', 'loop', 'queue')
+
+    def __init__(self, post_id, loop, size):
+        self.post_id = post_id
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def deliver(self, event):
+        """Queue ``event``; called on ``loop``."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow: drop what is queued and tell the client to reconnect.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+
+
+class Hub:
+    """In-process fan-out from published comments to the post's watchers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._count = 0
+
+    @property
+    def connection_count(self):
+        return self._count
+
+    def has_capacity(self):
+        return self._count < settings.COMMENT_STREAM_MAX_CONNECTIONS
+
+    def subscribe(self, post_id):
+        """Watch ``post_id`` from the running event loop; None when full."""
+        subscription = Subscription(post_id, asyncio.get_running_loop(), settings.COMMENT_STREAM_QUEUE_SIZE)
+        with self._lock:
+            if self._count >= settings.COMMENT_STREAM_MAX_CONNECTIONS:
+                return None
+            self._subscriptions.setdefault(post_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            watchers = self._subscriptions.get(subscription.post_id)
+            if watchers is None or subscription not in watchers:
+                return
+            watchers.discard(subscription)
+            if not watchers:
+                del self._subscriptions[subscription.post_id]
+            self._count -= 1
+
+    def dispatch(self, post_id, event):
+        """Deliver ``event`` to every watcher of ``post_id``; callable from any thread."""
+        with self._lock:
+            watchers = list(self._subscriptions.get(post_id, ()))
+        for subscription in watchers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The watcher's loop has been closed.
+                self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """Delivers comments to watchers in this process only."""
+
+    def publish(self, post_id, event):
+        hub.dispatch(post_id, event)
+
+    async def ensure_listening(self):
+        pass
+
+
+class RedisBackend:
+    """Fans comments out to every process through Redis pub/sub."""
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self._listener = None
+
+    def publish(self, post_id, event):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(f'{CHANNEL_PREFIX}{post_id}', json.dumps(event))
+
+    async def ensure_listening(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        post_id = int(message['channel'].rsplit(b':', 1)[-1])
+                        hub.dispatch(post_id, json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Comment stream subscription failed; reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+_backends = {}
+
+
+def get_backend():
+    name = settings.COMMENT_STREAM_BACKEND
+    if name not in _backends:
+        if name == 'redis':
+            _backends[name] = RedisBackend(settings.REDIS_URL)
+        else:
+            _backends[name] = LocalBackend()
+    return _backends[name]
+
+
+def publish_comment(comment):
+    """Send a new comment to its post's watchers; never fails the caller."""
+    try:
+        get_backend().publish(comment.post_id, comment_event(comment))
+    except Exception:
+        logger.exception('Could not publish comment %s', comment.pk)
+
+
+def _comments_after(post_id, after):
+    comments = (
+        Comment.objects.approved().filter(post_id=post_id, pk__gt=after)
+        .select_related('author').order_by('pk')[:BACKLOG_LIMIT]
+    )
+    return [comment_event(comment) for comment in comments]
+
+
+def _parse_id(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _sse(event):
+    return f"id: {event['id']}\nevent: comment\ndata: {json.dumps(event)}\n\n"
+
+
+def live_comments_available(request):
+    """Whether ``request`` is served by the ASGI application."""
+    return is_asgi(request)
+
+
+def _unavailable():
+    return HttpResponse('Too many live connections', status=503, headers={'Retry-After': '30'})
+
+
+def _not_implemented():
+    return HttpResponse('Live comments need the ASGI server', status=501)
+
+
+async def _stream(post_id, last_id):
+    subscription = hub.subscribe(post_id)
+    if subscription is None:
+        yield 'event: overflow\ndata: {}\n\n'
+        return
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        # Subscribed first, so nothing published meanwhile is missed.
+        if last_id is not None:
+            for event in await sync_to_async(_comments_after)(post_id, last_id):
+                last_id = event['id']
+                yield _sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.COMMENT_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'
+                continue
+            if event is _OVERFLOW:
+                yield 'event: overflow\ndata: {}\n\n'
+                return
+            if last_id is None or event['id'] > last_id:
+                yield _sse(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@require_GET
+async def comment_stream(request, pk):
+    if not live_comments_available(request):
+        return _not_implemented()
+    if not await Post.objects.filter(pk=pk).aexists():
+        raise Http404('No such post')
+    if not hub.has_capacity():
+        return _unavailable()
+    await get_backend().ensure_listening()
+    # Reconnects send Last-Event-ID; pages pass the newest comment they show.
+    last_id = _parse_id(request.headers.get('Last-Event-ID', request.GET.get('after')))
+    response = StreamingHttpResponse(_stream(pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def comment_poll(request, pk):
+    """Long poll: comments after ``?after=<id>``, waiting up to ``?timeout=`` seconds for one."""
+    if not live_comments_available(request):
+        return _not_implemented()
+    after = _parse_id(request.GET.get('after', 0))
+    if after is None:
+        return JsonResponse({'error': 'after must be a comment id'}, status=400)
+    try:
+        timeout = min(float(request.GET.get('timeout', settings.COMMENT_STREAM_POLL_TIMEOUT)),
+                      settings.COMMENT_STREAM_POLL_TIMEOUT)
+    except ValueError:
+        timeout = settings.COMMENT_STREAM_POLL_TIMEOUT
+    if not await Post.objects.filter(pk=pk).aexists():
+        raise Http404('No such post')
+    await get_backend().ensure_listening()
+    subscription = hub.subscribe(pk)
+    if subscription is None:
+        return _unavailable()
+    try:
+        comments = await sync_to_async(_comments_after)(pk, after)
+        if not comments and timeout > 0:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                event = None
+            if event is not None and event is not _OVERFLOW and event['id'] > after:
+                comments = [event]
+    finally:
+        hub.unsubscribe(subscription)
+    return JsonResponse({
+        'comments': comments,
+        'last_id': comments[-1]['id'] if comments else after,
+    })
@@ -0,0 +1,139 @@
+"""Send read-only page and API traffic to database replicas.
+
+Reads are only routed to a replica while a request for one of the views in
+``REPLICA_READ_VIEWS`` is being handled (see ``ReplicaRoutingMiddleware``);
+everything else, including management commands, migrations and any query
+inside a write request, goes to ``default``. After a successful write the
+client is pinned to the primary for ``REPLICA_PIN_SECONDS`` with a cookie, so
+users always see their own new posts and comments even if the replica lags.
+
+A replica that fails to connect is skipped for
+``REPLICA_RETRY_SECONDS``; if none is available reads fall back to the
+primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE_NAME = 'db_pin'
+
+# Alias serving reads for the current request, or None to use the primary.
+_read_alias = ContextVar('webBlog_read_alias', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+class ReplicaHealth:
+    """Track replicas that recently failed to connect.
+
+    Args:
+        retry_seconds (float): how long a failed replica is skipped; defaults
+            to ``settings.REPLICA_RETRY_SECONDS``.
+    """
+
+    def __init__(self, retry_seconds=None):
+        self._retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._down_until = {}
+
+    @property
+    def retry_seconds(self):
+        if self._retry_seconds is not None:
+            return self._retry_seconds
+        return getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+
+    def is_down(self, alias):
+        with self._lock:
+            return self._down_until.get(alias, 0) > time.monotonic()
+
+    def mark_down(self, alias):
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + self.retry_seconds
+        logger.warning('Database replica %r is unavailable, reading from the primary', alias)
+
+    def check(self, alias):
+        """Return True if ``alias`` accepts connections, marking it down if not."""
+        if self.is_down(alias):
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except Exception:
+            self.mark_down(alias)
+            return False
+        return True
+
+    def choose(self, aliases):
+        """Return a random healthy alias from ``aliases``, or None."""
+        candidates = list(aliases)
+        random.shuffle(candidates)
+        for alias in candidates:
+            if self.check(alias):
+                return alias
+        return None
+
+    def reset(self):
+        with self._lock:
+            self._down_until.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def route_reads(alias):
+    """Send reads in the current context to ``alias`` (None for the primary).
+
+    Returns a token for ``restore_reads``.
+    """
+    return _read_alias.set(alias)
+
+
+def restore_reads(token):
+    _read_alias.reset(token)
+
+
+class use_replica:
+    """Context manager routing reads inside it to a replica, for scripts::
+
+        with use_replica():
+            Post.objects.count()
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias
+
+    def __enter__(self):
+        alias = self.alias or replica_health.choose(replica_aliases())
+        self._token = route_reads(alias)
+        return alias
+
+    def __exit__(self, *exc_info):
+        restore_reads(self._token)
+
+
+class ReplicaRouter:
+    """Database router: writes to ``default``, reads to the request's replica."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
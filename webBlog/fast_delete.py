@@ -0,0 +1,113 @@
+"""Batched deletes for posts and users with many comments.
+
+Django's deletion collector loads every related ``Comment`` (and, through the
+self-referencing ``parent`` key, every reply) into Python before deleting
+anything, all inside one long transaction. The helpers here delete comments
+with raw ``DELETE ... WHERE id IN (...)`` statements in chunks, each in its
+own short transaction, replies before their parents, and then let the
+collector delete the now comment-free post or user.
+"""
+from django.conf import settings
+from django.db import router, transaction
+
+from .caching import POST_STATS, bump, comments_namespace
+from .models import Comment, Post
+
+
+def _batch_size(batch_size):
+    if batch_size is None:
+        batch_size = getattr(settings, 'FAST_DELETE_BATCH_SIZE', 1000)
+    return batch_size
+
+
+def _with_replies(ids, using):
+    """Return ``ids`` plus all descendant reply ids, deepest level first."""
+    levels = [list(ids)]
+    while levels[-1]:
+        levels.append(list(
+            Comment.objects.using(using).filter(parent_id__in=levels[-1]).values_list('pk', flat=True)
+        ))
+    levels.pop()
+    return levels[::-1]
+
+
+def delete_comments(queryset, batch_size=None, progress=None):
+    """Delete the comments in ``queryset`` and all of their replies.
+
+    Args:
+        queryset: comments to delete.
+        batch_size (int): comments per transaction; defaults to
+            ``settings.FAST_DELETE_BATCH_SIZE``.
+        progress: optional callable receiving the running total of deleted
+            rows after each batch.
+
+    Returns:
+        int: number of comment rows deleted, replies included.
+    """
+    batch_size = _batch_size(batch_size)
+    using = router.db_for_write(Comment)
+    queryset = queryset.using(using).order_by('-pk')
+    deleted = 0
+    while True:
+        # Newest first, so that replies in the same batch usually come
+        # before the comments they answer.
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic(using=using):
+            levels = _with_replies(ids, using)
+            all_ids = [pk for level in levels for pk in level]
+            post_ids = set()
+            approved_times = {}
+            for post_id, created_at, is_approved in (
+                Comment.objects.using(using).filter(pk__in=all_ids).values_list('post_id', 'created_at', 'is_approved')
+            ):
+                post_ids.add(post_id)
+                if is_approved:
+                    approved_times.setdefault(post_id, []).append(created_at)
+            for level in levels:
+                for start in range(0, len(level), batch_size):
+                    chunk = level[start:start + batch_size]
+                    deleted += Comment.objects.using(using).filter(pk__in=chunk)._raw_delete(using)
+            Post.objects.using(using).remove_comment_activity(approved_times)
+        bump(POST_STATS, *map(comments_namespace, post_ids))
+        if progress is not None:
+            progress(deleted)
+    return deleted
+
+
+def delete_posts(queryset, batch_size=None, progress=None):
+    """Delete posts after removing their comments in batches.
+
+    Returns:
+        tuple: ``(posts_deleted, comments_deleted)``
+    """
+    using = router.db_for_write(Post)
+    post_ids = list(queryset.using(using).values_list('pk', flat=True))
+    comments_deleted = delete_comments(
+        Comment.objects.filter(post_id__in=post_ids), batch_size=batch_size, progress=progress
+    )
+    posts_deleted, _ = Post.objects.using(using).filter(pk__in=post_ids).delete()
+    return posts_deleted, comments_deleted
+
+
+def delete_user(user, batch_size=None, progress=None):
+    """Delete ``user`` after removing their comments and their posts' comments.
+
+    Returns:
+        int: number of comment rows deleted.
+    """
+    comments_deleted = delete_comments(
+        Comment.objects.filter(author=user), batch_size=batch_size, progress=progress
+    )
+
+    def offset_progress(count):
+        progress(comments_deleted + count)
+
+    comments_deleted += delete_comments(
+        Comment.objects.filter(post__author=user),
+        batch_size=batch_size,
+        progress=offset_progress if progress is not None else None,
+    )
+    user.delete()
+    return comments_deleted
@@ -0,0 +1,216 @@
+"""Column-level serialization for the JSON list and comment endpoints.
+
+Building a ``Post`` instance per row (and following ``post.author`` for the
+username) costs far more than the few columns the endpoints return. These
+serializers read tuples with ``values_list()``, join the author's username in
+the same query, shorten post previews in the database, format the datetime
+columns of a whole page in one pass and turn rows into dicts with a single
+``zip`` each.
+
+``?fields=`` and ``?include=`` narrow this further (see ``Selection``):
+unrequested columns are left out of the SELECT, and the author and comments
+are only queried when asked for.
+
+Responses are encoded with orjson when it is installed, and with the
+standard library encoder otherwise.
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Substr
+from django.http import HttpResponse
+
+from .caching import comments_namespace, versioned_keys
+from .models import Comment, Post
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PREVIEW_LENGTH = 200
+
+# Field name -> column or expression, in response order.
+POST_COLUMNS = {
+    'id': 'id',
+    'title': 'title',
+    'content': 'content',
+    'author': F('author__username'),
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'comment_count': 'comment_total',
+    'view_count': 'view_count',
+}
+# Lists return a preview: one character more than PREVIEW_LENGTH, to know
+# whether to add '...'.
+POST_LIST_COLUMNS = {**POST_COLUMNS, 'content': Substr('content', 1, PREVIEW_LENGTH + 1)}
+COMMENT_COLUMNS = {
+    'id': 'id',
+    'author': F('author__username'),
+    'content': 'content',
+    'created_at': 'created_at',
+    'is_approved': 'is_approved',
+}
+DATETIME_FIELDS = {'created_at', 'updated_at'}
+INCLUDES = ('comments', 'author')
+
+
+class FieldSelectionError(ValueError):
+    pass
+
+
+def _parse_names(value, choices, parameter):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in choices]
+    if unknown:
+        raise FieldSelectionError(
+            f"Unknown {parameter}: {', '.join(unknown)} (choose from {', '.join(choices)})"
+        )
+    return set(names)
+
+
+class Selection:
+    """The columns to read and return, from ``?fields=`` and ``include=author``.
+
+    Only selected columns are read, and the author join is only made when
+    the author is returned, either as a username (``author`` in ``fields``)
+    or as an ``{"id", "username"}`` object (``include=author``). ``id`` is
+    always returned.
+    """
+
+    def __init__(self, columns, fields=None, author=False):
+        self.columns = columns
+        self.author = author
+        self.fields = [
+            name for name in columns
+            if (fields is None or name in fields or name == 'id') and not (author and name == 'author')
+        ]
+        self._datetime_indexes = [index for index, name in enumerate(self.fields) if name in DATETIME_FIELDS]
+
+    @property
+    def cache_key(self):
+        return ','.join(self.fields) + (':author' if self.author else '')
+
+    def values_list(self, queryset, *extra):
+        """``queryset.values_list()`` of the selected columns, then ``extra`` ones."""
+        expressions = [self.columns[name] for name in self.fields]
+        if self.author:
+            expressions += ['author_id', F('author__username')]
+        return queryset.values_list(*expressions, *extra)
+
+    def dicts(self, rows):
+        """Turn rows of ``values_list()`` into dicts, ignoring extra columns."""
+        count = len(self.fields)
+        dicts = []
+        for row in rows:
+            row = list(row)
+            for index in self._datetime_indexes:
+                row[index] = row[index].isoformat()
+            item = dict(zip(self.fields, row))
+            if self.author:
+                item['author'] = {'id': row[count], 'username': row[count + 1]}
+            dicts.append(item)
+        return dicts
+
+
+def parse_selection(query, columns, default_include=()):
+    """Read ``fields`` and ``include`` from a request's query parameters.
+
+    Returns:
+        tuple: ``(selection, include)``, ``include`` being the set of
+            requested relations.
+
+    Raises:
+        FieldSelectionError: for unknown field or include names.
+    """
+    fields = query.get('fields')
+    fields = _parse_names(fields, list(columns), 'fields') if fields is not None else None
+    include = query.get('include')
+    include = _parse_names(include, INCLUDES, 'include') if include is not None else set(default_include)
+    return Selection(columns, fields, author='author' in include), include
+
+
+def dumps(data):
+    """Encode ``data`` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    """``JsonResponse`` for data built by this module."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(dumps(data), **kwargs)
+
+
+def serialize_post_list(rows, selection, pending_views=None):
+    """Dicts for rows of ``selection.values_list()`` over posts.
+
+    Args:
+        rows: the rows, usually one page.
+        selection (Selection): over ``POST_LIST_COLUMNS``.
+        pending_views (dict): ``{post_id: views}`` not yet in ``view_count``.
+    """
+    posts = selection.dicts(rows)
+    for post in posts:
+        if 'content' in post and len(post['content']) > PREVIEW_LENGTH:
+            post['content'] = post['content'][:PREVIEW_LENGTH] + '...'
+        if pending_views and 'view_count' in post:
+            post['view_count'] += pending_views.get(post['id'], 0)
+    return posts
+
+
+def posts_by_ids(post_ids, selection):
+    """``{post_id: post dict}`` for the posts of ``post_ids`` that exist.
+
+    Each post's dict is cached per selection until the post or its comments
+    change (post saves bump ``comments_namespace`` too); only the posts not
+    in the cache are read, with one ``pk IN (...)`` query. ``view_count``
+    in a cached entry can lag by up to ``POST_JSON_CACHE_TIMEOUT``; add
+    pending views on top as usual.
+    """
+    keys = versioned_keys(
+        'post-json', {post_id: [comments_namespace(post_id)] for post_id in post_ids}, selection.cache_key
+    )
+    cached = cache.get_many(list(keys.values()))
+    posts = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+    missing = [post_id for post_id in post_ids if post_id not in posts]
+    if missing:
+        rows = selection.values_list(Post.objects.filter(pk__in=missing).order_by())
+        loaded = {post['id']: post for post in serialize_post_list(rows, selection)}
+        cache.set_many({keys[post_id]: post for post_id, post in loaded.items()}, settings.POST_JSON_CACHE_TIMEOUT)
+        posts.update(loaded)
+    return posts
+
+
+def serialize_post(post_id, selection):
+    """Dict of the selected ``POST_COLUMNS`` for one post, or None if it doesn't exist."""
+    posts = selection.dicts(selection.values_list(Post.objects.filter(pk=post_id)))
+    return posts[0] if posts else None
+
+
+def serialize_comments(queryset, selection=None):
+    """Dicts of the selected ``COMMENT_COLUMNS`` for every comment in ``queryset``."""
+    selection = selection or Selection(COMMENT_COLUMNS)
+    return selection.dicts(selection.values_list(queryset))
+
+
+def comments_by_post(post_ids, selection=None, sort_order='oldest'):
+    """``{post_id: [comment dicts]}`` of approved comments, in one query."""
+    selection = selection or Selection(COMMENT_COLUMNS)
+    order = '-created_at' if sort_order == 'newest' else 'created_at'
+    queryset = Comment.objects.approved().filter(post_id__in=post_ids).order_by(order)
+    rows = list(selection.values_list(queryset, 'post_id'))
+    grouped = {post_id: [] for post_id in post_ids}
+    for comment, row in zip(selection.dicts(rows), rows):
+        grouped[row[-1]].append(comment)
+    return grouped
+
+
+def approved_comments(post_id, sort_order='oldest'):
+    order = '-created_at' if sort_order == 'newest' else 'created_at'
+    return Comment.objects.approved().filter(post_id=post_id).order_by(order)
@@ -0,0 +1,205 @@
+"""RSS and Atom feeds for posts, per author and for a post's comments.
+
+Feed responses are cached under versioned keys (see ``webBlog/caching.py``)
+and answered with ETag/Last-Modified derived from those versions alone, so a
+poll for an unchanged feed is a 304 without any database query. With
+``FEED_BASE_URL`` set, the feeds a saved post or comment appears in are
+rendered again by a task right away, so the next poller doesn't wait.
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from .caching import POSTS, comments_namespace, versioned_key
+from .internal_requests import internal_request
+from .models import Post
+from .tasks import task
+
+
+def _feed_items():
+    return getattr(settings, 'FEED_ITEMS', 20)
+
+
+class LatestPostsFeed(Feed):
+    title = 'My Blog'
+    description = 'Latest posts'
+
+    def link(self):
+        return reverse('blog:post_list')
+
+    def items(self):
+        return Post.objects.select_related('author').order_by('-created_at')[:_feed_items()]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.rendered_content()
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Posts by {obj.username}'
+
+    def description(self, obj):
+        return f'Latest posts by {obj.username}'
+
+    def link(self, obj):
+        return reverse('blog:post_list')
+
+    def items(self, obj):
+        return obj.blog_posts.select_related('author').order_by('-created_at')[:_feed_items()]
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class PostCommentsFeed(Feed):
+    def get_object(self, request, pk):
+        return get_object_or_404(Post, pk=pk)
+
+    def title(self, obj):
+        return f'Comments on {obj.title}'
+
+    def description(self, obj):
+        return f'Latest comments on {obj.title}'
+
+    def link(self, obj):
+        return obj.get_absolute_url()
+
+    def items(self, obj):
+        return obj.comments.approved().select_related('author').order_by('-created_at')[:_feed_items()]
+
+    def item_title(self, item):
+        return f'Comment by {item.author.username}'
+
+    def item_link(self, item):
+        # The post is the feed object, so avoid Comment.get_absolute_url()
+        # loading it again for every item.
+        return f"{reverse('blog:post_detail', args=[item.post_id])}#comment-{item.pk}"
+
+    def item_description(self, item):
+        return item.rendered_content()
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+
+class PostCommentsAtomFeed(PostCommentsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def cached_feed(feed, namespaces):
+    """Wrap ``feed`` with a versioned response cache and conditional GET.
+
+    Args:
+        feed: a ``Feed`` instance.
+        namespaces: callable taking the URL kwargs and returning the cache
+            namespaces the feed depends on.
+    """
+
+    def cache_state(request, **kwargs):
+        if not hasattr(request, '_feed_cache_state'):
+            # Feeds contain absolute links, so each host and scheme has its own copy.
+            request._feed_cache_state = versioned_key(
+                'feed', namespaces(**kwargs), type(feed).__name__,
+                request.scheme, request.get_host(), request.path,
+            )
+        return request._feed_cache_state
+
+    def etag(request, **kwargs):
+        key, _ = cache_state(request, **kwargs)
+        return key.split(':', 1)[1]
+
+    def last_modified(request, **kwargs):
+        _, modified = cache_state(request, **kwargs)
+        return datetime.fromtimestamp(int(modified), tz=timezone.utc)
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def view(request, **kwargs):
+        key, _ = cache_state(request, **kwargs)
+        cached = cache.get(key)
+        if cached is None:
+            response = feed(request, **kwargs)
+            cache.set(key, (response.content, response['Content-Type']), settings.FEED_CACHE_TIMEOUT)
+        else:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        patch_cache_control(response, public=True, max_age=settings.FEED_MAX_AGE)
+        return response
+
+    return view
+
+
+def _posts_namespaces(**kwargs):
+    return [POSTS]
+
+
+def _comments_namespaces(pk):
+    return [POSTS, comments_namespace(pk)]
+
+
+posts_rss = cached_feed(LatestPostsFeed(), _posts_namespaces)
+posts_atom = cached_feed(LatestPostsAtomFeed(), _posts_namespaces)
+author_rss = cached_feed(AuthorPostsFeed(), _posts_namespaces)
+author_atom = cached_feed(AuthorPostsAtomFeed(), _posts_namespaces)
+comments_rss = cached_feed(PostCommentsFeed(), _comments_namespaces)
+comments_atom = cached_feed(PostCommentsAtomFeed(), _comments_namespaces)
+
+
+@task
+def warm_feeds(post_id):
+    """Fill the cache for the feeds ``post_id`` appears in, if they changed."""
+    if not settings.FEED_BASE_URL:
+        return
+    username = Post.objects.filter(pk=post_id).values_list('author__username', flat=True).first()
+    if username is None:
+        return
+    views = [
+        ('blog:posts_rss', posts_rss, {}),
+        ('blog:posts_atom', posts_atom, {}),
+        ('blog:author_rss', author_rss, {'username': username}),
+        ('blog:author_atom', author_atom, {'username': username}),
+        ('blog:comments_rss', comments_rss, {'pk': post_id}),
+        ('blog:comments_atom', comments_atom, {'pk': post_id}),
+    ]
+    for name, view, kwargs in views:
+        # Cached feeds are served from the cache; the others are rendered.
+        # Feeds build absolute links from the request's scheme and host.
+        view(internal_request(settings.FEED_BASE_URL, reverse(name, kwargs=kwargs)), **kwargs)
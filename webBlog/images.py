@@ -0,0 +1,211 @@
+"""Resized variants and intrinsic sizes for images under MEDIA_ROOT.
+
+Post markdown that embeds a local image (``![alt](/media/...)``) is rendered
+with ``width``/``height`` and a ``srcset`` of smaller variants once they
+exist, so pages reserve the space up front and browsers download the size
+they need (see ``PostHtmlTreeprocessor``).
+
+Variants are generated off the request path: once a saved post has been
+rendered with local images without dimensions, a task (see
+``webBlog/tasks.py``) writes the variants and a ``meta.json`` next to them
+under ``MEDIA_ROOT/_variants/`` and then re-renders the post. Derivatives are
+reused until the source file or ``IMAGE_VARIANT_WIDTHS`` changes.
+
+Variants need Pillow (in ``requirements.txt``); without it images are still
+lazy-loaded but nothing is generated.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.db import connections
+
+from .tasks import task
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = '_variants'
+META_NAME = 'meta.json'
+
+_IMG_TAG = re.compile(r'<img [^>]*>')
+_SRC = re.compile(r'\ssrc="([^"]*)"')
+
+# relative path -> (meta.json mtime, metadata), least recently used first;
+# at most settings.IMAGE_META_CACHE_SIZE entries.
+_meta_cache = OrderedDict()
+_meta_cache_lock = threading.Lock()
+
+
+def source_path(url):
+    """Return the path of ``url`` relative to MEDIA_ROOT, or None if it isn't local media."""
+    if not url.startswith(settings.MEDIA_URL):
+        return None
+    relative = PurePosixPath(unquote(url[len(settings.MEDIA_URL):].split('?')[0]))
+    if not relative.parts or '..' in relative.parts or relative.parts[0] == VARIANTS_DIR:
+        return None
+    return str(relative)
+
+
+def _variant_dir(relative):
+    digest = hashlib.sha1(relative.encode()).hexdigest()
+    return PurePosixPath(VARIANTS_DIR) / digest[:2] / digest
+
+
+def _media_url(relative):
+    return settings.MEDIA_URL + str(relative)
+
+
+def load_meta(relative):
+    """Return the stored metadata for ``relative``, or None if it hasn't been generated."""
+    path = Path(settings.MEDIA_ROOT) / _variant_dir(relative) / META_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        with _meta_cache_lock:
+            _meta_cache.pop(relative, None)
+        return None
+    with _meta_cache_lock:
+        cached = _meta_cache.get(relative)
+        if cached is not None and cached[0] == mtime:
+            _meta_cache.move_to_end(relative)
+            return cached[1]
+    try:
+        cached = (mtime, json.loads(path.read_text()))
+    except (OSError, ValueError):
+        return None
+    with _meta_cache_lock:
+        _meta_cache[relative] = cached
+        _meta_cache.move_to_end(relative)
+        while len(_meta_cache) > settings.IMAGE_META_CACHE_SIZE:
+            _meta_cache.popitem(last=False)
+    return cached[1]
+
+
+def image_attributes(url):
+    """HTML attributes for a known local image: size, ``srcset`` and ``sizes``."""
+    relative = source_path(url)
+    meta = load_meta(relative) if relative else None
+    if meta is None:
+        return {}
+    attributes = {'width': str(meta['width']), 'height': str(meta['height'])}
+    if meta['variants']:
+        candidates = [f'{_media_url(path)} {width}w' for width, path in meta['variants']]
+        candidates.append(f"{url} {meta['width']}w")
+        attributes['srcset'] = ', '.join(candidates)
+        attributes['sizes'] = settings.IMAGE_SIZES
+    return attributes
+
+
+def generate_variants(relative):
+    """Write the resized variants and metadata for ``relative``.
+
+    Returns:
+        bool: True if anything was (re)generated, False if the stored
+            variants are current.
+    """
+    from .static_export import write_atomic
+
+    media_root = Path(settings.MEDIA_ROOT)
+    source = media_root / relative
+    source_mtime = source.stat().st_mtime_ns
+    widths = sorted(set(settings.IMAGE_VARIANT_WIDTHS))
+    meta = load_meta(relative)
+    if meta and meta['source_mtime'] == source_mtime and meta['widths'] == widths:
+        return False
+
+    directory = _variant_dir(relative)
+    with Image.open(source) as original:
+        image_format = original.format
+        animated = getattr(original, 'is_animated', False)
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        variants = []
+        # Animated images keep only their dimensions; resizing would drop frames.
+        for variant_width in ([] if animated else widths):
+            if variant_width >= width:
+                break
+            variant = image.resize((variant_width, round(height * variant_width / width)), Image.LANCZOS)
+            if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+                variant = variant.convert('RGB')
+            buffer = io.BytesIO()
+            variant.save(buffer, format=image_format)
+            path = directory / f'{variant_width}w{PurePosixPath(relative).suffix}'
+            write_atomic(media_root / path, buffer.getvalue())
+            variants.append([variant_width, str(path)])
+
+    meta = {
+        'source': relative,
+        'source_mtime': source_mtime,
+        'widths': widths,
+        'width': width,
+        'height': height,
+        'variants': variants,
+    }
+    write_atomic(media_root / directory / META_NAME, json.dumps(meta).encode())
+    return True
+
+
+def pending_images(html):
+    """Local images in rendered post HTML that don't have dimensions yet."""
+    paths = []
+    for tag in _IMG_TAG.findall(html):
+        match = _SRC.search(tag)
+        relative = source_path(match.group(1)) if match else None
+        if relative and ' width="' not in tag and relative not in paths:
+            paths.append(relative)
+    return paths
+
+
+@task
+def process_post_images(post_id, paths):
+    """Generate variants for ``paths``, then re-render the post that uses them."""
+    from .caching import POSTS, bump
+    from .models import Post
+    from .templatetags.markdown_extras import MARKDOWN_VERSION, render_post_html
+
+    changed = False
+    for relative in paths:
+        try:
+            changed |= generate_variants(relative)
+        except Exception:
+            logger.exception('Could not generate image variants for %s', relative)
+    if not changed:
+        return
+    content = Post.objects.filter(pk=post_id).values_list('content', flat=True).first()
+    if content is None:
+        return
+    # Skipped if the post was edited meanwhile; its own task renders it.
+    if Post.objects.filter(pk=post_id, content=content).update(
+        content_html=render_post_html(content), content_html_version=MARKDOWN_VERSION
+    ):
+        bump(POSTS)
+
+
+def process_in_thread(post_id, paths):
+    try:
+        process_post_images(post_id, paths)
+    finally:
+        # Pool threads open their own connections; don't leave them behind.
+        connections.close_all()
+
+
+def schedule_post_images(post_id, html):
+    """Queue variant generation for the local images in a post's rendered HTML."""
+    if Image is None or not html:
+        return
+    paths = [path for path in pending_images(html) if os.path.isfile(Path(settings.MEDIA_ROOT) / path)]
+    if paths:
+        process_post_images.enqueue(post_id, paths)
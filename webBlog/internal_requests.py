@@ -0,0 +1,41 @@
+"""GET requests built in-process for rendering views outside a request cycle.
+
+Feed warming and the static export call regular views to produce their
+output. Views build absolute links from the request, so the requests carry
+the scheme and host of the site's public base URL.
+"""
+import io
+import sys
+from urllib.parse import unquote_to_bytes, urlencode, urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+
+
+def internal_request(base_url, path, data=None):
+    """A ``GET`` of ``path`` (with query ``data``) as if made to ``base_url``.
+
+    Args:
+        base_url (str): e.g. ``'https://blog.example.com'``; the host must be
+            in ``ALLOWED_HOSTS`` for views that build absolute URLs.
+    """
+    parts = urlsplit(base_url)
+    scheme = parts.scheme or 'http'
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        # WSGI passes the path as bytes decoded as latin-1.
+        'PATH_INFO': unquote_to_bytes(path).decode('iso-8859-1'),
+        'QUERY_STRING': urlencode(data or {}, doseq=True),
+        'SERVER_NAME': parts.hostname or 'localhost',
+        'SERVER_PORT': str(parts.port or (443 if scheme == 'https' else 80)),
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': parts.netloc,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scheme,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    return WSGIRequest(environ)
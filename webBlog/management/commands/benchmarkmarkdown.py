@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from webBlog.markdown_benchmark import CORPUS, benchmark
+
+
+class Command(BaseCommand):
+    help = 'Time the markdown renderers against the regex post-processing they replaced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Passes over the corpus per measurement')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Copies of each corpus document joined into one, to time long content')
+
+    def handle(self, *args, **options):
+        iterations, repeat = options['iterations'], options['repeat']
+        self.stdout.write(f'{len(CORPUS)} documents x {repeat} copies, {iterations} iterations (best of 3)')
+        baseline = {}
+        for kind, name, seconds in benchmark(iterations, repeat):
+            per_document = seconds / (iterations * len(CORPUS)) * 1e6
+            line = f'{kind:8} {name:14} {seconds:8.3f}s  {per_document:8.1f} us/document'
+            if kind in baseline:
+                line += f'  ({baseline[kind] / seconds:.2f}x)'
+            else:
+                baseline[kind] = seconds
+            self.stdout.write(line)
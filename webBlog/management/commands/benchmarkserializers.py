@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from webBlog import fast_serializers
+from webBlog.models import Comment, Post
+
+
+def model_post_rows(queryset):
+    """How posts_list built its rows before webBlog/fast_serializers.py."""
+    return [
+        {
+            'id': post.id,
+            'title': post.title,
+            'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
+            'author': post.author.username,
+            'created_at': post.created_at.isoformat(),
+            'updated_at': post.updated_at.isoformat(),
+            'comment_count': post.comment_total,
+            'view_count': post.view_count,
+        }
+        for post in queryset.select_related('author')
+    ]
+
+
+def model_comment_rows(queryset):
+    return [
+        {
+            'id': comment.id,
+            'author': comment.author.username,
+            'content': comment.content,
+            'created_at': comment.created_at.isoformat(),
+            'is_approved': comment.is_approved,
+        }
+        for comment in queryset.select_related('author')
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Time model-instance and values_list() serialization of posts and comments, per row'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows read per measurement')
+        parser.add_argument('--iterations', type=int, default=5, help='Measurements per path (best is shown)')
+
+    def handle(self, *args, **options):
+        rows, iterations = options['rows'], options['iterations']
+        posts = Post.objects.order_by('-created_at')[:rows]
+        comments = Comment.objects.order_by('created_at')[:rows]
+        if not posts.exists():
+            raise CommandError('There are no posts to serialize')
+
+        selection = fast_serializers.Selection(fast_serializers.POST_LIST_COLUMNS)
+        cases = [
+            ('posts', 'model', lambda: fast_serializers.dumps(model_post_rows(posts))),
+            ('posts', 'values', lambda: fast_serializers.dumps(
+                fast_serializers.serialize_post_list(selection.values_list(posts), selection)
+            )),
+            ('comments', 'model', lambda: fast_serializers.dumps(model_comment_rows(comments))),
+            ('comments', 'values', lambda: fast_serializers.dumps(fast_serializers.serialize_comments(comments))),
+        ]
+        encoder = 'orjson' if fast_serializers.orjson else 'json'
+        self.stdout.write(f'Up to {rows} rows, best of {iterations}, encoded with {encoder}')
+        counts = {'posts': posts.count(), 'comments': comments.count()}
+        baseline = {}
+        for kind, name, run in cases:
+            run()  # warm up
+            best = min(self._time(run) for _ in range(iterations))
+            line = f'{kind:9} {name:7} {best * 1000:8.2f} ms  {best / max(counts[kind], 1) * 1e6:7.2f} us/row'
+            if kind in baseline:
+                line += f'  ({baseline[kind] / best:.2f}x)'
+            else:
+                baseline[kind] = best
+            self.stdout.write(line)
+
+    def _time(self, run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
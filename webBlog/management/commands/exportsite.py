@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from webBlog.static_export import export_site
+
+
+class Command(BaseCommand):
+    help = 'Render post pages, the post list and feeds to static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directory to export to')
+        parser.add_argument(
+            '--base-url', default='http://localhost',
+            help='Scheme and host for absolute URLs (must be in ALLOWED_HOSTS)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Rendering processes (default: number of CPUs; 1 renders in-process)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=100, help='Posts per worker task')
+        parser.add_argument('--full', action='store_true', help='Ignore the manifest and re-render everything')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(done, total):
+            self.stdout.write(f'  rendered {done} of {total} pages', ending='\r')
+            self.stdout.flush()
+
+        summary = export_site(
+            options['output_dir'],
+            base_url=options['base_url'],
+            workers=options['workers'],
+            full=options['full'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {summary['posts']} posts and {summary['pages']} list pages, "
+            f"removed {summary['removed']} posts in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from webBlog.fast_delete import delete_posts, delete_user
+from webBlog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Delete posts or users with many comments using batched deletes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['post', 'user'], help='What to delete')
+        parser.add_argument('targets', nargs='+', help='Post IDs, or user IDs/usernames')
+        parser.add_argument('--batch-size', type=int, help='Comments deleted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['kind'] == 'post':
+            self._delete_posts(options)
+        else:
+            self._delete_users(options)
+
+    def _progress(self, total):
+        def report(deleted):
+            suffix = f' of ~{total}' if total else ''
+            self.stdout.write(f'  deleted {deleted}{suffix} comments', ending='\r')
+            self.stdout.flush()
+        return report
+
+    def _delete_posts(self, options):
+        try:
+            post_ids = [int(target) for target in options['targets']]
+        except ValueError:
+            raise CommandError('Post targets must be numeric IDs')
+        posts = Post.objects.filter(pk__in=post_ids)
+        found = list(posts.values_list('pk', 'title', 'comment_total'))
+        missing = set(post_ids) - {pk for pk, _, _ in found}
+        if missing:
+            raise CommandError(f'Posts not found: {", ".join(map(str, sorted(missing)))}')
+
+        total = sum(comment_total for _, _, comment_total in found)
+        for pk, title, comment_total in found:
+            self.stdout.write(f'Post {pk} "{title}": {comment_total} comments')
+        if options['dry_run']:
+            return
+
+        posts_deleted, comments_deleted = delete_posts(
+            posts, batch_size=options['batch_size'], progress=self._progress(total)
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {posts_deleted} posts and {comments_deleted} comments'
+        ))
+
+    def _delete_users(self, options):
+        for target in options['targets']:
+            lookup = Q(username=target)
+            if target.isdigit():
+                lookup |= Q(pk=int(target))
+            user = User.objects.filter(lookup).first()
+            if user is None:
+                raise CommandError(f'User "{target}" not found')
+
+            total = Comment.objects.filter(Q(author=user) | Q(post__author=user)).count()
+            self.stdout.write(
+                f'User "{user.username}": {user.blog_posts.count()} posts, ~{total} comments to delete'
+            )
+            if options['dry_run']:
+                continue
+
+            comments_deleted = delete_user(
+                user, batch_size=options['batch_size'], progress=self._progress(total)
+            )
+            self.stdout.write('')
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted user "{user.username}" and {comments_deleted} comments'
+            ))
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from webBlog import images
+from webBlog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants for local images in existing posts (requires Pillow)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Threads generating variants')
+
+    def handle(self, *args, **options):
+        if images.Image is None:
+            raise CommandError('Pillow is not installed')
+        posts = (
+            Post.objects.filter(content_html__contains='<img').order_by('pk')
+            .values_list('pk', 'content_html').iterator(chunk_size=500)
+        )
+        jobs = [(pk, paths) for pk, html in posts if (paths := images.pending_images(html))]
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            for done, _ in enumerate(executor.map(lambda job: images.process_in_thread(*job), jobs), 1):
+                self.stdout.write(f'  {done} of {len(jobs)} posts', ending='\r')
+                self.stdout.flush()
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'Processed images in {len(jobs)} posts'))
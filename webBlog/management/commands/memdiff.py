@@ -0,0 +1,53 @@
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Compare two tracemalloc snapshots dumped by a running worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshots', nargs='*',
+                            help='Old and new snapshot files (default: the two newest in MEMORY_SNAPSHOT_DIR)')
+        parser.add_argument('--pid', type=int, help='Only consider snapshots from this worker process')
+        parser.add_argument('--group-by', choices=['lineno', 'filename', 'traceback'], default='lineno')
+        parser.add_argument('--limit', type=int, default=15, help='Number of allocation sites to show')
+
+    def handle(self, *args, **options):
+        old_path, new_path = self._resolve_paths(options['snapshots'], options['pid'])
+        old = tracemalloc.Snapshot.load(str(old_path))
+        new = tracemalloc.Snapshot.load(str(new_path))
+
+        self.stdout.write(f'Comparing {old_path.name} -> {new_path.name}')
+        stats = new.compare_to(old, options['group_by'])
+        total_diff = sum(stat.size_diff for stat in stats)
+        self.stdout.write(f'Net change: {total_diff / 1024:+.1f} KiB')
+
+        for stat in stats[:options['limit']]:
+            frame = stat.traceback[0]
+            self.stdout.write(
+                f'{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  '
+                f'{frame.filename}:{frame.lineno}'
+            )
+            if options['group_by'] == 'traceback':
+                for line in stat.traceback.format()[2:]:
+                    self.stdout.write(f'    {line}')
+
+    def _resolve_paths(self, snapshots, pid):
+        if len(snapshots) == 2:
+            paths = [Path(path) for path in snapshots]
+        elif not snapshots:
+            directory = Path(settings.MEMORY_SNAPSHOT_DIR)
+            pattern = f'{pid}-*.tracemalloc' if pid else '*.tracemalloc'
+            paths = sorted(directory.glob(pattern), key=lambda path: path.stat().st_mtime)[-2:]
+            if len(paths) < 2:
+                raise CommandError(f'Need at least two snapshots in {directory}')
+        else:
+            raise CommandError('Pass either no snapshots or exactly two')
+
+        for path in paths:
+            if not path.exists():
+                raise CommandError(f'Snapshot {path} does not exist')
+        return paths
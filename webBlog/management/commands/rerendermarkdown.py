@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from webBlog.models import Comment, Post
+from webBlog.rerender import rerender_markdown
+from webBlog.templatetags.markdown_extras import MARKDOWN_VERSION
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored post and comment HTML after MARKDOWN_VERSION changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['post', 'comment', 'all'], default='all')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per task and per bulk update')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Rendering processes (default: number of CPUs; 1 renders in-process)',
+        )
+        parser.add_argument('--force', action='store_true', help='Also re-render rows that are up to date')
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Skip rows up to this primary key (the "resume after" value printed by an earlier run)',
+        )
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep after each bulk update')
+
+    def handle(self, *args, **options):
+        models = {'post': [Post], 'comment': [Comment], 'all': [Post, Comment]}[options['model']]
+        for model in models:
+            name = model._meta.verbose_name_plural
+
+            def progress(done, total, resume_pk):
+                self.stdout.write(f'  {name}: {done} of {total} (resume after {resume_pk})', ending='\r')
+                self.stdout.flush()
+
+            count = rerender_markdown(
+                model,
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                force=options['force'],
+                start_after=options['start_after'],
+                pause=options['pause'],
+                progress=progress,
+            )
+            self.stdout.write('')
+            self.stdout.write(self.style.SUCCESS(
+                f'Rendered {count} {name} with markdown version {MARKDOWN_VERSION}'
+            ))
@@ -0,0 +1,31 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from webBlog.tasks import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (rendering, image variants, feeds)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=max(1, settings.TASK_WORKERS),
+            help='Threads running tasks (default: TASK_WORKERS)',
+        )
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls when idle')
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due, then exit')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        # Finish the running tasks on SIGTERM, as on Ctrl-C.
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        count = run_worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['interval'],
+            once=options['once'],
+            stop=stop,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} tasks'))
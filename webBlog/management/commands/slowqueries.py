@@ -0,0 +1,55 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+
+from webBlog.query_log import QueryStats, SlowQueryLogger
+
+
+class Command(BaseCommand):
+    help = 'Request the given URLs in-process and report their slowest SQL fingerprints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='URL paths to request, e.g. / /api/posts/')
+        parser.add_argument('--threshold', type=float, default=0,
+                            help='Only record queries slower than this many milliseconds (default: all)')
+        parser.add_argument('--repeat', type=int, default=1, help='Number of times to request each path')
+        parser.add_argument('--limit', type=int, default=10, help='Number of fingerprints to show')
+        parser.add_argument('--sort', choices=['total_ms', 'max_ms', 'avg_ms', 'count'], default='total_ms')
+
+    def handle(self, *args, **options):
+        stats = QueryStats()
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+        for path in options['paths']:
+            for _ in range(options['repeat']):
+                response = self._request(client, path, stats, options['threshold'])
+                if response.status_code >= 400:
+                    self.stdout.write(
+                        self.style.WARNING(f'{path} returned HTTP {response.status_code}')
+                    )
+
+        entries = stats.top(limit=options['limit'], sort=options['sort'])
+        if not entries:
+            self.stdout.write(self.style.SUCCESS('No queries over the threshold.'))
+            return
+
+        for entry in entries:
+            self.stdout.write(self.style.SQL_KEYWORD(entry['fingerprint']))
+            self.stdout.write(
+                f"  count={entry['count']} total={entry['total_ms']:.1f}ms "
+                f"avg={entry['avg_ms']:.1f}ms max={entry['max_ms']:.1f}ms"
+            )
+            views = ', '.join(f'{name} ({count})' for name, count in entry['views'].items())
+            self.stdout.write(f'  views: {views}')
+            for frame in entry['stack']:
+                self.stdout.write(f'    {frame}')
+
+    def _request(self, client, path, stats, threshold):
+        query_logger = SlowQueryLogger(threshold_ms=threshold, stats=stats, label=path, log=False)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_logger))
+            return client.get(path)
@@ -0,0 +1,120 @@
+"""Compare the treeprocessor renderers with the regex post-processing they replaced.
+
+``CORPUS`` doubles as the fixture for the equivalence tests: for every
+document in it, the tree-based output must be the HTML the old regular
+expressions produced, up to attribute order. Raw HTML is left out because
+comments now escape it instead of filtering it with regular expressions.
+"""
+import re
+import time
+
+import markdown
+
+from .templatetags.markdown_extras import (
+    comment_markdown, post_markdown, render_comment_html, render_post_html,
+)
+
+_CODEHILITE = {
+    'markdown.extensions.codehilite': {
+        'css_class': 'highlight',
+        'use_pygments': False,
+    }
+}
+
+CORPUS = [
+    'Plain paragraph.',
+    'Some **bold**, *italic* and `inline code`.',
+    '# Heading\n\nParagraph with a [link](https://example.com "Title").',
+    'An image: ![alt text](https://example.com/image.png)\nand a line break.',
+    '[Relative link](/post/1/) and [mail](mailto:someone@example.com).',
+    '<https://example.com/autolink> and <http://example.org>',
+    '[![Linked image](https://example.com/a.png)](https://example.com/target)',
+    '- one\n- two with [a link](http://example.com)\n- ![three](x.png "t")',
+    '> quoted [link](https://example.com) text\n> second line',
+    '```python\nprint("<img src=x>")\nlink = \'<a href="http://x">\'\n```',
+    '    indented code with [not a link](http://example.com)',
+    '| Col | Other |\n| --- | ----- |\n| [a](http://a.example) | ![b](b.png) |',
+    'Reference [link][ref] and ![image][img].\n\n[ref]: https://example.com\n[img]: /media/i.png',
+    'Escaped \\[not a link\\](http://example.com) and 2 < 3 & 4 > 1.',
+    'Nested *emphasis with [a **bold** link](https://example.com) inside*.',
+]
+
+
+def legacy_post_markdown():
+    return markdown.Markdown(
+        extensions=[
+            'markdown.extensions.fenced_code',
+            'markdown.extensions.tables',
+            'markdown.extensions.nl2br',
+            'markdown.extensions.codehilite',
+        ],
+        extension_configs=_CODEHILITE,
+    )
+
+
+def legacy_comment_markdown():
+    return markdown.Markdown(
+        extensions=[
+            'markdown.extensions.fenced_code',
+            'markdown.extensions.nl2br',
+            'markdown.extensions.codehilite',
+        ],
+        extension_configs=_CODEHILITE,
+    )
+
+
+def legacy_post_html(value, md):
+    """The regex post-processing ``markdown_to_html`` used to do."""
+    html = md.reset().convert(value)
+    html = re.sub(r'<img ', r'<img class="markdown-image" ', html)
+    html = re.sub(r'<a href="http', r'<a target="_blank" href="http', html)
+    return html
+
+
+def legacy_comment_html(value, md):
+    """The regex post-processing ``markdown_to_html_safe`` used to do."""
+    html = md.reset().convert(value)
+    html = re.sub(r'<img[^>]*>', '', html)
+    html = re.sub(r'<a[^>]*>(.*?)</a>', r'\1', html)
+    html = re.sub(r'href="[^"]*"', '', html)
+    return html
+
+
+IMPLEMENTATIONS = {
+    'post': [
+        ('regex', legacy_post_markdown, legacy_post_html),
+        ('treeprocessor', post_markdown, render_post_html),
+    ],
+    'comment': [
+        ('regex', legacy_comment_markdown, legacy_comment_html),
+        ('treeprocessor', comment_markdown, render_comment_html),
+    ],
+}
+
+
+def benchmark(iterations=200, repeat=1):
+    """Time each implementation over the corpus.
+
+    Args:
+        iterations (int): passes over the corpus per measurement.
+        repeat (int): the corpus is joined into documents of ``repeat``
+            copies, to measure the cost on long posts and comments.
+
+    Returns:
+        list: ``(kind, name, seconds)`` per implementation, the best of three
+            measurements.
+    """
+    documents = ['\n\n'.join([text] * repeat) for text in CORPUS]
+    results = []
+    for kind, implementations in IMPLEMENTATIONS.items():
+        for name, factory, render in implementations:
+            md = factory()
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    for text in documents:
+                        render(text, md)
+                timings.append(time.perf_counter() - start)
+            results.append((kind, name, min(timings)))
+    return results
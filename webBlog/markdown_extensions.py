@@ -0,0 +1,86 @@
+"""Markdown extensions that adjust the rendered element tree.
+
+They replace the regular expressions that used to run over the finished HTML:
+a treeprocessor makes one pass over the tree, after inline patterns have
+produced every link and image, and works on elements rather than text, so it
+can't be fooled by attribute order or markup that spans lines. (Markdown
+serializes attributes sorted by name, so ``target`` now follows ``href``.)
+"""
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+# After 'inline' (20), which creates links and images, and before
+# 'prettify' (10).
+PRIORITY = 15
+
+
+def _append_text(parent, index, text):
+    """Add ``text`` where the child at ``index`` starts."""
+    if not text:
+        return
+    if index == 0:
+        parent.text = (parent.text or '') + text
+    else:
+        previous = parent[index - 1]
+        previous.tail = (previous.tail or '') + text
+
+
+class PostHtmlTreeprocessor(Treeprocessor):
+    def run(self, root):
+        from .images import image_attributes
+
+        for element in root.iter():
+            if element.tag == 'img':
+                element.set('class', 'markdown-image')
+                element.set('loading', 'lazy')
+                element.set('decoding', 'async')
+                for name, value in image_attributes(element.get('src', '')).items():
+                    element.set(name, value)
+            elif element.tag == 'a' and element.get('href', '').startswith('http'):
+                element.set('target', '_blank')
+
+
+class CommentHtmlTreeprocessor(Treeprocessor):
+    """Drops images and replaces links with their text."""
+
+    def run(self, root):
+        for parent in list(root.iter()):
+            index = 0
+            while index < len(parent):
+                child = parent[index]
+                if child.tag == 'img':
+                    parent.remove(child)
+                    _append_text(parent, index, child.tail)
+                elif child.tag == 'a':
+                    children = list(child)
+                    parent.remove(child)
+                    _append_text(parent, index, child.text)
+                    for offset, grandchild in enumerate(children):
+                        parent.insert(index + offset, grandchild)
+                    # Unwrapped children are checked on the next iterations.
+                    _append_text(parent, index + len(children), child.tail)
+                else:
+                    index += 1
+
+
+class PostHtmlExtension(Extension):
+    """Marks up images for the post stylesheet and lazy loading, and opens
+    external links in a new tab.
+
+    Local images that ``webBlog/images.py`` has processed also get their
+    dimensions and a ``srcset``.
+    """
+
+    def extendMarkdown(self, md):
+        md.treeprocessors.register(PostHtmlTreeprocessor(md), 'post_html', PRIORITY)
+
+
+class CommentHtmlExtension(Extension):
+    """Renders comments without images, links or raw HTML."""
+
+    def extendMarkdown(self, md):
+        # Raw HTML is escaped instead of passed through, so nothing the tree
+        # doesn't know about reaches the page.
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(CommentHtmlTreeprocessor(md), 'comment_html', PRIORITY)
@@ -0,0 +1,148 @@
+"""Opt-in tracemalloc diagnostics for tracking down memory growth.
+
+``MemoryProfilingMiddleware`` samples a fraction of requests, takes a
+tracemalloc snapshot before and after the view runs and records the peak
+traced size and the top allocation sites per URL name. Workers can also dump
+full snapshots to ``MEMORY_SNAPSHOT_DIR`` (on ``SIGUSR2`` or through the
+staff endpoint) so that ``manage.py memdiff`` can compare them offline.
+"""
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def format_stat(stat):
+    """Turn a ``StatisticDiff`` into a JSON-friendly dict."""
+    frame = stat.traceback[0]
+    return {
+        'site': f'{frame.filename}:{frame.lineno}',
+        'size_diff': stat.size_diff,
+        'size': stat.size,
+        'count_diff': stat.count_diff,
+    }
+
+
+class MemoryProfiler:
+    """Per-URL aggregate of sampled request allocations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # tracemalloc is process-wide, so only one request is measured at a
+        # time; concurrent requests would otherwise pollute each other's diff.
+        self._sampling = threading.Lock()
+        self._stats = {}
+
+    @property
+    def enabled(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(getattr(settings, 'MEMORY_PROFILING_FRAMES', 10))
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def try_begin(self):
+        """Return True if this request may be sampled right now."""
+        return self._sampling.acquire(blocking=False)
+
+    def end(self):
+        self._sampling.release()
+
+    def measure(self, url_name, func):
+        """Run ``func`` and record the allocations it leaves behind under ``url_name``.
+
+        ``url_name`` may be a callable, evaluated after ``func`` returns, for
+        names that are only known once the request has been resolved.
+        """
+        top_n = getattr(settings, 'MEMORY_PROFILING_TOP_SITES', 10)
+        before = take_snapshot()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            return func()
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            after = take_snapshot()
+            diff = [stat for stat in after.compare_to(before, 'lineno') if stat.size_diff > 0]
+            if callable(url_name):
+                url_name = url_name()
+            self.record(url_name, peak - baseline, diff[:top_n])
+
+    def record(self, url_name, peak_bytes, top_stats):
+        with self._lock:
+            entry = self._stats.setdefault(url_name, {
+                'url_name': url_name,
+                'samples': 0,
+                'max_peak_bytes': 0,
+                'total_peak_bytes': 0,
+                'sites': {},
+            })
+            entry['samples'] += 1
+            entry['total_peak_bytes'] += peak_bytes
+            entry['max_peak_bytes'] = max(entry['max_peak_bytes'], peak_bytes)
+            for stat in top_stats:
+                formatted = format_stat(stat)
+                site = entry['sites'].setdefault(formatted['site'], {
+                    'site': formatted['site'], 'retained_bytes': 0, 'samples': 0,
+                })
+                site['retained_bytes'] += formatted['size_diff']
+                site['samples'] += 1
+
+    def report(self, top_sites=10):
+        """Return per-URL stats, largest peak first."""
+        with self._lock:
+            entries = []
+            for entry in self._stats.values():
+                sites = sorted(entry['sites'].values(), key=lambda s: s['retained_bytes'], reverse=True)
+                entries.append({
+                    'url_name': entry['url_name'],
+                    'samples': entry['samples'],
+                    'max_peak_bytes': entry['max_peak_bytes'],
+                    'avg_peak_bytes': entry['total_peak_bytes'] // entry['samples'],
+                    'top_sites': [dict(site) for site in sites[:top_sites]],
+                })
+        entries.sort(key=lambda entry: entry['max_peak_bytes'], reverse=True)
+        return entries
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def dump_snapshot(self, directory=None):
+        """Write a full snapshot of this worker to ``directory`` and return its path."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('tracemalloc is not tracing; enable MEMORY_PROFILING_ENABLED')
+        directory = Path(directory or settings.MEMORY_SNAPSHOT_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}-{time.time_ns()}.tracemalloc'
+        take_snapshot().dump(str(path))
+        return path
+
+
+memory_profiler = MemoryProfiler()
+
+
+def install_snapshot_signal_handler():
+    """Dump a snapshot whenever the worker receives ``SIGUSR2``."""
+    if not hasattr(signal, 'SIGUSR2') or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signal.SIGUSR2, lambda signum, frame: memory_profiler.dump_snapshot())
+    return True
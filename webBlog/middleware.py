@@ -0,0 +1,108 @@
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .db_routers import (
+    PIN_COOKIE_NAME, replica_aliases, replica_health, restore_reads, route_reads,
+)
+from .memory_profiling import install_snapshot_signal_handler, memory_profiler
+from .query_log import SlowQueryLogger
+
+
+class SlowQueryLogMiddleware:
+    """Record slow queries issued while handling a request.
+
+    Enabled with ``SLOW_QUERY_LOG_ENABLED``; the threshold comes from
+    ``SLOW_QUERY_THRESHOLD_MS``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_LOG_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_logger = SlowQueryLogger(request=request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_logger))
+            return self.get_response(request)
+
+
+class MemoryProfilingMiddleware:
+    """Sample requests with tracemalloc and aggregate allocations per URL name.
+
+    Enabled with ``MEMORY_PROFILING_ENABLED``; ``MEMORY_PROFILING_SAMPLE_RATE``
+    is the fraction of requests that are measured.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MEMORY_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        memory_profiler.start()
+        install_snapshot_signal_handler()
+
+    def __call__(self, request):
+        if random.random() >= settings.MEMORY_PROFILING_SAMPLE_RATE or not memory_profiler.try_begin():
+            return self.get_response(request)
+        try:
+            return memory_profiler.measure(
+                lambda: self._url_name(request),
+                lambda: self.get_response(request),
+            )
+        finally:
+            memory_profiler.end()
+
+    @staticmethod
+    def _url_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match is not None else request.path
+
+
+class ReplicaRoutingMiddleware:
+    """Serve the read-only views in ``REPLICA_READ_VIEWS`` from a replica.
+
+    Any successful unsafe request (posting, commenting, logging in) sets a
+    cookie that keeps the client on the primary for ``REPLICA_PIN_SECONDS``,
+    so the next page load reflects the write. Unused unless
+    ``DATABASE_REPLICAS`` is set.
+    """
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.read_views = set(getattr(settings, 'REPLICA_READ_VIEWS', ()))
+
+    def __call__(self, request):
+        token = route_reads(None)
+        try:
+            # The template is rendered before get_response returns, so its
+            # queries use the same database as the view.
+            response = self.get_response(request)
+        finally:
+            restore_reads(token)
+        if request.method not in self.safe_methods and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method not in self.safe_methods
+            or PIN_COOKIE_NAME in request.COOKIES
+            or request.resolver_match.view_name not in self.read_views
+        ):
+            return None
+        route_reads(replica_health.choose(replica_aliases()))
+        return None
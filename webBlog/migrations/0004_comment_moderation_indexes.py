@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_approved_comments_only(apps, schema_editor):
+    Post = apps.get_model('webBlog', 'Post')
+    Comment = apps.get_model('webBlog', 'Comment')
+    totals = (
+        Comment.objects.filter(post=OuterRef('pk'), is_approved=True)
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Post.objects.update(comment_total=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webBlog', '0003_post_comment_total_and_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['post', 'created_at'], name='comment_approved_post_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['created_at'], name='comment_pending_idx'),
+        ),
+        migrations.RunPython(count_approved_comments_only, migrations.RunPython.noop),
+    ]
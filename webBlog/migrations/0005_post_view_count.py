@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webBlog', '0004_comment_moderation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
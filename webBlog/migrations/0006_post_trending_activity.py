@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:27
+
+import math
+from datetime import datetime, timezone
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+# The trending score as defined when this migration was written (see
+# webBlog/trending.py), copied so that later changes there cannot alter it.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def score_from_times(times):
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600
+    exponents = [0.0] + [(when - EPOCH).total_seconds() * math.log(2) / half_life for when in times]
+    peak = max(exponents)
+    return peak + math.log(sum(math.exp(x - peak) for x in exponents))
+
+
+def backfill_comment_activity(apps, schema_editor):
+    Post = apps.get_model('webBlog', 'Post')
+    Comment = apps.get_model('webBlog', 'Comment')
+    times = {}
+    for post_id, created_at in (
+        Comment.objects.filter(is_approved=True)
+        .order_by('created_at')
+        .values_list('post_id', 'created_at')
+        .iterator()
+    ):
+        times.setdefault(post_id, []).append(created_at)
+    posts = list(Post.objects.filter(pk__in=list(times)).only('pk'))
+    for post in posts:
+        post.last_comment_at = times[post.pk][-1]
+        post.trending_score = score_from_times(times[post.pk])
+    Post.objects.bulk_update(posts, ['last_comment_at', 'trending_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webBlog', '0005_post_view_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-created_at'], name='post_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(models.OrderBy(django.db.models.functions.comparison.Coalesce('last_comment_at', 'created_at'), descending=True), name='post_active_idx'),
+        ),
+        migrations.RunPython(backfill_comment_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webBlog', '0006_post_trending_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
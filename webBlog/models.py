@@ -1,6 +1,119 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .caching import POST_STATS, bump, cached_html, comments_namespace
+from .templatetags.markdown_extras import MARKDOWN_VERSION, markdown_to_html, markdown_to_html_safe
+from .trending import add_comments_expression, remove_comments_from_score, score_from_times, window_start
+
+
+def _clear_html_on_save(instance, save_kwargs):
+    """Mark content_html outdated when content is (or may be) being changed.
+
+    The post_save signal queues a task that renders it again; until then
+    rendered_content() renders on demand. Instances loaded from the database
+    keep their HTML if their content is still what was loaded.
+    """
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None and 'content' not in update_fields:
+        return
+    loaded = getattr(instance, '_loaded_content', None)
+    if not instance._state.adding and loaded is not None and loaded == instance.content:
+        return
+    instance.content_html = ''
+    instance.content_html_version = 0
+    if update_fields is not None:
+        save_kwargs['update_fields'] = {*update_fields, 'content_html', 'content_html_version'}
+
+
+class PostQuerySet(models.QuerySet):
+    def refresh_comment_totals(self):
+        """Recompute the denormalized comment_total from the comments table"""
+        totals = (
+            Comment.objects.approved().filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return self.update(comment_total=Coalesce(Subquery(totals), 0))
+
+    def refresh_comment_activity(self):
+        """Recompute last_comment_at and trending_score from approved comments"""
+        posts = list(self.order_by().only('pk'))
+        times = {}
+        for post_id, created_at in (
+            Comment.objects.approved().filter(post__in=[post.pk for post in posts])
+            .order_by('created_at')
+            .values_list('post_id', 'created_at')
+            .iterator()
+        ):
+            times.setdefault(post_id, []).append(created_at)
+        for post in posts:
+            post_times = times.get(post.pk, [])
+            post.last_comment_at = post_times[-1] if post_times else None
+            post.trending_score = score_from_times(post_times)
+        return Post.objects.bulk_update(posts, ['last_comment_at', 'trending_score'], batch_size=500)
+
+    def refresh_comment_stats(self):
+        """Recompute every denormalized comment field"""
+        self.refresh_comment_totals()
+        self.refresh_comment_activity()
+
+    def add_comment_activity(self, times_by_post):
+        """Count newly approved comments, given as ``{post_id: [created_at, ...]}``"""
+        for post_id, times in times_by_post.items():
+            newest = max(times)
+            self.filter(pk=post_id).update(
+                comment_total=F('comment_total') + len(times),
+                last_comment_at=Greatest(Coalesce('last_comment_at', Value(newest)), Value(newest)),
+                trending_score=add_comments_expression(times),
+            )
+
+    def remove_comment_activity(self, times_by_post):
+        """Uncount approved comments that were deleted or hidden
+
+        Args:
+            times_by_post (dict): ``{post_id: [created_at, ...]}`` of the
+                comments, called once they are gone.
+        """
+        using = self._db or router.db_for_write(self.model)
+        for post_id, times in times_by_post.items():
+            with transaction.atomic(using=using):
+                # Locked so that a comment added meanwhile is not lost.
+                score = (
+                    self.using(using).select_for_update().filter(pk=post_id)
+                    .values_list('trending_score', flat=True).first()
+                )
+                if score is None:
+                    continue
+                remaining = Comment.objects.using(using).approved().filter(post_id=post_id)
+                latest = remaining.aggregate(latest=Max('created_at'))['latest']
+                if latest is None:
+                    score = 0.0
+                else:
+                    score = remove_comments_from_score(score, times)
+                    if score is None:
+                        score = score_from_times(
+                            remaining.filter(created_at__gte=window_start(latest)).values_list('created_at', flat=True)
+                        )
+                self.using(using).filter(pk=post_id).update(
+                    comment_total=Greatest(F('comment_total') - len(times), Value(0)),
+                    last_comment_at=latest,
+                    trending_score=score,
+                )
+
+    def trending(self):
+        """Most recent comment activity first, with older activity decayed"""
+        return self.order_by('-trending_score', '-created_at')
+
+    def recently_active(self):
+        """Latest comment (or creation, for posts without comments) first"""
+        return self.order_by(Coalesce('last_comment_at', 'created_at').desc())
 
 
 class Post(models.Model):
@@ -11,15 +124,62 @@ class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Number of approved comments, denormalized so list pages and the admin
+    # never COUNT comments per row.
+    # Kept up to date by Comment.save()/delete() and bulk paths through
+    # PostQuerySet.add_comment_activity()/remove_comment_activity();
+    # refresh_comment_stats() recomputes it from scratch.
+    comment_total = models.PositiveIntegerField(default=0, editable=False)
+    # Written in batches by webBlog.view_counter; views still in the buffer
+    # are added on top by ViewCountBuffer.apply_pending().
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+    # Maintained by Comment.save() for the trending and active sorts; see
+    # webBlog/trending.py for the score.
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+    # Rendered markdown, refreshed by a task after each save and by
+    # `manage.py rerendermarkdown` after MARKDOWN_VERSION changes.
+    content_html = models.TextField(blank=True, editable=False)
+    content_html_version = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    # Maintained with UPDATE ... SET col = col + n; a regular save() of a
+    # stale instance must not write them back.
+    DENORMALIZED_FIELDS = ('comment_total', 'view_count', 'last_comment_at', 'trending_score')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that save() only clears content_html when the
+        # content actually changed.
+        instance._loaded_content = instance.__dict__.get('content')
+        return instance
+
+    def save(self, *args, **kwargs):
+        _clear_html_on_save(self, kwargs)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_content = self.content
 
     def get_absolute_url(self):
         return reverse('blog:post_detail', kwargs={'pk': self.pk})
 
+    def rendered_content(self):
+        """Stored HTML, or a cached render if it predates MARKDOWN_VERSION"""
+        if self.content_html_version == MARKDOWN_VERSION:
+            return mark_safe(self.content_html)
+        return cached_html(self.content, markdown_to_html)
+
     def comment_count(self):
         return self.comments.count()
     
     def get_sorted_comments(self, sort_order='oldest'):
-        """Get comments sorted by creation date
+        """Get approved comments sorted by creation date
         
         Args:
             sort_order (str): 'oldest' for ascending, 'newest' for descending
@@ -28,9 +188,9 @@ class Post(models.Model):
             QuerySet: Sorted comments
         """
         if sort_order == 'newest':
-            return self.comments.all().order_by('-created_at')
+            return self.comments.approved().order_by('-created_at')
         else:  # default to 'oldest'
-            return self.comments.all().order_by('created_at')
+            return self.comments.approved().order_by('created_at')
 
     def __str__(self):
         return self.title
@@ -39,6 +199,46 @@ class Post(models.Model):
         ordering = ['-created_at']
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
+        indexes = [
+            models.Index(fields=['created_at'], name='post_created_at_idx'),
+            models.Index(fields=['-trending_score', '-created_at'], name='post_trending_idx'),
+            models.Index(Coalesce('last_comment_at', 'created_at').desc(), name='post_active_idx'),
+        ]
+
+
+def _times_by_post(rows):
+    """Group ``(post_id, created_at)`` rows into ``{post_id: [created_at, ...]}``."""
+    times = {}
+    for post_id, created_at in rows:
+        times.setdefault(post_id, []).append(created_at)
+    return times
+
+
+class CommentQuerySet(models.QuerySet):
+    def approved(self):
+        """Comments visible to the public"""
+        return self.filter(is_approved=True)
+
+    def approve(self):
+        """Approve every comment in the queryset with a single UPDATE"""
+        return self._set_approval(True)
+
+    def unapprove(self):
+        """Hide every comment in the queryset with a single UPDATE"""
+        return self._set_approval(False)
+
+    def _set_approval(self, approved):
+        changing = self.exclude(is_approved=approved)
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            times = _times_by_post(changing.select_for_update().order_by().values_list('post_id', 'created_at'))
+            updated = changing.update(is_approved=approved)
+            if approved:
+                Post.objects.add_comment_activity(times)
+            else:
+                Post.objects.remove_comment_activity(times)
+        if updated:
+            bump(POST_STATS, *map(comments_namespace, times))
+        return updated
 
 
 class Comment(models.Model):
@@ -48,14 +248,142 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_approved = models.BooleanField(default=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    content_html = models.TextField(blank=True, editable=False)
+    content_html_version = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CommentQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that save() only recomputes the post's comment
+        # fields when the approval actually changed, and only clears
+        # content_html when the content did.
+        instance._loaded_is_approved = instance.__dict__.get('is_approved')
+        instance._loaded_content = instance.__dict__.get('content')
+        return instance
 
     def get_absolute_url(self):
         return f"{self.post.get_absolute_url()}#comment-{self.id}"
 
+    def rendered_content(self):
+        """Stored HTML, or a cached render if it predates MARKDOWN_VERSION"""
+        if self.content_html_version == MARKDOWN_VERSION:
+            return mark_safe(self.content_html)
+        return cached_html(self.content, markdown_to_html_safe)
+
+    def save(self, *args, **kwargs):
+        _clear_html_on_save(self, kwargs)
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            if self.is_approved:
+                Post.objects.add_comment_activity({self.post_id: [self.created_at]})
+        else:
+            loaded = getattr(self, '_loaded_is_approved', None)
+            if loaded is None:
+                # Not loaded from the database, so the change is unknown.
+                Post.objects.filter(pk=self.post_id).refresh_comment_stats()
+            elif loaded != self.is_approved:
+                if self.is_approved:
+                    Post.objects.add_comment_activity({self.post_id: [self.created_at]})
+                else:
+                    Post.objects.remove_comment_activity({self.post_id: [self.created_at]})
+        self._loaded_is_approved = self.is_approved
+        self._loaded_content = self.content
+
+    def delete(self, *args, **kwargs):
+        # Replies are cascaded too, so uncount every approved one of them.
+        ids = [self.pk]
+        level = ids
+        while level:
+            level = list(Comment.objects.filter(parent_id__in=level).values_list('pk', flat=True))
+            ids.extend(level)
+        times = _times_by_post(Comment.objects.approved().filter(pk__in=ids).values_list('post_id', 'created_at'))
+        result = super().delete(*args, **kwargs)
+        Post.objects.remove_comment_activity(times)
+        return result
+
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
 
     class Meta:
         ordering = ['created_at']
         verbose_name = "Comment"
-        verbose_name_plural = "Comments"
\ No newline at end of file
+        verbose_name_plural = "Comments"
+        indexes = [
+            models.Index(fields=['created_at'], name='comment_created_at_idx'),
+            models.Index(fields=['post', 'created_at'], name='comment_post_created_idx'),
+            # Public comment lists only ever read approved rows.
+            models.Index(
+                fields=['post', 'created_at'],
+                name='comment_approved_post_idx',
+                condition=Q(is_approved=True),
+            ),
+            # The moderation queue.
+            models.Index(
+                fields=['created_at'],
+                name='comment_pending_idx',
+                condition=Q(is_approved=False),
+            ),
+        ]
+
+
+class MediaFile(models.Model):
+    """An uploaded file, stored once per distinct content (see webBlog/uploads.py)"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    extension = models.CharField(max_length=10)
+    uploaded_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='media_files'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def get_path(self):
+        from .uploads import upload_path
+        return upload_path(self.sha256, self.extension)
+
+    def get_absolute_url(self):
+        from .uploads import upload_url
+        return upload_url(self.sha256, self.extension)
+
+    def __str__(self):
+        return f'{self.sha256}{self.extension}'
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Media File"
+        verbose_name_plural = "Media Files"
+
+
+class Task(models.Model):
+    """A queued side effect of a write (see webBlog/tasks.py)"""
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed')]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    # Hash of name and args; identical pending tasks are stored once.
+    dedupe_key = models.CharField(max_length=40)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name}{tuple(self.args)}'
+
+    class Meta:
+        ordering = ['run_at']
+        verbose_name = "Task"
+        verbose_name_plural = "Tasks"
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=Q(status='pending'), name='task_pending_dedupe',
+            ),
+        ]
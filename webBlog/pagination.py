@@ -0,0 +1,66 @@
+"""Pagination that avoids exact ``COUNT(*)`` on large tables.
+
+On PostgreSQL an unfiltered queryset is counted from the planner statistics in
+``pg_class.reltuples``, which is free, instead of a sequential scan. Filtered
+querysets and tables below ``ESTIMATED_COUNT_THRESHOLD`` rows are still counted
+exactly, since the estimate is only meaningful for the whole table and small
+counts are cheap anyway.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def table_row_estimate(queryset):
+    """Return the planner's row estimate for the queryset's table, or None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been vacuumed or analyzed.
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def is_unfiltered(queryset):
+    query = queryset.query
+    return not query.where and not query.distinct and query.low_mark == 0 and query.high_mark is None
+
+
+def estimated_count(queryset, threshold=None):
+    """Count ``queryset``, estimating when exact counting would be expensive.
+
+    Returns:
+        tuple: ``(count, is_estimate)``
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 100_000)
+    if is_unfiltered(queryset):
+        estimate = table_row_estimate(queryset)
+        if estimate is not None and estimate >= threshold:
+            return estimate, True
+    return queryset.count(), False
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose ``count`` may come from table statistics.
+
+    ``count_is_estimated`` tells callers whether the total is approximate.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        count, self.count_is_estimated = estimated_count(self.object_list)
+        return count
@@ -0,0 +1,167 @@
+"""Slow-query logging for the blog.
+
+``SlowQueryLogger`` is installed with ``connection.execute_wrapper`` (see
+``SlowQueryLogMiddleware``) and records every query slower than
+``SLOW_QUERY_THRESHOLD_MS``. Queries are grouped by a normalized SQL
+fingerprint so that the same ORM call with different parameters ends up in
+one aggregate bucket.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+logger = logging.getLogger('webBlog.slow_queries')
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.I)
+_VALUES_RE = re.compile(r'\bVALUES\s*(?:\([^()]*\)\s*,?\s*)+', re.I)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Frames from these locations are noise when trying to find the calling code.
+_SKIPPED_FRAMES = (
+    __file__,
+    os.path.dirname(django.__file__),
+    'site-packages',
+    'dist-packages',
+)
+
+
+def fingerprint(sql):
+    """Normalize ``sql`` so queries differing only in literals compare equal."""
+    sql = _COMMENT_RE.sub(' ', sql)
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _VALUES_RE.sub('VALUES (...) ', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def trimmed_stack(depth=None):
+    """Return the innermost project frames as ``path:line in function`` strings."""
+    if depth is None:
+        depth = getattr(settings, 'SLOW_QUERY_STACK_DEPTH', 5)
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if any(skip in filename for skip in _SKIPPED_FRAMES):
+            continue
+        if filename.startswith(base_dir):
+            filename = str(Path(filename).relative_to(base_dir))
+        frames.append(f'{filename}:{frame.lineno} in {frame.name}')
+        if len(frames) >= depth:
+            break
+    return frames
+
+
+class QueryStats:
+    """Thread-safe, in-memory aggregate of slow queries keyed by fingerprint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, sql_fingerprint, duration_ms, view_name, stack):
+        with self._lock:
+            entry = self._entries.get(sql_fingerprint)
+            if entry is None:
+                entry = self._entries[sql_fingerprint] = {
+                    'fingerprint': sql_fingerprint,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'views': {},
+                    'stack': stack,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['views'][view_name] = entry['views'].get(view_name, 0) + 1
+            if duration_ms >= entry['max_ms']:
+                entry['max_ms'] = duration_ms
+                entry['stack'] = stack
+
+    def top(self, limit=20, sort='total_ms'):
+        """Return the worst ``limit`` fingerprints ordered by ``sort``."""
+        with self._lock:
+            entries = [dict(entry, views=dict(entry['views'])) for entry in self._entries.values()]
+        for entry in entries:
+            entry['avg_ms'] = entry['total_ms'] / entry['count']
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+slow_query_stats = QueryStats()
+
+
+class SlowQueryLogger:
+    """``execute_wrapper`` callable that records queries over the threshold.
+
+    Args:
+        request: the current request, used to name the calling view once URL
+            resolution has happened.
+        threshold_ms (float): defaults to ``settings.SLOW_QUERY_THRESHOLD_MS``.
+        stats (QueryStats): aggregate to record into.
+        label (str): name to record when there is no request to resolve.
+        log (bool): also emit a warning on the ``webBlog.slow_queries`` logger.
+    """
+
+    def __init__(self, request=None, threshold_ms=None, stats=None, label=None, log=True):
+        self.request = request
+        self.label = label
+        self.log = log
+        if threshold_ms is None:
+            threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+        self.threshold_ms = threshold_ms
+        self.stats = stats if stats is not None else slow_query_stats
+
+    @property
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        if match is not None:
+            return match.view_name
+        if self.request is not None:
+            return self.request.path
+        return self.label or '<no request>'
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.record(sql, duration_ms, context)
+
+    def record(self, sql, duration_ms, context):
+        sql_fingerprint = fingerprint(sql)
+        view_name = self.view_name
+        stack = trimmed_stack()
+        self.stats.record(sql_fingerprint, duration_ms, view_name, stack)
+        if not self.log:
+            return
+        logger.warning(
+            'Slow query (%.1f ms) on %s in %s: %s',
+            duration_ms,
+            context['connection'].alias,
+            view_name,
+            sql_fingerprint,
+            extra={'duration_ms': duration_ms, 'view': view_name, 'stack': stack},
+        )
@@ -0,0 +1,186 @@
+"""Batch re-rendering of stored post and comment HTML.
+
+After ``MARKDOWN_VERSION`` is bumped, every row whose ``content_html_version``
+is older is re-rendered. The parent process streams ``(pk, content)`` chunks
+in primary key order and writes results back with ``bulk_update``; rendering
+itself happens in a process pool whose workers each build their Markdown
+engines once. Workers never touch the database.
+
+Since finished rows carry the current version, an interrupted run resumes by
+simply running it again. With ``force`` (re-rendering rows that are already
+current), resume with ``start_after`` set to the last reported position.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import django
+from django.apps import apps
+from django.db import connections, transaction
+
+from .images import schedule_post_images
+from .tasks import task
+from .templatetags.markdown_extras import (
+    MARKDOWN_VERSION, comment_markdown, post_markdown, render_comment_html, render_post_html,
+)
+
+# Models are imported inside functions: spawned workers import this module
+# before _init_worker() has set Django up.
+
+RENDERERS = {
+    'post': (post_markdown, render_post_html),
+    'comment': (comment_markdown, render_comment_html),
+}
+
+_worker_engines = {}
+
+
+def _init_worker():
+    # Rendering reads image metadata through settings (webBlog/images.py);
+    # needed when workers are spawned rather than forked.
+    if not apps.ready:
+        django.setup()
+    for kind, (factory, _) in RENDERERS.items():
+        _worker_engines[kind] = factory()
+
+
+def _render_chunk(kind, rows):
+    render = RENDERERS[kind][1]
+    md = _worker_engines[kind]
+    return [(pk, render(content, md)) for pk, content in rows]
+
+
+class _InlineExecutor:
+    """Runs tasks immediately in this process (for ``workers <= 1``)."""
+
+    def __init__(self):
+        _init_worker()
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def _write(model, kind, rendered, originals):
+    objs = [
+        model(pk=pk, content_html=html, content_html_version=MARKDOWN_VERSION)
+        for pk, html in rendered
+    ]
+    with transaction.atomic():
+        model.objects.bulk_update(objs, ['content_html', 'content_html_version'], batch_size=len(objs) or 1)
+        # Rows edited while their chunk was rendering must get HTML for
+        # their new content, not ours.
+        edited = [
+            (pk, content)
+            for pk, content in model.objects.filter(pk__in=list(originals)).values_list('pk', 'content')
+            if content != originals[pk]
+        ]
+        render = RENDERERS[kind][1]
+        for pk, content in edited:
+            model.objects.filter(pk=pk).update(
+                content_html=render(content), content_html_version=MARKDOWN_VERSION
+            )
+
+
+@task
+def render_saved_html(kind, pk):
+    """Store ``content_html`` for a post or comment that was just saved.
+
+    Queued by the post_save signals. The content is rendered afresh rather
+    than taken from ``cached_html()``, whose entries may predate the image
+    metadata (dimensions, variants) the stored HTML should carry.
+    """
+    model = apps.get_model('webBlog', kind)
+    content = model.objects.filter(pk=pk).values_list('content', flat=True).first()
+    if content is None:
+        return
+    html = RENDERERS[kind][1](content)
+    # Skipped if the row was edited meanwhile; its own task renders it.
+    updated = model.objects.filter(pk=pk, content=content).update(
+        content_html=html, content_html_version=MARKDOWN_VERSION
+    )
+    if updated and kind == 'post':
+        schedule_post_images(pk, html)
+
+
+def rerender_markdown(model, chunk_size=500, workers=None, force=False, start_after=0, pause=0.0, progress=None):
+    """Re-render ``content_html`` for every outdated row of ``model``.
+
+    Args:
+        model: ``Post`` or ``Comment``.
+        chunk_size (int): rows per worker task and per ``bulk_update``.
+        workers (int): rendering processes; defaults to the number of CPUs.
+            ``1`` or less renders in this process.
+        force (bool): also re-render rows already at ``MARKDOWN_VERSION``.
+        start_after (int): skip rows with a primary key up to this one.
+        pause (float): seconds to sleep after each write, to limit the load
+            on the database.
+        progress: optional callable receiving ``(done, total, resume_pk)``;
+            ``resume_pk`` is safe to pass back as ``start_after``.
+
+    Returns:
+        int: number of rows re-rendered.
+    """
+    from .models import Comment, Post
+
+    kind = {Post: 'post', Comment: 'comment'}[model]
+    queryset = model.objects.filter(pk__gt=start_after).order_by('pk')
+    if not force:
+        queryset = queryset.exclude(content_html_version=MARKDOWN_VERSION)
+    total = queryset.count()
+
+    workers = os.cpu_count() if workers is None else workers
+    if workers > 1:
+        # Don't let forked workers inherit the parent's database sockets.
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        max_in_flight = workers * 2
+    else:
+        executor = _InlineExecutor()
+        max_in_flight = 1
+
+    done = 0
+    last_read = start_after
+    exhausted = False
+    # Submission order, so the resume position only moves past chunks
+    # that finished along with every chunk before them.
+    chunks = []
+    pending = {}
+    resume_pk = start_after
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                rows = list(queryset.filter(pk__gt=last_read).values_list('pk', 'content')[:chunk_size])
+                if not rows:
+                    exhausted = True
+                    break
+                last_read = rows[-1][0]
+                chunk = {'last_pk': last_read, 'done': False}
+                chunks.append(chunk)
+                pending[executor.submit(_render_chunk, kind, rows)] = (chunk, dict(rows))
+            if not pending:
+                break
+
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk, originals = pending.pop(future)
+                rendered = future.result()
+                _write(model, kind, rendered, originals)
+                chunk['done'] = True
+                done += len(rendered)
+                while chunks and chunks[0]['done']:
+                    resume_pk = chunks.pop(0)['last_pk']
+                if progress is not None:
+                    progress(done, total, resume_pk)
+                if pause:
+                    time.sleep(pause)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return done
@@ -0,0 +1,46 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import POST_STATS, POSTS, bump, comments_namespace
+from .comment_stream import publish_comment
+from .feeds import warm_feeds
+from .models import Comment, Post
+from .rerender import render_saved_html
+from .sitemaps import section_namespace, section_of
+from .templatetags.markdown_extras import MARKDOWN_VERSION
+
+
+# Cache invalidation stays synchronous: a version bump is one cache write,
+# and authors must see their change on the page they are redirected to.
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_caches(sender, instance, **kwargs):
+    bump(POSTS, comments_namespace(instance.pk), section_namespace(section_of(instance.pk)))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_caches(sender, instance, **kwargs):
+    bump(POST_STATS, comments_namespace(instance.post_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def queue_rendering(sender, instance, **kwargs):
+    if instance.content_html_version != MARKDOWN_VERSION:
+        render_saved_html.enqueue(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def queue_feeds(sender, instance, **kwargs):
+    if settings.FEED_BASE_URL:
+        warm_feeds.enqueue(instance.pk if sender is Post else instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def stream_new_comment(sender, instance, created, **kwargs):
+    if created and instance.is_approved:
+        transaction.on_commit(partial(publish_comment, instance))
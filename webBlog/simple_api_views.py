@@ -1,12 +1,41 @@
+from django.conf import settings
+from django.core.cache import caches
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from functools import wraps
 import json
 from .models import Post, Comment
+from .cache_backends import cache_stats
+from .caching import POST_STATS, POSTS, cached_or_stale, comments_namespace
+from .fast_delete import delete_comments
+from .fast_serializers import (
+    COMMENT_COLUMNS, POST_COLUMNS, POST_LIST_COLUMNS, FastJsonResponse, FieldSelectionError, Selection,
+    approved_comments, comments_by_post, parse_selection, posts_by_ids, serialize_comments,
+    serialize_post, serialize_post_list,
+)
+from .memory_profiling import memory_profiler
+from .pagination import EstimatedCountPaginator
+from .query_log import slow_query_stats
+from .uploads import HashingUploadHandler, discard_uploads, store_upload
+from .view_counter import view_counter
+
+
+# Largest value of the BigAutoField primary keys.
+MAX_POST_ID = 2 ** 63 - 1
+
+
+def staff_required(view_func):
+    """Return a JSON 403 instead of redirecting when the user is not staff."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return JsonResponse({'error': 'Staff access required'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
 
 
 @require_http_methods(["GET"])
@@ -19,9 +48,13 @@ def api_status(request):
         'endpoints': {
             'posts': {
                 'list': '/api/posts/',
+                'batch': '/api/posts/?ids=1,2,3',
                 'detail': '/api/posts/{id}/',
                 'create': '/api/posts/create/',
             },
+            'media': {
+                'upload': '/api/media/',
+            },
             'comments': {
                 'list': '/api/posts/{post_id}/comments/',
                 'create': '/api/posts/{post_id}/comments/create/',
@@ -55,9 +88,63 @@ def auth_status(request):
         })
 
 
+def _multi_get(request, ids):
+    """Posts for ``ids`` in request order, reporting the ones that don't exist."""
+    try:
+        selection, include = parse_selection(request.GET, POST_LIST_COLUMNS)
+    except FieldSelectionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        post_ids = list(dict.fromkeys(int(post_id) for post_id in ids))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'ids must be a list of post ids'}, status=400)
+    if any(not 0 < post_id <= MAX_POST_ID for post_id in post_ids):
+        return JsonResponse({'error': f'ids must be between 1 and {MAX_POST_ID}'}, status=400)
+    if len(post_ids) > settings.API_MULTI_GET_MAX:
+        return JsonResponse({'error': f'At most {settings.API_MULTI_GET_MAX} ids per request'}, status=400)
+
+    found = posts_by_ids(post_ids, selection)
+    posts_data = [dict(found[post_id]) for post_id in post_ids if post_id in found]
+    if 'view_count' in selection.fields:
+        pending = view_counter.pending(found)
+        for post in posts_data:
+            post['view_count'] += pending.get(post['id'], 0)
+    if 'comments' in include:
+        comments = comments_by_post(
+            list(found),
+            Selection(COMMENT_COLUMNS, author='author' in include),
+            request.GET.get('comment_sort', 'oldest'),
+        )
+        for post in posts_data:
+            post['comments'] = comments[post['id']]
+    return FastJsonResponse({
+        'posts': posts_data,
+        'missing': [post_id for post_id in post_ids if post_id not in found],
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def posts_batch(request):
+    """Multi-get with the ids in a JSON body, for lists too long for a URL."""
+    try:
+        ids = json.loads(request.body).get('ids')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(ids, list):
+        return JsonResponse({'error': 'ids must be a list of post ids'}, status=400)
+    return _multi_get(request, ids)
+
+
 @require_http_methods(["GET"])
 def posts_list(request):
+    if 'ids' in request.GET:
+        return _multi_get(request, [post_id for post_id in request.GET['ids'].split(',') if post_id.strip()])
     sort_by = request.GET.get('sort', 'newest')
+    try:
+        selection, include = parse_selection(request.GET, POST_LIST_COLUMNS)
+    except FieldSelectionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     if sort_by == 'oldest':
         posts = Post.objects.all().order_by('created_at')
@@ -65,35 +152,52 @@ def posts_list(request):
         posts = Post.objects.all().order_by('-updated_at')
     elif sort_by == 'updated_oldest':
         posts = Post.objects.all().order_by('updated_at')
+    elif sort_by == 'trending':
+        posts = Post.objects.trending()
+    elif sort_by == 'active':
+        posts = Post.objects.recently_active()
     else:
         posts = Post.objects.all().order_by('-created_at')
     
     page_size = int(request.GET.get('page_size', 10))
     page_number = int(request.GET.get('page', 1))
-    paginator = Paginator(posts, page_size)
-    page = paginator.get_page(page_number)
     
-    posts_data = []
-    for post in page:
-        posts_data.append({
-            'id': post.id,
-            'title': post.title,
-            'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
-            'author': post.author.username,
-            'created_at': post.created_at.isoformat(),
-            'updated_at': post.updated_at.isoformat(),
-            'comment_count': post.comments.count(),
-        })
+    def compute():
+        paginator = EstimatedCountPaginator(selection.values_list(posts), page_size)
+        page = paginator.get_page(page_number)
+        return {
+            'posts': serialize_post_list(list(page), selection),
+            'pagination': {
+                'current_page': page.number,
+                'total_pages': paginator.num_pages,
+                'total_posts': paginator.count,
+                'total_is_approximate': paginator.count_is_estimated,
+                'has_next': page.has_next(),
+                'has_previous': page.has_previous(),
+            },
+        }
     
-    return JsonResponse({
+    # Pending views and comments are added on top of the cached page.
+    data = cached_or_stale(
+        'api-post-list', [POSTS, POST_STATS], compute, sort_by, selection.cache_key, page_number, page_size,
+    )
+    posts_data = data['posts']
+    if 'view_count' in selection.fields:
+        pending = view_counter.pending(post['id'] for post in posts_data)
+        for post in posts_data:
+            post['view_count'] += pending.get(post['id'], 0)
+    if 'comments' in include:
+        comments = comments_by_post(
+            [post['id'] for post in posts_data],
+            Selection(COMMENT_COLUMNS, author='author' in include),
+            request.GET.get('comment_sort', 'oldest'),
+        )
+        for post in posts_data:
+            post['comments'] = comments[post['id']]
+    
+    return FastJsonResponse({
         'posts': posts_data,
-        'pagination': {
-            'current_page': page.number,
-            'total_pages': paginator.num_pages,
-            'total_posts': paginator.count,
-            'has_next': page.has_next(),
-            'has_previous': page.has_previous(),
-        },
+        'pagination': data['pagination'],
         'sort': sort_by
     })
 
@@ -101,39 +205,32 @@ def posts_list(request):
 @require_http_methods(["GET"])
 def post_detail(request, post_id):
     try:
-        post = Post.objects.get(id=post_id)
-    except Post.DoesNotExist:
-        return JsonResponse({'error': 'Post not found'}, status=404)
-    
-    # Get comment sorting
+        selection, include = parse_selection(request.GET, POST_COLUMNS, default_include=['comments'])
+    except FieldSelectionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     comment_sort = request.GET.get('comment_sort', 'oldest')
-    if comment_sort == 'newest':
-        comments = post.comments.all().order_by('-created_at')
-    else:
-        comments = post.comments.all().order_by('created_at')
     
-    comments_data = []
-    for comment in comments:
-        comments_data.append({
-            'id': comment.id,
-            'author': comment.author.username,
-            'content': comment.content,
-            'created_at': comment.created_at.isoformat(),
-            'is_approved': comment.is_approved,
-        })
+    def compute():
+        post_data = serialize_post(post_id, selection)
+        if post_data is not None and 'comments' in include:
+            post_data['comments'] = serialize_comments(
+                approved_comments(post_id, comment_sort),
+                Selection(COMMENT_COLUMNS, author='author' in include),
+            )
+        return post_data
     
-    post_data = {
-        'id': post.id,
-        'title': post.title,
-        'content': post.content,
-        'author': post.author.username,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat(),
-        'comments': comments_data,
-        'comment_count': len(comments_data),
-    }
+    # Post saves bump the comments namespace too.
+    post_data = cached_or_stale(
+        'api-post', [comments_namespace(post_id)], compute,
+        post_id, selection.cache_key, ','.join(sorted(include)), comment_sort,
+    )
+    if post_data is None:
+        return JsonResponse({'error': 'Post not found'}, status=404)
+    if 'view_count' in post_data:
+        post_data['view_count'] += view_counter.pending([post_id]).get(post_id, 0)
+    view_counter.add(post_id)
     
-    return JsonResponse(post_data)
+    return FastJsonResponse(post_data)
 
 
 @csrf_exempt
@@ -171,31 +268,50 @@ def create_post(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+def upload_media(request):
+    # Must be replaced before request.FILES is read.
+    handler = HashingUploadHandler(request)
+    request.upload_handlers = [handler]
+    try:
+        upload = request.FILES.get('file')
+        if handler.too_large:
+            return JsonResponse({'error': f'Files are limited to {settings.UPLOAD_MAX_BYTES} bytes'}, status=413)
+        if upload is None:
+            return JsonResponse({'error': 'A file is required'}, status=400)
+        media_file, created = store_upload(upload, request.user)
+    finally:
+        # Files under other field names, or extra ones, are never stored.
+        discard_uploads(request.FILES)
+    if media_file is None:
+        return JsonResponse({'error': 'Only PNG, JPEG, GIF and WebP images are accepted'}, status=415)
+    url = media_file.get_absolute_url()
+    return JsonResponse({
+        'url': url,
+        'sha256': media_file.sha256,
+        'size': media_file.size,
+        'content_type': media_file.content_type,
+        'markdown': f'![]({url})',
+        'created': created,
+    }, status=201 if created else 200)
+
+
 @require_http_methods(["GET"])
 def post_comments(request, post_id):
     try:
-        post = Post.objects.get(id=post_id)
-    except Post.DoesNotExist:
+        selection, _ = parse_selection(request.GET, COMMENT_COLUMNS)
+    except FieldSelectionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not Post.objects.filter(pk=post_id).exists():
         return JsonResponse({'error': 'Post not found'}, status=404)
     
     # Get comment sorting
     comment_sort = request.GET.get('comment_sort', 'oldest')
-    if comment_sort == 'newest':
-        comments = post.comments.all().order_by('-created_at')
-    else:
-        comments = post.comments.all().order_by('created_at')
-    
-    comments_data = []
-    for comment in comments:
-        comments_data.append({
-            'id': comment.id,
-            'author': comment.author.username,
-            'content': comment.content,
-            'created_at': comment.created_at.isoformat(),
-            'is_approved': comment.is_approved,
-        })
+    comments_data = serialize_comments(approved_comments(post_id, comment_sort), selection)
     
-    return JsonResponse({
+    return FastJsonResponse({
         'post_id': post_id,
         'comments': comments_data,
         'comment_count': len(comments_data),
@@ -242,6 +358,54 @@ def create_comment(request, post_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@require_http_methods(["POST"])
+@staff_required
+def moderate_comments(request):
+    """Approve, unapprove or delete comments in bulk (staff only)
+    
+    Body: {"action": "approve"|"unapprove"|"delete", plus any of
+    "ids": [...], "author": user_id, "post": post_id}. Filters are combined,
+    so {"action": "delete", "author": 7} removes everything by user 7.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+    
+    action = data.get('action')
+    if action not in ('approve', 'unapprove', 'delete'):
+        return JsonResponse({'error': 'Action must be approve, unapprove or delete'}, status=400)
+    
+    filters = {}
+    try:
+        if 'ids' in data:
+            filters['pk__in'] = [int(pk) for pk in data['ids']]
+        if 'author' in data:
+            filters['author_id'] = int(data['author'])
+        if 'post' in data:
+            filters['post_id'] = int(data['post'])
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'ids, author and post must be numeric'}, status=400)
+    if not filters:
+        return JsonResponse({'error': 'At least one of ids, author or post is required'}, status=400)
+    
+    comments = Comment.objects.filter(**filters)
+    if action == 'approve':
+        affected = comments.approve()
+    elif action == 'unapprove':
+        affected = comments.unapprove()
+    else:
+        affected = delete_comments(comments)
+    
+    return JsonResponse({
+        'message': f'Comments {action}d',
+        'action': action,
+        'affected': affected,
+    })
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_login(request):
@@ -313,4 +477,75 @@ def api_logout(request):
     """Simple API logout"""
     from django.contrib.auth import logout
     logout(request)
-    return JsonResponse({'message': 'Logout successful'})
\ No newline at end of file
+    return JsonResponse({'message': 'Logout successful'})
+
+
+@require_http_methods(["GET", "DELETE"])
+@staff_required
+def slow_queries(request):
+    """Dump (GET) or reset (DELETE) the aggregated slow-query log"""
+    if request.method == 'DELETE':
+        slow_query_stats.reset()
+        return JsonResponse({'message': 'Slow query log cleared'})
+    
+    sort_by = request.GET.get('sort', 'total_ms')
+    if sort_by not in ('total_ms', 'max_ms', 'avg_ms', 'count'):
+        return JsonResponse({'error': 'Invalid sort field'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    if limit < 0:
+        return JsonResponse({'error': 'limit must not be negative'}, status=400)
+    
+    return JsonResponse({
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+        'fingerprints': len(slow_query_stats),
+        'queries': slow_query_stats.top(limit=limit, sort=sort_by),
+        'sort': sort_by
+    })
+
+
+@require_http_methods(["GET", "DELETE"])
+@staff_required
+def memory_profile(request):
+    """Per-URL peak sizes and top allocation sites from sampled requests"""
+    if request.method == 'DELETE':
+        memory_profiler.reset()
+        return JsonResponse({'message': 'Memory profile cleared'})
+    
+    try:
+        top_sites = int(request.GET.get('sites', 10))
+    except ValueError:
+        return JsonResponse({'error': 'sites must be a number'}, status=400)
+    if top_sites < 0:
+        return JsonResponse({'error': 'sites must not be negative'}, status=400)
+    
+    return JsonResponse({
+        'tracing': memory_profiler.enabled,
+        'sample_rate': settings.MEMORY_PROFILING_SAMPLE_RATE,
+        'urls': memory_profiler.report(top_sites=top_sites),
+    })
+
+
+@require_http_methods(["GET", "DELETE"])
+@staff_required
+def cache_report(request):
+    """Hit and miss counts per cache tier in this worker"""
+    if request.method == 'DELETE':
+        for alias in cache_stats():
+            caches[alias].reset_stats()
+        return JsonResponse({'message': 'Cache statistics cleared'})
+    
+    return JsonResponse({'caches': cache_stats()})
+
+
+@require_http_methods(["POST"])
+@staff_required
+def memory_snapshot(request):
+    """Dump a tracemalloc snapshot of this worker for `manage.py memdiff`"""
+    try:
+        path = memory_profiler.dump_snapshot()
+    except RuntimeError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    return JsonResponse({'message': 'Snapshot written', 'path': str(path)}, status=201)
\ No newline at end of file
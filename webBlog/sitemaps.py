@@ -0,0 +1,166 @@
+"""``sitemap.xml`` for every post, split into sections by primary key.
+
+Section ``n`` holds the posts with ``(n - 1) * SITEMAP_SECTION_SIZE < pk <=
+n * SITEMAP_SECTION_SIZE``, so a section never grows past the size (which
+must stay below the protocol limit of 50,000 URLs) and a post always stays
+in the same section. Once there is more than one section ``sitemap.xml``
+becomes a sitemap index.
+
+Sections are streamed from keyset-paginated queries (``pk > last``) rather
+than an OFFSET paginator over a materialized list, and the finished XML is
+cached per section until a post in it changes (see ``webBlog/signals.py``).
+"""
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Max, Value
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from .caching import POSTS, versioned_key
+from .models import Post
+from .streaming import streaming_response
+
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+
+
+def section_size():
+    return getattr(settings, 'SITEMAP_SECTION_SIZE', 10_000)
+
+
+def section_of(post_id):
+    return (post_id - 1) // section_size() + 1
+
+
+def section_namespace(section):
+    return f'sitemap:{section}'
+
+
+def _lastmod(value):
+    return value.replace(microsecond=0).isoformat()
+
+
+def section_lastmods():
+    """Return ``[(section, lastmod)]`` for every non-empty section, in one query."""
+    size = section_size()
+    rows = (
+        Post.objects.order_by()
+        .annotate(section=(F('pk') - 1) / Value(size) + 1)
+        .values('section')
+        .annotate(lastmod=Max('updated_at'))
+        .order_by('section')
+    )
+    return [(row['section'], row['lastmod']) for row in rows]
+
+
+def _url_entry(location, lastmod=None):
+    entry = f'<url><loc>{escape(location)}</loc>'
+    if lastmod is not None:
+        entry += f'<lastmod>{_lastmod(lastmod)}</lastmod>'
+    return entry + '</url>\n'
+
+
+def _static_entries(request):
+    for name in ('blog:post_list', 'blog:markdown_guide'):
+        yield _url_entry(request.build_absolute_uri(reverse(name)))
+
+
+def _post_entries(request, section):
+    """Yield ``<url>`` entries for the posts in ``section``, a batch at a time."""
+    size = section_size()
+    last_pk = (section - 1) * size
+    upper = section * size
+    batch_size = getattr(settings, 'SITEMAP_QUERY_BATCH_SIZE', 2000)
+    base = request.build_absolute_uri('/')[:-1]
+    while True:
+        batch = list(
+            Post.objects.filter(pk__gt=last_pk, pk__lte=upper)
+            .order_by('pk')
+            .only('pk', 'updated_at')[:batch_size]
+        )
+        if not batch:
+            return
+        yield ''.join(_url_entry(base + post.get_absolute_url(), post.updated_at) for post in batch)
+        last_pk = batch[-1].pk
+
+
+def _cached_stream(key, chunks):
+    """Stream ``chunks`` and cache the full body once it has been sent."""
+    sent = []
+    for chunk in chunks:
+        sent.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(sent), settings.SITEMAP_CACHE_TIMEOUT)
+
+
+def _serve(request, key, chunks):
+    cached = cache.get(key)
+    if cached is not None:
+        return HttpResponse(cached, content_type=CONTENT_TYPE)
+    return streaming_response(request, _cached_stream(key, chunks), content_type=CONTENT_TYPE)
+
+
+def _urlset(request, section, sections):
+    yield XML_HEADER + URLSET_OPEN
+    if section == sections[0]:
+        yield from _static_entries(request)
+    yield from _post_entries(request, section)
+    yield URLSET_CLOSE
+
+
+def _index(request, sections):
+    yield XML_HEADER + '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for section, lastmod in sections:
+        location = request.build_absolute_uri(reverse('blog:sitemap_section', args=[section]))
+        yield f'<sitemap><loc>{escape(location)}</loc><lastmod>{_lastmod(lastmod)}</lastmod></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def _sections():
+    key, _ = versioned_key('sitemap-sections', [POSTS])
+    sections = cache.get(key)
+    if sections is None:
+        sections = section_lastmods()
+        cache.set(key, sections, settings.SITEMAP_CACHE_TIMEOUT)
+    return sections
+
+
+@require_GET
+def sitemap(request):
+    """A single urlset while the posts fit in one section, an index after that."""
+    sections = _sections()
+    numbers = [section for section, _ in sections] or [1]
+    if len(numbers) == 1:
+        return sitemap_section(request, numbers[0])
+    key, _ = versioned_key('sitemap-index', [POSTS], request.scheme, request.get_host())
+    return _serve(request, key, _index(request, sections))
+
+
+@require_GET
+def sitemap_section(request, section):
+    numbers = [number for number, _ in _sections()] or [1]
+    if section not in numbers:
+        raise Http404('No such sitemap section')
+    key, _ = versioned_key(
+        'sitemap-section', [section_namespace(section)], request.scheme, request.get_host(), section,
+        section == numbers[0],
+    )
+    return _serve(request, key, _urlset(request, section, numbers))
+
+
+@require_GET
+def robots_txt(request):
+    # Posts are discovered through the sitemap, not by paging through every
+    # sort order of the list.
+    lines = [
+        'User-agent: *',
+        'Disallow: /*?page=',
+        'Disallow: /*?sort=',
+        f"Sitemap: {request.build_absolute_uri(reverse('blog:sitemap'))}",
+    ]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain')
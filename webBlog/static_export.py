@@ -0,0 +1,297 @@
+"""Render the blog to static files for a CDN-only mirror.
+
+Post pages, the paginated post list and the post feeds are rendered with the
+regular views and templates into a directory laid out like the site's URLs
+(``post/<pk>/index.html``, ``page/<n>/index.html``, ``feeds/rss.xml``), so it
+can be served by any static file host.
+
+Exports are incremental: ``manifest.json`` records a signature of every
+exported post (``updated_at`` and its denormalized comment fields), and the
+next export only re-renders posts whose signature changed, removes posts that
+no longer exist and, if anything changed, re-renders the list pages and
+feeds. Rendering is spread over a process pool; every file and the manifest
+are written atomically, so an interrupted export leaves a consistent mirror
+and the next run picks up where it stopped.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from math import ceil
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+
+from .internal_requests import internal_request
+
+# Models and views are imported inside functions: spawned workers import this
+# module before _init_worker() has set Django up.
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+# Seconds between manifest checkpoints while an export is running.
+CHECKPOINT_INTERVAL = 30
+
+_PAGE_LINK = re.compile(r'href="\?page=(\d+)"')
+
+
+def post_signature(updated_at, comment_total, last_comment_at):
+    last_comment = last_comment_at.isoformat() if last_comment_at else ''
+    return f'{updated_at.isoformat()}|{comment_total}|{last_comment}'
+
+
+def write_atomic(path, content):
+    """Write ``content`` (bytes) to ``path`` via a temporary file and rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def post_path(output_dir, pk):
+    return Path(output_dir) / 'post' / str(pk) / 'index.html'
+
+
+def list_page_path(output_dir, number):
+    if number == 1:
+        return Path(output_dir) / 'index.html'
+    return Path(output_dir) / 'page' / str(number) / 'index.html'
+
+
+def _static_page_links(html):
+    """Point ``?page=N`` links at the exported ``/page/N/`` files."""
+    return _PAGE_LINK.sub(
+        lambda match: 'href="/"' if match.group(1) == '1' else f'href="/page/{match.group(1)}/"',
+        html,
+    )
+
+
+class Renderer:
+    """Renders pages in-process; one is created per worker and reused."""
+
+    def __init__(self, output_dir, base_url):
+        self.output_dir = Path(output_dir)
+        self.base_url = base_url
+
+    def request(self, path, data=None):
+        from django.contrib.auth.models import AnonymousUser
+
+        request = internal_request(self.base_url, path, data)
+        request.user = AnonymousUser()
+        return request
+
+    def render_post(self, pk):
+        """Write ``post/<pk>/index.html``; returns False if the post is gone."""
+        from .views import PostDetailView
+
+        # Mirrors DetailView.get(), minus counting the render as a view.
+        view = PostDetailView()
+        view.setup(self.request(f'/post/{pk}/'), pk=pk)
+        try:
+            view.object = view.get_object()
+        except Http404:
+            return False
+        response = view.render_to_response(view.get_context_data(object=view.object))
+        write_atomic(post_path(self.output_dir, pk), response.render().content)
+        return True
+
+    def render_list_page(self, number):
+        from .views import PostListView
+
+        response = PostListView.as_view()(self.request('/', {'page': number}))
+        html = _static_page_links(response.render().content.decode())
+        write_atomic(list_page_path(self.output_dir, number), html.encode())
+
+    def render_feeds(self):
+        from . import feeds
+
+        for name, view in (('rss.xml', feeds.posts_rss), ('atom.xml', feeds.posts_atom)):
+            response = view(self.request(f'/feeds/{name.split(".")[0]}/'))
+            write_atomic(self.output_dir / 'feeds' / name, response.content)
+
+
+_worker_renderer = None
+
+
+def _init_worker(output_dir, base_url):
+    global _worker_renderer
+    # Needed when workers are spawned rather than forked.
+    if not apps.ready:
+        django.setup()
+    _worker_renderer = Renderer(output_dir, base_url)
+
+
+def _render_posts(pks):
+    return [pk for pk in pks if _worker_renderer.render_post(pk)], list(pks)
+
+
+def _render_list_pages(numbers):
+    for number in numbers:
+        _worker_renderer.render_list_page(number)
+    return len(numbers)
+
+
+def _render_feeds():
+    _worker_renderer.render_feeds()
+    return 0
+
+
+class _InlineExecutor:
+    """Runs tasks immediately in this process (for ``workers <= 1``)."""
+
+    def __init__(self, initializer, initargs):
+        initializer(*initargs)
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def load_manifest(output_dir):
+    try:
+        manifest = json.loads((Path(output_dir) / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(output_dir, manifest):
+    write_atomic(Path(output_dir) / MANIFEST_NAME, json.dumps(manifest).encode())
+
+
+def export_site(output_dir, base_url='http://localhost', workers=None, full=False, chunk_size=100, progress=None):
+    """Export the blog to ``output_dir``.
+
+    Args:
+        output_dir: directory to write to; created if needed.
+        base_url: scheme and host used for absolute URLs in feeds.
+        workers (int): rendering processes; defaults to the number of CPUs.
+            ``1`` or less renders in this process.
+        full (bool): ignore the manifest and re-render everything.
+        chunk_size (int): posts per task sent to a worker.
+        progress: optional callable receiving ``(done, total)`` page counts.
+
+    Returns:
+        dict: counts of rendered posts, removed posts and list pages.
+    """
+    from .models import Post
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = os.cpu_count() if workers is None else workers
+
+    manifest = None if full else load_manifest(output_dir)
+    exported = dict(manifest['posts']) if manifest else {}
+    list_complete = bool(manifest and manifest.get('list_complete'))
+
+    current = {
+        str(pk): post_signature(updated_at, comment_total, last_comment_at)
+        for pk, updated_at, comment_total, last_comment_at in (
+            Post.objects.order_by('pk')
+            .values_list('pk', 'updated_at', 'comment_total', 'last_comment_at')
+            .iterator(chunk_size=5000)
+        )
+    }
+    to_render = [int(pk) for pk, signature in current.items() if exported.get(pk) != signature]
+    removed = [pk for pk in exported if pk not in current]
+
+    list_changed = not list_complete or to_render or removed
+    page_count = max(1, ceil(len(current) / settings.POSTS_PER_PAGE))
+    pages = list(range(1, page_count + 1)) if list_changed else []
+
+    total = len(to_render) + len(pages)
+    done = 0
+    summary = {'posts': 0, 'removed': len(removed), 'pages': len(pages)}
+
+    if workers > 1:
+        # Children must open their own connections rather than share the
+        # parent's sockets.
+        connections.close_all()
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(str(output_dir), base_url)
+        )
+    else:
+        executor = _InlineExecutor(_init_worker, (str(output_dir), base_url))
+
+    def checkpoint():
+        save_manifest(output_dir, {
+            'version': MANIFEST_VERSION,
+            'posts': exported,
+            'list_complete': list_complete,
+        })
+
+    list_complete = not list_changed
+    list_tasks_left = 0
+    last_checkpoint = time.monotonic()
+    try:
+        pending = set()
+        for start in range(0, len(to_render), chunk_size):
+            pending.add(executor.submit(_render_posts, to_render[start:start + chunk_size]))
+        for start in range(0, len(pages), chunk_size):
+            pending.add(executor.submit(_render_list_pages, pages[start:start + chunk_size]))
+            list_tasks_left += 1
+        if list_changed:
+            pending.add(executor.submit(_render_feeds))
+            list_tasks_left += 1
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                if isinstance(result, tuple):
+                    rendered, attempted = result
+                    for pk in attempted:
+                        if pk in rendered:
+                            exported[str(pk)] = current[str(pk)]
+                        else:
+                            # Deleted since the scan.
+                            removed.append(str(pk))
+                    summary['posts'] += len(rendered)
+                    done += len(attempted)
+                else:
+                    done += result
+                    list_tasks_left -= 1
+                    list_complete = list_tasks_left == 0
+                if progress is not None:
+                    progress(done, total)
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                checkpoint()
+                last_checkpoint = time.monotonic()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Always checkpoint what was exported, so an interrupted run resumes.
+        checkpoint()
+
+    for pk in removed:
+        shutil.rmtree(post_path(output_dir, pk).parent, ignore_errors=True)
+        exported.pop(pk, None)
+    if list_changed:
+        for stale in (output_dir / 'page').glob('*'):
+            if stale.name.isdigit() and int(stale.name) > page_count:
+                shutil.rmtree(stale, ignore_errors=True)
+    checkpoint()
+    summary['removed'] = len(removed)
+    return summary
@@ -0,0 +1,41 @@
+"""Streaming responses that stay streamed under both WSGI and ASGI.
+
+Under ASGI, ``StreamingHttpResponse`` reads a synchronous iterator to the end
+with ``sync_to_async(list)`` before sending anything, so a large body would
+be held in memory. Under WSGI an asynchronous iterator is likewise collected
+into a list. ``streaming_response()`` therefore keeps writing the body as a
+plain generator and, for ASGI requests, hands the response an asynchronous
+iterator that pulls one chunk at a time from it in a worker thread.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+def is_asgi(request):
+    """Whether ``request`` is served by the ASGI application."""
+    return isinstance(request, ASGIRequest)
+
+
+async def iterate_in_thread(iterator):
+    """Yield the items of a synchronous ``iterator`` without blocking the event loop.
+
+    Each item is produced with ``sync_to_async`` (thread sensitive, so
+    database queries use the request's connection), and the iterator is
+    closed if the client goes away before the end.
+    """
+    iterator = iter(iterator)
+    try:
+        while (item := await sync_to_async(next)(iterator, _DONE)) is not _DONE:
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """``StreamingHttpResponse(chunks, **kwargs)`` that streams under either server."""
+    return StreamingHttpResponse(iterate_in_thread(chunks) if is_asgi(request) else chunks, **kwargs)
@@ -0,0 +1,253 @@
+"""A small database-backed queue for the side effects of writes.
+
+Saving a post or comment only writes its row. Rendering its markdown, image
+variants and feeds are queued as tasks and done afterwards, so write
+requests return as soon as the row is committed. A task is a function
+registered with ``@task`` and queued with ``func.enqueue(*args)``:
+
+* Tasks are queued with ``transaction.on_commit``. They never run for a
+  write that was rolled back, and never before the data they read exists.
+* Queueing a task identical to one still pending (same function and
+  arguments) is a no-op, so a burst of saves renders a post once.
+* A failed task is attempted ``TASK_MAX_ATTEMPTS`` times in all. The first
+  retry waits ``TASK_RETRY_DELAY`` seconds and the wait doubles each time.
+  After the last attempt the task is kept with status ``failed`` and its
+  traceback.
+* A task whose worker died is picked up again after ``TASK_LOCK_TIMEOUT``
+  seconds, so tasks must be safe to run twice.
+
+Tasks run on ``TASK_WORKERS`` threads in the process that queued them. With
+``0`` they run right after the commit, which is what the tests use.
+``python manage.py runtasks`` runs them in a separate worker. With
+``TASK_RUNNER = 'worker'``, web processes only queue tasks. Workers claim
+tasks with a conditional UPDATE, so any number of them can share the queue.
+"""
+import hashlib
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+# Models are imported inside functions: webBlog/rerender.py defines a task
+# and is imported by worker processes before Django is set up.
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+FAILED = 'failed'
+
+# Longest wait between two attempts, in seconds.
+MAX_RETRY_DELAY = 3600
+# Due tasks tried per claim; others may win the first ones.
+CLAIM_BATCH = 10
+
+_registry = {}
+_lock = threading.Lock()
+_executor = None
+_draining = 0
+_drain_requested = False
+
+
+def task(func):
+    """Register ``func`` as a task and add ``func.enqueue(*args)``.
+
+    Arguments must be JSON-serializable, so pass ids rather than instances.
+    Calling ``func`` directly still runs it immediately.
+    """
+    name = f'{func.__module__}.{func.__qualname__}'
+    _registry[name] = func
+    func.task_name = name
+    func.enqueue = partial(enqueue, name)
+    return func
+
+
+def dedupe_key(name, args):
+    return hashlib.sha1(json.dumps([name, list(args)], separators=(',', ':')).encode()).hexdigest()
+
+
+def enqueue(name, *args):
+    """Queue the task ``name`` once the current transaction commits."""
+    if name not in _registry:
+        raise LookupError(f'Unknown task {name}')
+    key = dedupe_key(name, args)
+    transaction.on_commit(partial(_insert, name, list(args), key))
+
+
+def _insert(name, args, key):
+    from .models import Task
+
+    # Pending tasks are unique per dedupe_key; duplicates are skipped.
+    Task.objects.bulk_create([Task(name=name, args=args, dedupe_key=key)], ignore_conflicts=True)
+    if settings.TASK_RUNNER != 'thread':
+        return
+    if settings.TASK_WORKERS <= 0:
+        run_pending()
+    else:
+        _kick()
+
+
+def _due(now):
+    # A running task past its lock belongs to a worker that died.
+    return Q(status=PENDING) | Q(status=RUNNING, locked_until__lt=now)
+
+
+def claim():
+    """Mark the next due task as running and return it, or None."""
+    from .models import Task
+
+    now = timezone.now()
+    candidates = list(
+        Task.objects.filter(_due(now), run_at__lte=now).order_by('run_at', 'pk')
+        .values_list('pk', flat=True)[:CLAIM_BATCH]
+    )
+    for pk in candidates:
+        # The UPDATE checks again, so only one worker gets each task.
+        if Task.objects.filter(_due(now), pk=pk).update(
+            status=RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.TASK_LOCK_TIMEOUT),
+        ):
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def run_task(task):
+    """Run a claimed task; returns True if it succeeded."""
+    from .models import Task
+
+    try:
+        func = _registry.get(task.name)
+        if func is None:
+            raise LookupError(f'Unknown task {task.name}')
+        func(*task.args)
+    except Exception:
+        _retry_or_fail(task, traceback.format_exc())
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def _retry_or_fail(task, error):
+    from .models import Task
+
+    if task.attempts >= settings.TASK_MAX_ATTEMPTS:
+        Task.objects.filter(pk=task.pk).update(status=FAILED, locked_until=None, last_error=error)
+        logger.error('Task %s%r failed after %d attempts:\n%s', task.name, tuple(task.args), task.attempts, error)
+        return
+    delay = min(settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1), MAX_RETRY_DELAY)
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=task.pk).update(
+                status=PENDING, run_at=timezone.now() + timedelta(seconds=delay), locked_until=None, last_error=error,
+            )
+    except IntegrityError:
+        # The same task was queued again meanwhile and will do the work.
+        Task.objects.filter(pk=task.pk).delete()
+        return
+    logger.warning('Task %s%r failed, retrying in %ss:\n%s', task.name, tuple(task.args), delay, error)
+    if _executor is not None:
+        timer = threading.Timer(delay, _kick)
+        timer.daemon = True
+        timer.start()
+
+
+def run_pending(stop=None):
+    """Run due tasks in this thread until there are none (or ``stop`` is set).
+
+    Returns:
+        int: the number of tasks run, successfully or not.
+    """
+    count = 0
+    while stop is None or not stop.is_set():
+        task = claim()
+        if task is None:
+            break
+        run_task(task)
+        count += 1
+    return count
+
+
+def _kick():
+    """Have a pool thread run the due tasks, unless every thread already is."""
+    global _executor, _draining, _drain_requested
+    with _lock:
+        _drain_requested = True
+        if _draining >= settings.TASK_WORKERS:
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.TASK_WORKERS, thread_name_prefix='tasks')
+        _draining += 1
+    _executor.submit(_drain)
+
+
+def _drain():
+    global _draining, _drain_requested
+    try:
+        while True:
+            with _lock:
+                _drain_requested = False
+            try:
+                run_pending()
+            except Exception:
+                logger.exception('Could not run queued tasks')
+            with _lock:
+                # Go again if a task was queued while we were finishing.
+                if not _drain_requested:
+                    _draining -= 1
+                    return
+    finally:
+        # Pool threads open their own connections; don't leave them behind.
+        connections.close_all()
+
+
+def run_worker(concurrency=1, poll_interval=1.0, once=False, stop=None):
+    """Run tasks on ``concurrency`` threads until ``stop`` is set.
+
+    Args:
+        poll_interval (float): seconds an idle thread waits before looking
+            for due tasks again.
+        once (bool): return as soon as no task is due instead.
+        stop (threading.Event): set it to finish the current tasks and return.
+
+    Returns:
+        int: the number of tasks run.
+    """
+    stop = stop or threading.Event()
+    counts = []
+
+    def loop():
+        count = 0
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                ran = run_pending(stop)
+                count += ran
+                if once:
+                    break
+                if not ran:
+                    stop.wait(poll_interval)
+        finally:
+            counts.append(count)
+            connections.close_all()
+
+    threads = [threading.Thread(target=loop, name=f'tasks-{n}', daemon=True) for n in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        # Let the running tasks finish rather than abandoning them locked.
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return sum(counts)
@@ -1,21 +1,28 @@
 from django import template
 from django.utils.safestring import mark_safe
 import markdown
-import re
+import threading
+
+from ..markdown_extensions import CommentHtmlExtension, PostHtmlExtension
 
 register = template.Library()
 
-@register.filter
-def markdown_to_html(value):
-    if not value:
-        return ''
-    
-    md = markdown.Markdown(
+# Bump whenever the extensions or post-processing below change the output;
+# stored HTML from an older version is re-rendered by
+# `python manage.py rerendermarkdown`.
+MARKDOWN_VERSION = 3
+
+_engines = threading.local()
+
+
+def post_markdown():
+    return markdown.Markdown(
         extensions=[
             'markdown.extensions.fenced_code',
             'markdown.extensions.tables',
             'markdown.extensions.nl2br',
             'markdown.extensions.codehilite',
+            PostHtmlExtension(),
         ],
         extension_configs={
             'markdown.extensions.codehilite': {
@@ -24,23 +31,15 @@ def markdown_to_html(value):
             }
         }
     )
-    
-    html = md.convert(value)
-    html = re.sub(r'<img ', r'<img class="markdown-image" ', html)
-    html = re.sub(r'<a href="http', r'<a target="_blank" href="http', html)
-    
-    return mark_safe(html)
 
-@register.filter
-def markdown_to_html_safe(value):
-    if not value:
-        return ''
-    
-    md = markdown.Markdown(
+
+def comment_markdown():
+    return markdown.Markdown(
         extensions=[
             'markdown.extensions.fenced_code',
             'markdown.extensions.nl2br',
             'markdown.extensions.codehilite',
+            CommentHtmlExtension(),
         ],
         extension_configs={
             'markdown.extensions.codehilite': {
@@ -49,10 +48,39 @@ def markdown_to_html_safe(value):
             }
         }
     )
-    
-    html = md.convert(value)
-    html = re.sub(r'<img[^>]*>', '', html)
-    html = re.sub(r'<a[^>]*>(.*?)</a>', r'\1', html)
-    html = re.sub(r'href="[^"]*"', '', html)
-    
-    return mark_safe(html)
+
+
+def _engine(factory):
+    # Building a Markdown instance loads every extension, so each thread keeps
+    # one per configuration and resets it between documents.
+    md = getattr(_engines, factory.__name__, None)
+    if md is None:
+        md = factory()
+        setattr(_engines, factory.__name__, md)
+    return md.reset()
+
+
+def render_post_html(value, md=None):
+    """Render post markdown; ``md`` is an optional ``post_markdown()`` engine."""
+    if not value:
+        return ''
+    md = md.reset() if md is not None else _engine(post_markdown)
+    return md.convert(value)
+
+
+def render_comment_html(value, md=None):
+    """Render comment markdown without images or links."""
+    if not value:
+        return ''
+    md = md.reset() if md is not None else _engine(comment_markdown)
+    return md.convert(value)
+
+
+@register.filter
+def markdown_to_html(value):
+    return mark_safe(render_post_html(value))
+
+
+@register.filter
+def markdown_to_html_safe(value):
+    return mark_safe(render_comment_html(value))
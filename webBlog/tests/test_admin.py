@@ -0,0 +1,136 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from webBlog.models import Post, Comment
+
+
+class AdminChangelistTest(TestCase):
+    """Test that admin changelists stay cheap as tables grow"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.login(username='admin', password='adminpass123')
+        for i in range(5):
+            post = Post.objects.create(title=f'Post {i}', content='Test content', author=self.admin)
+            for j in range(3):
+                Comment.objects.create(post=post, author=self.admin, content=f'Comment {j}')
+
+    def test_comment_changelist_query_count_is_constant(self):
+        """Rows do not trigger per-row post/author queries"""
+        url = reverse('admin:webBlog_comment_changelist')
+        self.client.get(url)
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_changelist_uses_denormalized_counts(self):
+        """Comment counts come from comment_total rather than a COUNT per row"""
+        url = reverse('admin:webBlog_post_changelist')
+        self.client.get(url)
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, '3 comments')
+
+    def test_related_filters_do_not_enumerate_objects(self):
+        """Author and post filters render an autocomplete box, not every object"""
+        response = self.client.get(reverse('admin:webBlog_comment_changelist'))
+        self.assertContains(response, 'id="id_filter_post"')
+        self.assertContains(response, 'id="id_filter_author"')
+        self.assertNotContains(response, 'post__id__exact=2')
+
+    def test_filtering_by_post(self):
+        """Selecting a post in the autocomplete filter narrows the changelist"""
+        post = Post.objects.first()
+        response = self.client.get(
+            reverse('admin:webBlog_comment_changelist'), {'post__id__exact': post.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+
+class CommentInlineTest(TestCase):
+    """Test the paginated, read-only comment inline on the post change page"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.login(username='admin', password='adminpass123')
+        self.post = Post.objects.create(title='Popular Post', content='Test content', author=self.admin)
+        for i in range(60):
+            Comment.objects.create(post=self.post, author=self.admin, content=f'Comment number {i}')
+
+    def test_inline_renders_one_page(self):
+        """Only one page of comments is loaded and rendered"""
+        url = reverse('admin:webBlog_post_change', args=[self.post.pk])
+        response = self.client.get(url)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.forms), 25)
+        self.assertContains(response, 'Page 1 of 3')
+        self.assertContains(response, f'?post__id__exact={self.post.pk}')
+
+        response = self.client.get(url, {'comments_page': 3})
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.forms), 10)
+        self.assertContains(response, 'Comment number 59')
+
+    def test_inline_page_links_keep_other_parameters(self):
+        """Page links change only the page, keeping the changelist filters"""
+        url = reverse('admin:webBlog_post_change', args=[self.post.pk])
+        response = self.client.get(url, {'_changelist_filters': 'author=1', 'comments_page': 2})
+        self.assertContains(response, '?_changelist_filters=author%3D1&amp;comments_page=3')
+        self.assertContains(response, '?_changelist_filters=author%3D1&amp;comments_page=1')
+
+    def test_inline_reuses_comment_count(self):
+        """Paging through the inline counts the comments only once"""
+        url = reverse('admin:webBlog_post_change', args=[self.post.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'comments_page': 2})
+        self.assertContains(response, 'Page 2 of 3')
+        self.assertFalse([query for query in queries if 'COUNT' in query['sql']])
+
+        Comment.objects.create(post=self.post, author=self.admin, content='One more')
+        response = self.client.get(url, {'comments_page': 2})
+        self.assertContains(response, 'Open all 61 in the changelist')
+
+    def test_inline_is_read_only(self):
+        """Comments cannot be edited, added or deleted through the inline"""
+        response = self.client.get(reverse('admin:webBlog_post_change', args=[self.post.pk]))
+        inline = response.context['inline_admin_formsets'][0]
+        self.assertFalse(inline.has_add_permission)
+        self.assertFalse(inline.has_change_permission)
+        self.assertFalse(inline.has_delete_permission)
+
+    def test_saving_post_with_paginated_inline(self):
+        """The post can still be saved while the inline shows a later page"""
+        url = reverse('admin:webBlog_post_change', args=[self.post.pk])
+        response = self.client.get(url, {'comments_page': 2})
+        formset = response.context['inline_admin_formsets'][0].formset
+        data = {
+            'title': 'Renamed Post',
+            'content': 'Test content',
+            'author': self.admin.pk,
+            f'{formset.prefix}-TOTAL_FORMS': len(formset.forms),
+            f'{formset.prefix}-INITIAL_FORMS': len(formset.forms),
+            f'{formset.prefix}-MIN_NUM_FORMS': 0,
+            f'{formset.prefix}-MAX_NUM_FORMS': 1000,
+        }
+        for i, form in enumerate(formset.forms):
+            data[f'{formset.prefix}-{i}-id'] = form.instance.pk
+            data[f'{formset.prefix}-{i}-post'] = self.post.pk
+        response = self.client.post(f'{url}?comments_page=2', data)
+        self.assertEqual(response.status_code, 302)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Renamed Post')
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 60)
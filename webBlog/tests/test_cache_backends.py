@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from webBlog import cache_backends
+from webBlog.cache_backends import LocalTier, TwoTierCache
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'webBlog.cache_backends.TwoTierCache',
+        'LOCATION': 'test-shared',
+        'OPTIONS': {
+            'LOCAL_TIMEOUT': 60,
+            'LOCAL_MAX_ENTRIES': 3,
+            'LOCAL_EXCLUDE': ['mutable:'],
+            'SYNC_INTERVAL': 0,
+        },
+    },
+    'test-shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests-sessions',
+    },
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TwoTierCacheTest(TestCase):
+    """Test the in-process LRU in front of the shared cache"""
+
+    def setUp(self):
+        cache_backends._tiers.clear()
+        cache.clear()
+        cache.reset_stats()
+        self.shared = caches['test-shared']
+
+    def other_process(self):
+        """A cache with its own LRU, as in another worker"""
+        other = TwoTierCache('test-shared', TEST_CACHES['default'])
+        other._tier = LocalTier(100, 1024 * 1024)
+        return other
+
+    def test_reads_are_kept_locally(self):
+        """The shared cache is only asked once per key, and copies are handed out"""
+        self.shared.set('post', {'title': 'Post'})
+        self.assertEqual(cache.get('post'), {'title': 'Post'})
+        cache.get('post')['title'] = 'Changed'
+        self.assertEqual(cache.get('post'), {'title': 'Post'})
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+        stats = cache.stats()
+        self.assertEqual(stats['local']['hits'], 2)
+        self.assertEqual(stats['shared'], {'hits': 1, 'misses': 1})
+
+    def test_get_many_reads_shared_for_missing_keys_only(self):
+        """get_many combines local hits with one shared lookup"""
+        cache.set('a', 1)
+        self.shared.set('b', 2)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.assertEqual(cache.stats()['shared'], {'hits': 1, 'misses': 1})
+
+    def test_excluded_keys_always_read_shared(self):
+        """Keys changed in place are never served from the LRU"""
+        cache.set('mutable:count', 1)
+        self.shared.set('mutable:count', 2)
+        self.assertEqual(cache.get('mutable:count'), 2)
+        cache.incr('mutable:count')
+        self.assertEqual(cache.get('mutable:count'), 3)
+        self.assertEqual(cache.stats()['local']['entries'], 0)
+
+    def test_lru_is_bounded(self):
+        """The least recently used entries are evicted locally, not from the shared cache"""
+        for key in 'abcd':
+            cache.set(key, key)
+        stats = cache.stats()['local']
+        self.assertEqual((stats['entries'], stats['evictions']), (3, 1))
+        self.assertEqual(cache.get('a'), 'a')
+
+    def test_local_copies_expire(self):
+        """A local copy is served for LOCAL_TIMEOUT seconds at most"""
+        cache.set('key', 'old')
+        self.shared.set('key', 'new')
+        now = cache_backends.time.monotonic()
+        self.assertEqual(cache.get('key'), 'old')
+        with mock.patch.object(cache_backends.time, 'monotonic', return_value=now + 61):
+            self.assertEqual(cache.get('key'), 'new')
+
+    def test_deletes_invalidate_other_processes(self):
+        """Deleting a key empties every process's LRU"""
+        other = self.other_process()
+        cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        cache.delete('key')
+        self.assertIsNone(other.get('key'))
+        self.assertEqual(other.stats()['local']['flushes'], 1)
+
+    def test_stats_endpoint_requires_staff(self):
+        """Only staff can read the cache statistics"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+        self.assertEqual(client.get(reverse('api:cache_report')).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = client.get(reverse('api:cache_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('local', response.json()['caches']['default'])
@@ -0,0 +1,195 @@
+import hashlib
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from webBlog import caching
+from webBlog.caching import POSTS, bump, cached_html, cached_or_stale, jittered
+from webBlog.models import Post
+
+
+class Counter:
+    """A compute function that counts its calls"""
+
+    def __init__(self, value='value', delay=0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+class CachedHtmlTest(TestCase):
+    """Test the content-hash cache of rendered markdown"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_markdown_version_bump_renders_again(self):
+        """HTML cached under an older MARKDOWN_VERSION is not served"""
+        def render(text):
+            return f'v{caching.MARKDOWN_VERSION}'
+
+        self.assertEqual(cached_html('text', render), f'v{caching.MARKDOWN_VERSION}')
+        with mock.patch.object(caching, 'MARKDOWN_VERSION', caching.MARKDOWN_VERSION + 1):
+            self.assertEqual(cached_html('text', render), f'v{caching.MARKDOWN_VERSION}')
+
+    @override_settings(MARKDOWN_CACHE_TIMEOUT=60)
+    def test_entries_expire(self):
+        """Entries get MARKDOWN_CACHE_TIMEOUT unless a timeout is given"""
+        with mock.patch.object(caching.cache, 'set', wraps=caching.cache.set) as cache_set:
+            cached_html('text', str)
+            cached_html('other text', str, timeout=5)
+        self.assertEqual([call.args[2] for call in cache_set.call_args_list], [60, 5])
+
+
+@override_settings(VIEW_CACHE_TIMEOUT=30, VIEW_CACHE_STALE_TIMEOUT=300, CACHE_TTL_JITTER=0.1)
+class CachedOrStaleTest(TestCase):
+    """Test stale-while-revalidate caching with request coalescing"""
+
+    def setUp(self):
+        cache.clear()
+
+    def lock_key(self, *parts):
+        digest = hashlib.sha1('|'.join(['test', *map(str, parts)]).encode()).hexdigest()
+        return f'{caching.LOCK_KEY_PREFIX}:test:{digest}'
+
+    def test_fresh_entry_is_not_recomputed(self):
+        """A second call within the timeout is served from the cache"""
+        compute = Counter()
+        self.assertEqual(cached_or_stale('test', [POSTS], compute, 1), 'value')
+        self.assertEqual(cached_or_stale('test', [POSTS], compute, 1), 'value')
+        self.assertEqual(compute.calls, 1)
+        cached_or_stale('test', [POSTS], compute, 2)
+        self.assertEqual(compute.calls, 2)
+
+    def test_none_is_cached(self):
+        """A None result counts as a cached value"""
+        compute = Counter(value=None)
+        self.assertIsNone(cached_or_stale('test', [POSTS], compute, 1))
+        self.assertIsNone(cached_or_stale('test', [POSTS], compute, 1))
+        self.assertEqual(compute.calls, 1)
+
+    def test_stale_entry_is_served_while_locked(self):
+        """After a bump, callers get the old value while another caller recomputes"""
+        cached_or_stale('test', [POSTS], Counter('old'), 1)
+        bump(POSTS)
+        cache.add(self.lock_key(1), 1)
+        compute = Counter('new')
+        self.assertEqual(cached_or_stale('test', [POSTS], compute, 1), 'old')
+        self.assertEqual(compute.calls, 0)
+        cache.delete(self.lock_key(1))
+        self.assertEqual(cached_or_stale('test', [POSTS], compute, 1), 'new')
+        self.assertEqual(cached_or_stale('test', [POSTS], compute, 1), 'new')
+        self.assertEqual(compute.calls, 1)
+
+    def test_expired_entry_is_recomputed(self):
+        """An entry past its (jittered) timeout is refreshed by the next caller"""
+        compute = Counter()
+        cached_or_stale('test', [POSTS], compute, 1)
+        with mock.patch('webBlog.caching.time.time', return_value=time.time() + 26):
+            cached_or_stale('test', [POSTS], compute, 1)
+        self.assertEqual(compute.calls, 1)
+        with mock.patch('webBlog.caching.time.time', return_value=time.time() + 31):
+            cached_or_stale('test', [POSTS], compute, 1)
+        self.assertEqual(compute.calls, 2)
+
+    def test_failed_refresh_serves_stale_value(self):
+        """A failed recomputation is logged, serves the stale value and lets the next caller try again"""
+        cached_or_stale('test', [POSTS], Counter('old'), 1)
+        bump(POSTS)
+        with self.assertLogs('webBlog.caching', 'ERROR'):
+            self.assertEqual(cached_or_stale('test', [POSTS], lambda: 1 / 0, 1), 'old')
+        self.assertEqual(cached_or_stale('test', [POSTS], Counter('new'), 1), 'new')
+
+    def test_failed_fill_raises(self):
+        """Without a stale value to serve, a failed computation raises"""
+        with self.assertRaises(ZeroDivisionError):
+            cached_or_stale('test', [POSTS], lambda: 1 / 0, 1)
+        self.assertEqual(cached_or_stale('test', [POSTS], Counter('new'), 1), 'new')
+
+    def test_concurrent_misses_compute_once(self):
+        """Threads missing the same key share one computation and get their own copies"""
+        compute = Counter(value=['value'], delay=0.2)
+        results = []
+
+        def call():
+            results.append(cached_or_stale('test', [POSTS], compute, 1))
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, [['value']] * 5)
+        self.assertEqual(len({id(result) for result in results}), 5)
+
+    def test_timeouts_are_jittered(self):
+        """Jitter shortens timeouts by at most CACHE_TTL_JITTER"""
+        values = [jittered(100) for _ in range(200)]
+        self.assertTrue(all(90 <= value <= 100 for value in values))
+        self.assertGreater(len(set(values)), 1)
+
+
+@override_settings(VIEW_CACHE_TIMEOUT=30, VIEW_CACHE_STALE_TIMEOUT=300)
+class CachedViewsTest(TestCase):
+    """Test the cached post lists and post API"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='First', content='Test content', author=self.user)
+
+    def test_post_list_page_is_cached(self):
+        """The second request for a page doesn't query posts"""
+        self.client.get(reverse('blog:post_list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog:post_list'))
+        self.assertEqual([post.title for post in response.context['posts']], ['First'])
+        self.assertEqual(response.context['paginator'].count, 1)
+
+    def test_new_post_refreshes_lists(self):
+        """Creating a post invalidates the cached page and API list"""
+        self.client.get(reverse('blog:post_list'))
+        self.client.get(reverse('api:posts_list'))
+        Post.objects.create(title='Second', content='Test content', author=self.user)
+        response = self.client.get(reverse('blog:post_list'))
+        self.assertEqual([post.title for post in response.context['posts']], ['Second', 'First'])
+        data = self.client.get(reverse('api:posts_list')).json()
+        self.assertEqual([post['title'] for post in data['posts']], ['Second', 'First'])
+        self.assertEqual(data['pagination']['total_posts'], 2)
+
+    def test_api_list_adds_pending_views(self):
+        """Views not yet written are added on top of the cached list"""
+        self.client.get(reverse('api:posts_list'))
+        with mock.patch('webBlog.simple_api_views.view_counter.pending', return_value={self.post.pk: 3}):
+            with self.assertNumQueries(0):
+                data = self.client.get(reverse('api:posts_list')).json()
+        self.assertEqual(data['posts'][0]['view_count'], 3)
+
+    def test_api_detail_is_cached(self):
+        """Post detail is cached until a comment is added"""
+        url = reverse('api:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()['comments'], [])
+        self.post.comments.create(author=self.user, content='Comment')
+        self.assertEqual(len(self.client.get(url).json()['comments']), 1)
+
+    def test_api_detail_caches_missing_posts(self):
+        """A missing post is a cached 404 until a post with its id is saved"""
+        url = reverse('api:post_detail', args=[self.post.pk + 1])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from webBlog.comment_stream import hub, publish_comment
+from webBlog.models import Post, Comment
+
+
+async def next_chunk(response, timeout=2):
+    return (await asyncio.wait_for(anext(response.streaming_content), timeout)).decode()
+
+
+@override_settings(COMMENT_STREAM_BACKEND='local', COMMENT_STREAM_HEARTBEAT=0.05)
+class CommentStreamTest(TestCase):
+    """Test live comments over SSE and long polling"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='Content', author=self.user)
+        self.stream_url = f'/post/{self.post.pk}/comments/stream/'
+        self.poll_url = f'/post/{self.post.pk}/comments/poll/'
+
+    def comment(self, content='Hello **there**'):
+        return Comment.objects.create(post=self.post, author=self.user, content=content)
+
+    async def test_stream_pushes_new_comments(self):
+        """New comments are pushed to open streams, with heartbeats in between"""
+        response = await self.async_client.get(self.stream_url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue((await next_chunk(response)).startswith('retry:'))
+        self.assertEqual(hub.connection_count, 1)
+        self.assertEqual(await next_chunk(response), ': heartbeat\n\n')
+
+        comment = await sync_to_async(self.comment)()
+        await sync_to_async(publish_comment)(comment)
+        chunk = await next_chunk(response)
+        while chunk.startswith(':'):
+            chunk = await next_chunk(response)
+        self.assertIn(f'id: {comment.pk}\nevent: comment\n', chunk)
+        self.assertIn('<strong>there</strong>', chunk)
+        await response.streaming_content.aclose()
+
+    def test_comments_published_on_commit(self):
+        """Creating an approved comment publishes it once the transaction commits"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.comment()
+            Comment.objects.create(post=self.post, author=self.user, content='Held', is_approved=False)
+        published = [callback for callback in callbacks if getattr(callback, 'func', None) is publish_comment]
+        self.assertEqual(len(published), 1)
+
+    async def test_reconnect_catches_up(self):
+        """Last-Event-ID replays comments the client missed"""
+        first = await sync_to_async(self.comment)('First')
+        second = await sync_to_async(self.comment)('Second')
+        response = await self.async_client.get(self.stream_url, headers={'Last-Event-ID': str(first.pk)})
+        await next_chunk(response)
+        chunk = await next_chunk(response)
+        self.assertIn(f'id: {second.pk}\n', chunk)
+        self.assertNotIn('First', chunk)
+        await response.streaming_content.aclose()
+
+    @override_settings(COMMENT_STREAM_MAX_CONNECTIONS=0)
+    async def test_connection_limit(self):
+        """Watchers beyond the limit get 503"""
+        response = await self.async_client.get(self.stream_url)
+        self.assertEqual(response.status_code, 503)
+        response = await self.async_client.get(self.poll_url, {'timeout': 0})
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(COMMENT_STREAM_QUEUE_SIZE=2)
+    async def test_slow_watcher_is_disconnected(self):
+        """A watcher that falls behind gets an overflow event instead of a growing queue"""
+        response = await self.async_client.get(self.stream_url)
+        await next_chunk(response)
+        for pk in range(1, 5):
+            hub.dispatch(self.post.pk, {'id': pk})
+        await asyncio.sleep(0)
+        chunk = await next_chunk(response)
+        while chunk.startswith(':'):
+            chunk = await next_chunk(response)
+        self.assertEqual(chunk, 'event: overflow\ndata: {}\n\n')
+
+    async def test_long_poll(self):
+        """Long polling returns stored comments at once, or waits for the next one"""
+        comment = await sync_to_async(self.comment)()
+        response = await self.async_client.get(self.poll_url, {'after': 0})
+        self.assertEqual([c['id'] for c in response.json()['comments']], [comment.pk])
+
+        response = await self.async_client.get(self.poll_url, {'after': comment.pk, 'timeout': 0.05})
+        self.assertEqual(response.json(), {'comments': [], 'last_id': comment.pk})
+
+        async def publish_later():
+            await asyncio.sleep(0.05)
+            hub.dispatch(self.post.pk, {'id': comment.pk + 1, 'content': 'Live'})
+
+        task = asyncio.ensure_future(publish_later())
+        response = await self.async_client.get(self.poll_url, {'after': comment.pk, 'timeout': 2})
+        await task
+        self.assertEqual(response.json()['last_id'], comment.pk + 1)
+        self.assertEqual(hub.connection_count, 0)
+
+    async def test_unknown_post(self):
+        """Streams for missing posts are 404s"""
+        response = await self.async_client.get('/post/999999/comments/stream/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_requests_are_refused(self):
+        """Without the ASGI server, streams and polls answer 501 and post pages leave them out"""
+        self.assertEqual(self.client.get(self.stream_url).status_code, 501)
+        self.assertEqual(self.client.get(self.poll_url).status_code, 501)
+        self.assertEqual(hub.connection_count, 0)
+        response = self.client.get(f'/post/{self.post.pk}/')
+        self.assertNotContains(response, 'EventSource')
+
+    async def test_asgi_post_page_opens_stream(self):
+        """Post pages served over ASGI include the live comments script"""
+        response = await self.async_client.get(f'/post/{self.post.pk}/')
+        self.assertContains(response, 'EventSource')
+        self.assertContains(response, self.stream_url)
@@ -0,0 +1,156 @@
+import json
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.urls import reverse
+from webBlog.db_routers import PIN_COOKIE_NAME, ReplicaHealth, replica_health, use_replica
+from webBlog.models import Post
+
+
+class ReplicaRouterTest(TestCase):
+    """Test read/write routing between the primary and replicas"""
+
+    def test_reads_follow_the_current_replica(self):
+        """Reads go to the replica only inside use_replica; writes never do"""
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        with use_replica('replica1'):
+            self.assertEqual(router.db_for_read(Post), 'replica1')
+            self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_unreachable_replica_falls_back(self):
+        """A replica that cannot connect is skipped until the retry window passes"""
+        health = ReplicaHealth(retry_seconds=60)
+        with self.assertLogs('webBlog.db_routers', 'WARNING'):
+            self.assertIsNone(health.choose(['missing']))
+        self.assertTrue(health.is_down('missing'))
+        self.assertEqual(health.choose(['missing', DEFAULT_DB_ALIAS]), DEFAULT_DB_ALIAS)
+
+        health = ReplicaHealth(retry_seconds=0)
+        with self.assertLogs('webBlog.db_routers', 'WARNING'):
+            health.choose(['missing'])
+        self.assertFalse(health.is_down('missing'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingMiddlewareTest(TestCase):
+    """Test which requests are served from a replica"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.user)
+        patcher = mock.patch.object(replica_health, 'choose', return_value=None)
+        self.choose = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_views_use_replica(self):
+        """List, detail, comments and status endpoints read from a replica"""
+        for url in (
+            reverse('blog:post_list'),
+            reverse('blog:post_detail', args=[self.post.pk]),
+            reverse('api:api_status'),
+            reverse('api:posts_list'),
+            reverse('api:post_comments', args=[self.post.pk]),
+        ):
+            self.choose.reset_mock()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.choose.assert_called_once_with(['replica1'])
+
+    def test_other_views_use_primary(self):
+        """Views outside REPLICA_READ_VIEWS never consult the replicas"""
+        self.client.get(reverse('api:auth_status'))
+        self.client.get(reverse('blog:login'))
+        self.choose.assert_not_called()
+
+    def test_write_pins_client_to_primary(self):
+        """After commenting, reads stay on the primary for the pin window"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(
+            reverse('api:create_comment', args=[self.post.pk]),
+            json.dumps({'content': 'New comment'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies[PIN_COOKIE_NAME]['max-age'], 10)
+
+        response = self.client.get(reverse('api:post_comments', args=[self.post.pk]))
+        self.assertEqual(len(response.json()['comments']), 1)
+        self.choose.assert_not_called()
+
+    def test_failed_write_does_not_pin(self):
+        """Rejected writes do not set the pin cookie"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(
+            reverse('api:create_comment', args=[self.post.pk]),
+            json.dumps({'content': ''}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+
+# Only configured by Blog/settings_replica_test.py.
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, 'needs --settings=Blog.settings_replica_test')
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class ReplicaConnectionTest(TransactionTestCase):
+    """Test routing against a real replica connection (a mirror of default)"""
+
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.user)
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+
+    def get_comments(self):
+        """GET the comments endpoint, returning ``(response, replica queries, primary queries)``"""
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            with CaptureQueriesContext(connections['default']) as primary_queries:
+                response = self.client.get(reverse('api:post_comments', args=[self.post.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, replica_queries, primary_queries
+
+    def test_reads_use_replica_connection(self):
+        """Read views query the replica connection and not the primary"""
+        _, replica_queries, primary_queries = self.get_comments()
+        self.assertTrue(replica_queries.captured_queries)
+        self.assertFalse(primary_queries.captured_queries)
+
+    def test_write_pins_reads_to_primary(self):
+        """After a write the client's reads run on the primary connection"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(
+            reverse('api:create_comment', args=[self.post.pk]),
+            json.dumps({'content': 'New comment'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response, replica_queries, primary_queries = self.get_comments()
+        self.assertEqual(len(response.json()['comments']), 1)
+        self.assertFalse(replica_queries.captured_queries)
+        self.assertTrue(primary_queries.captured_queries)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        """A replica that fails to connect is skipped and reads use the primary"""
+        replica = connections['replica']
+        replica.close()
+        self.addCleanup(replica.close)
+        with mock.patch.dict(replica.settings_dict, {'NAME': '/nonexistent/replica.sqlite3'}):
+            with self.assertLogs('webBlog.db_routers', 'WARNING'):
+                with CaptureQueriesContext(connections['default']) as primary_queries:
+                    response = self.client.get(reverse('api:post_comments', args=[self.post.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_health.is_down('replica'))
+        self.assertIsNone(replica.connection)
+        self.assertTrue(primary_queries.captured_queries)
@@ -0,0 +1,111 @@
+from io import StringIO
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.urls import reverse
+from webBlog.fast_delete import delete_comments, delete_posts, delete_user
+from webBlog.models import Post, Comment
+
+
+class FastDeleteTest(TestCase):
+    """Test batched deletes of posts, users and their comment trees"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.post = Post.objects.create(title='Busy Post', content='Test content', author=self.author)
+        self.other_post = Post.objects.create(title='Other Post', content='Test content', author=self.reader)
+
+        parent = None
+        for i in range(7):
+            parent = Comment.objects.create(
+                post=self.post, author=self.reader, content=f'Reply {i}', parent=parent
+            )
+        self.reader_comment = Comment.objects.create(
+            post=self.other_post, author=self.reader, content='On my own post'
+        )
+        self.author_comment = Comment.objects.create(
+            post=self.other_post, author=self.author, content='Author elsewhere'
+        )
+        Comment.objects.create(
+            post=self.other_post, author=self.reader, content='Reply to author', parent=self.author_comment
+        )
+
+    def test_delete_posts_removes_reply_chains(self):
+        """Deeply nested replies are deleted in small batches"""
+        progress = []
+        posts, comments = delete_posts(Post.objects.filter(pk=self.post.pk), batch_size=2, progress=progress.append)
+        self.assertEqual((posts, comments), (1, 7))
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(progress[-1], 7)
+        self.assertEqual(Comment.objects.filter(post=self.other_post).count(), 3)
+
+    def test_delete_comments_keeps_counters_consistent(self):
+        """comment_total is recounted for posts that lose comments"""
+        deleted = delete_comments(Comment.objects.filter(pk=self.author_comment.pk))
+        self.assertEqual(deleted, 2)
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.comment_total, 1)
+
+    def test_delete_user_removes_comments_everywhere(self):
+        """A user's comments, replies to them and their posts' comments are deleted"""
+        delete_user(self.author, batch_size=3)
+        self.assertFalse(User.objects.filter(username='author').exists())
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(list(Comment.objects.values_list('pk', flat=True)), [self.reader_comment.pk])
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.comment_total, 1)
+
+    def test_management_command(self):
+        """fastdelete reports progress and honours --dry-run"""
+        out = StringIO()
+        call_command('fastdelete', 'post', str(self.post.pk), '--dry-run', stdout=out)
+        self.assertIn('7 comments', out.getvalue())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+        out = StringIO()
+        call_command('fastdelete', 'user', 'reader', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted user "reader"', out.getvalue())
+        self.assertEqual(list(Comment.objects.values_list('pk', flat=True)), [])
+
+    def test_admin_delete_view(self):
+        """The admin delete confirmation summarizes comments and deletes via the fast path"""
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        client = Client()
+        client.login(username='admin', password='adminpass123')
+        url = reverse('admin:webBlog_post_delete', args=[self.post.pk])
+
+        response = client.get(url)
+        self.assertContains(response, '7 Comments (including replies)')
+
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_admin_user_delete_lists_posts(self):
+        """Deleting a user shows their posts and requires permission to delete posts"""
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        staff.user_permissions.add(
+            Permission.objects.get(codename='delete_user'),
+            Permission.objects.get(codename='change_user'),
+            Permission.objects.get(codename='delete_comment'),
+        )
+        client = Client()
+        client.login(username='staff', password='testpass123')
+        url = reverse('admin:auth_user_delete', args=[self.author.pk])
+
+        response = client.get(url)
+        self.assertEqual(response.context['perms_lacking'], {'Blog Post'})
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+        staff.user_permissions.add(Permission.objects.get(codename='delete_post'))
+        response = client.get(url)
+        self.assertContains(response, '1 Blog Posts')
+        self.assertEqual(dict(response.context['model_count'])['Blog Posts'], 1)
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
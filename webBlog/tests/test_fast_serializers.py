@@ -0,0 +1,134 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from webBlog import fast_serializers
+from webBlog.models import Post, Comment
+from webBlog.view_counter import view_counter
+
+
+class FastSerializerTest(TestCase):
+    """Test the values_list() serializers behind the JSON endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='x' * 250, author=self.user)
+        self.comment = Comment.objects.create(post=self.post, author=self.user, content='Grüße')
+        Comment.objects.create(post=self.post, author=self.user, content='Hidden', is_approved=False)
+        view_counter.reset()
+        self.addCleanup(view_counter.reset)
+
+    def test_post_list_rows(self):
+        """List rows match the documented fields, with a shortened preview"""
+        selection = fast_serializers.Selection(fast_serializers.POST_LIST_COLUMNS)
+        posts = fast_serializers.serialize_post_list(selection.values_list(Post.objects.all()), selection)
+        self.assertEqual(posts, [{
+            'id': self.post.pk,
+            'title': 'Post',
+            'content': 'x' * 200 + '...',
+            'author': 'testuser',
+            'created_at': self.post.created_at.isoformat(),
+            'updated_at': self.post.updated_at.isoformat(),
+            'comment_count': 1,
+            'view_count': 0,
+        }])
+
+    def test_list_endpoint_queries(self):
+        """The list endpoint reads posts and authors in a single query"""
+        for i in range(5):
+            Post.objects.create(title=f'Post {i}', content='Content', author=self.user)
+        with self.assertNumQueries(2):  # the count, then the page
+            response = self.client.get('/api/posts/')
+        self.assertEqual(len(response.json()['posts']), 6)
+
+    def test_pending_views_are_included(self):
+        """Views still in the buffer are added to view_count"""
+        view_counter.add(self.post.pk)
+        self.assertEqual(self.client.get('/api/posts/').json()['posts'][0]['view_count'], 1)
+        self.assertEqual(self.client.get(f'/api/posts/{self.post.pk}/').json()['view_count'], 1)
+
+    def test_detail_and_comments(self):
+        """Detail and comment endpoints return only approved comments"""
+        data = self.client.get(f'/api/posts/{self.post.pk}/').json()
+        self.assertEqual(data['content'], 'x' * 250)
+        self.assertEqual(data['comments'], [{
+            'id': self.comment.pk,
+            'author': 'testuser',
+            'content': 'Grüße',
+            'created_at': self.comment.created_at.isoformat(),
+            'is_approved': True,
+        }])
+        self.assertEqual(data['comment_count'], 1)
+        self.assertEqual(data['view_count'], 0)
+        self.assertEqual(self.client.get(f'/api/posts/{self.post.pk}/comments/').json()['comments'], data['comments'])
+        self.assertEqual(self.client.get('/api/posts/999999/comments/').status_code, 404)
+
+    def test_standard_library_fallback(self):
+        """Without orjson the output is the same JSON"""
+        expected = self.client.get('/api/posts/').json()
+        with mock.patch.object(fast_serializers, 'orjson', None):
+            response = self.client.get('/api/posts/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), expected)
+
+    def test_benchmark_command(self):
+        """The benchmark reports a per-row cost for both paths"""
+        out = StringIO()
+        call_command('benchmarkserializers', '--rows', '10', '--iterations', '1', stdout=out)
+        self.assertIn('us/row', out.getvalue())
+        self.assertIn('values', out.getvalue())
+
+
+class FieldSelectionTest(TestCase):
+    """Test ?fields= and ?include= on the JSON endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='Content', author=self.user)
+        self.comment = Comment.objects.create(post=self.post, author=self.user, content='Comment')
+        view_counter.reset()
+        self.addCleanup(view_counter.reset)
+
+    def test_fields_limit_columns_and_response(self):
+        """Only requested columns are selected and returned"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/posts/', {'fields': 'title,created_at'})
+        self.assertEqual(set(response.json()['posts'][0]), {'id', 'title', 'created_at'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"content"', select)
+        self.assertNotIn('auth_user', select)
+
+    def test_detail_without_comments(self):
+        """An empty include skips the comments query on the detail endpoint"""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'/api/posts/{self.post.pk}/', {'fields': 'id,title,updated_at', 'include': ''}
+            )
+        self.assertEqual(response.json(), {
+            'id': self.post.pk, 'title': 'Post', 'updated_at': self.post.updated_at.isoformat(),
+        })
+
+    def test_include_author_and_comments_in_list(self):
+        """include=comments,author nests comments and returns author objects"""
+        response = self.client.get('/api/posts/', {'fields': 'title', 'include': 'comments,author'})
+        post = response.json()['posts'][0]
+        author = {'id': self.user.pk, 'username': 'testuser'}
+        self.assertEqual(post['author'], author)
+        self.assertEqual(len(post['comments']), 1)
+        self.assertEqual(post['comments'][0]['author'], author)
+
+    def test_comment_fields(self):
+        """The comments endpoint honours fields too"""
+        response = self.client.get(f'/api/posts/{self.post.pk}/comments/', {'fields': 'content'})
+        self.assertEqual(response.json()['comments'], [{'id': self.comment.pk, 'content': 'Comment'}])
+
+    def test_unknown_names_are_rejected(self):
+        """Unknown fields or includes are a 400 listing the valid names"""
+        response = self.client.get('/api/posts/', {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+        self.assertEqual(self.client.get('/api/posts/', {'include': 'everything'}).status_code, 400)
@@ -0,0 +1,81 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from webBlog.models import Post, Comment
+
+
+class FeedTest(TestCase):
+    """Test RSS/Atom feeds, their cache and conditional GET"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Some **bold** text', author=self.user)
+
+    def test_posts_feeds_render_markdown(self):
+        """RSS and Atom feeds list posts with rendered HTML bodies"""
+        for url in (reverse('blog:posts_rss'), reverse('blog:posts_atom')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Test Post')
+            self.assertContains(response, '&lt;strong&gt;bold&lt;/strong&gt;')
+            self.assertTrue(response.has_header('ETag'))
+            self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_unchanged_feed_is_304_without_queries(self):
+        """Polling with the previous validators returns 304 from the cache alone"""
+        url = reverse('blog:posts_rss')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_cached_body_is_reused(self):
+        """A second full request is served from the cache"""
+        url = reverse('blog:posts_atom')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+
+    @override_settings(ALLOWED_HOSTS=['blog.example.com', 'alias.example.com'])
+    def test_cache_is_per_host_and_scheme(self):
+        """Each host and scheme gets feeds linking to itself"""
+        url = reverse('blog:posts_rss')
+        link = f'/post/{self.post.pk}/'
+        self.assertContains(self.client.get(url, HTTP_HOST='blog.example.com'), f'http://blog.example.com{link}')
+        self.assertContains(self.client.get(url, HTTP_HOST='alias.example.com'), f'http://alias.example.com{link}')
+        self.assertContains(
+            self.client.get(url, HTTP_HOST='blog.example.com', secure=True), f'https://blog.example.com{link}'
+        )
+
+    def test_post_change_invalidates_feed(self):
+        """Saving a post changes the ETag and the cached body"""
+        url = reverse('blog:author_rss', args=['testuser'])
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(title='Second Post', content='More content', author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Second Post')
+
+    def test_comment_feed_follows_moderation(self):
+        """Comment feeds show approved comments and refresh after moderation"""
+        url = reverse('blog:comments_rss', args=[self.post.pk])
+        Comment.objects.create(post=self.post, author=self.user, content='First comment')
+        self.assertContains(self.client.get(url), 'First comment')
+
+        etag = self.client.get(url)['ETag']
+        Comment.objects.filter(post=self.post).unapprove()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'First comment')
+
+    def test_unknown_author_is_404(self):
+        """Feeds for missing authors or posts are not found"""
+        self.assertEqual(self.client.get(reverse('blog:author_atom', args=['nobody'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blog:comments_atom', args=[999])).status_code, 404)
@@ -0,0 +1,92 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from webBlog import images
+from webBlog.models import Post
+
+
+class ImageVariantTest(TestCase):
+    """Test lazy, dimensioned images and their generated variants"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = Path(directory.name)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, TASK_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        images._meta_cache.clear()
+
+    def create_post(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='Post', content=content, author=self.user)
+        post.refresh_from_db()
+        return post
+
+    def write_meta(self, relative, **meta):
+        path = self.media_root / images._variant_dir(relative) / images.META_NAME
+        path.parent.mkdir(parents=True)
+        path.write_text(json.dumps(meta))
+
+    def test_images_are_lazy_loaded(self):
+        """Every post image is lazy-loaded and decoded asynchronously"""
+        post = self.create_post('![alt](https://example.com/a.png)')
+        self.assertIn('loading="lazy"', post.content_html)
+        self.assertIn('decoding="async"', post.content_html)
+        self.assertNotIn('width=', post.content_html)
+
+    def test_known_image_gets_size_and_srcset(self):
+        """Processed local images are rendered with their size and variants"""
+        self.write_meta(
+            'uploads/a.jpg', source='uploads/a.jpg', source_mtime=0, widths=[320],
+            width=1000, height=500, variants=[[320, '_variants/x/320w.jpg']],
+        )
+        post = self.create_post('![alt](/media/uploads/a.jpg)')
+        self.assertIn('width="1000"', post.content_html)
+        self.assertIn('height="500"', post.content_html)
+        self.assertIn('srcset="/media/_variants/x/320w.jpg 320w, /media/uploads/a.jpg 1000w"', post.content_html)
+        self.assertEqual(images.pending_images(post.content_html), [])
+
+    @override_settings(IMAGE_META_CACHE_SIZE=2)
+    def test_meta_cache_is_bounded(self):
+        """Only the most recently used image metadata stays in memory"""
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            self.write_meta(f'uploads/{name}', width=10, height=10, variants=[])
+        images.load_meta('uploads/a.jpg')
+        images.load_meta('uploads/b.jpg')
+        images.load_meta('uploads/a.jpg')
+        images.load_meta('uploads/c.jpg')
+        self.assertEqual(list(images._meta_cache), ['uploads/a.jpg', 'uploads/c.jpg'])
+        self.assertEqual(images.load_meta('uploads/b.jpg')['width'], 10)
+
+    def test_pending_images(self):
+        """Only local images without dimensions are pending"""
+        html = (
+            '<img alt="" src="/media/a.png" /><img src="https://example.com/b.png" />'
+            '<img src="/media/../etc/passwd" /><img src="/media/c.png" width="10" />'
+        )
+        self.assertEqual(images.pending_images(html), ['a.png'])
+
+    def test_scheduling_without_pillow_is_a_no_op(self):
+        """Without Pillow, saving a post doesn't try to generate variants"""
+        (self.media_root / 'a.png').write_bytes(b'not an image')
+        with mock.patch.object(images, 'Image', None), mock.patch.object(images.process_post_images, 'enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(title='Post', content='![alt](/media/a.png)', author=self.user)
+        enqueue.assert_not_called()
+
+    @skipUnless(images.Image, 'Pillow is not installed')
+    def test_variants_generated_and_post_rerendered(self):
+        """Saving a post generates variants once and re-renders it with them"""
+        images.Image.new('RGB', (800, 400), 'red').save(self.media_root / 'photo.jpg')
+        post = self.create_post('![alt](/media/photo.jpg)')
+        self.assertIn('width="800"', post.content_html)
+        self.assertIn('320w', post.content_html)
+        self.assertIn('640w', post.content_html)
+        self.assertNotIn('1280w', post.content_html)
+        self.assertFalse(images.generate_variants('photo.jpg'))
@@ -0,0 +1,93 @@
+from html.parser import HTMLParser
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from webBlog.markdown_benchmark import (
+    CORPUS, legacy_comment_html, legacy_comment_markdown, legacy_post_html, legacy_post_markdown,
+)
+from webBlog.templatetags.markdown_extras import render_comment_html, render_post_html
+
+
+class _Tokens(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.tokens = []
+
+    def _attributes(self, attrs):
+        # Added since the regex implementation (webBlog/images.py).
+        return sorted(attr for attr in attrs if attr[0] not in ('loading', 'decoding'))
+
+    def handle_starttag(self, tag, attrs):
+        self.tokens.append(('start', tag, self._attributes(attrs)))
+
+    def handle_startendtag(self, tag, attrs):
+        self.tokens.append(('startend', tag, self._attributes(attrs)))
+
+    def handle_endtag(self, tag):
+        self.tokens.append(('end', tag))
+
+    def handle_data(self, data):
+        self.tokens.append(('data', data))
+
+    def handle_entityref(self, name):
+        self.tokens.append(('entity', name))
+
+
+def tokens(html):
+    """Parse ``html`` with attributes sorted, to compare up to attribute order
+
+    Lazy-loading attributes are left out; the regex implementation never
+    added them.
+    """
+    parser = _Tokens()
+    parser.feed(html)
+    parser.close()
+    return parser.tokens
+
+
+class MarkdownTreeprocessorTest(SimpleTestCase):
+    """Test the treeprocessor extensions against the regex post-processing"""
+
+    def test_post_html_matches_regex_output(self):
+        """Post rendering matches the old regex rewrites over the corpus"""
+        md = legacy_post_markdown()
+        for text in CORPUS:
+            with self.subTest(text=text):
+                self.assertEqual(tokens(render_post_html(text)), tokens(legacy_post_html(text, md)))
+
+    def test_comment_html_matches_regex_output(self):
+        """Comment rendering matches the old regex stripping over the corpus"""
+        md = legacy_comment_markdown()
+        for text in CORPUS:
+            with self.subTest(text=text):
+                self.assertEqual(tokens(render_comment_html(text)), tokens(legacy_comment_html(text, md)))
+
+    def test_post_rewrites(self):
+        """Images get the post class and only absolute links open a new tab"""
+        html = render_post_html('![a](x.png) [ext](https://example.com) [int](/post/1/)')
+        self.assertIn('class="markdown-image"', html)
+        self.assertIn('<a href="https://example.com" target="_blank">ext</a>', html)
+        self.assertIn('<a href="/post/1/">int</a>', html)
+
+    def test_comment_link_spanning_lines_is_unwrapped(self):
+        """Links whose text spans lines are stripped too"""
+        html = render_comment_html('[first\nsecond](http://example.com) after')
+        self.assertNotIn('<a', html)
+        self.assertNotIn('href', html)
+        self.assertIn('first<br />\nsecond after', html)
+
+    def test_comment_raw_html_is_escaped(self):
+        """Raw HTML in comments is shown as text, not rendered"""
+        html = render_comment_html('<script>alert(1)</script>\n\nHi <img src=x onerror=alert(1)> <b>there</b>')
+        self.assertNotIn('<script', html)
+        self.assertNotIn('<img', html)
+        self.assertNotIn('<b>', html)
+        self.assertIn('&lt;b&gt;there&lt;/b&gt;', html)
+
+    def test_benchmark_command(self):
+        """The benchmark command times both implementations"""
+        out = StringIO()
+        call_command('benchmarkmarkdown', '--iterations', '1', stdout=out)
+        self.assertIn('regex', out.getvalue())
+        self.assertIn('treeprocessor', out.getvalue())
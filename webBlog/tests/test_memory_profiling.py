@@ -0,0 +1,67 @@
+import tempfile
+import tracemalloc
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from webBlog.memory_profiling import MemoryProfiler, memory_profiler
+from webBlog.models import Post
+
+
+class MemoryProfilerTest(TestCase):
+    """Test tracemalloc request sampling and snapshot diffing"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Post.objects.create(title='Test Post', content='Test content', author=self.user)
+        self.was_tracing = tracemalloc.is_tracing()
+
+    def tearDown(self):
+        memory_profiler.reset()
+        if not self.was_tracing:
+            tracemalloc.stop()
+
+    def test_measure_records_peak_and_sites(self):
+        """Allocations retained by the measured call are attributed to a site"""
+        profiler = MemoryProfiler()
+        profiler.start()
+        retained = []
+        profiler.measure('allocate', lambda: retained.append(bytearray(256 * 1024)))
+
+        report = profiler.report()
+        self.assertEqual(report[0]['url_name'], 'allocate')
+        self.assertGreaterEqual(report[0]['max_peak_bytes'], 256 * 1024)
+        self.assertTrue(any('test_memory_profiling.py' in site['site'] for site in report[0]['top_sites']))
+
+    @override_settings(MEMORY_PROFILING_ENABLED=True, MEMORY_PROFILING_SAMPLE_RATE=1.0)
+    def test_middleware_groups_by_url_name(self):
+        """Sampled requests are reported under their URL name"""
+        response = Client().get(reverse('blog:post_list'))
+        self.assertEqual(response.status_code, 200)
+        url_names = [entry['url_name'] for entry in memory_profiler.report()]
+        self.assertIn('blog:post_list', url_names)
+
+    def test_memdiff_compares_snapshots(self):
+        """memdiff reports the growth between two dumped snapshots"""
+        memory_profiler.start()
+        with tempfile.TemporaryDirectory() as directory:
+            old = memory_profiler.dump_snapshot(directory)
+            leak = [bytearray(64 * 1024) for _ in range(4)]  # noqa: F841
+            new = memory_profiler.dump_snapshot(directory)
+
+            out = StringIO()
+            call_command('memdiff', str(old), str(new), stdout=out)
+        self.assertIn('Net change', out.getvalue())
+        self.assertIn('test_memory_profiling.py', out.getvalue())
+
+    def test_memory_endpoint_rejects_bad_sites(self):
+        """A non-numeric or negative sites count is a 400, not a 500"""
+        User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        client = Client()
+        client.login(username='staff', password='testpass123')
+        for sites in ('ten', '-1'):
+            response = client.get(reverse('api:memory_profile'), {'sites': sites})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get(reverse('api:memory_profile'), {'sites': '3'}).status_code, 200)
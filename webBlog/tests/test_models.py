@@ -120,4 +120,50 @@ class CommentModelTest(TestCase):
             content='Unapproved comment',
             is_approved=False
         )
-        self.assertFalse(unapproved_comment.is_approved)
\ No newline at end of file
+        self.assertFalse(unapproved_comment.is_approved)
+
+
+class PostCommentTotalTest(TestCase):
+    """Test the denormalized comment_total counter"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user
+        )
+
+    def test_counter_follows_comment_create_and_delete(self):
+        """Creating and deleting comments keeps comment_total in sync"""
+        comment = Comment.objects.create(post=self.post, author=self.user, content='First')
+        Comment.objects.create(post=self.post, author=self.user, content='Reply', parent=comment)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_total, 2)
+
+        # Deleting the parent cascades to the reply
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_total, 0)
+
+    def test_saving_stale_post_keeps_counter(self):
+        """Saving an instance loaded before new comments does not reset the counter"""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        stale.title = 'Edited'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Edited')
+        self.assertEqual(self.post.comment_total, 1)
+
+    def test_refresh_comment_totals(self):
+        """refresh_comment_totals repairs drifted counters"""
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        Post.objects.update(comment_total=42)
+        Post.objects.all().refresh_comment_totals()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_total, 1)
@@ -0,0 +1,102 @@
+import json
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from webBlog.models import Post, Comment
+
+
+class CommentModerationTest(TestCase):
+    """Test set-based comment moderation in the admin and the staff API"""
+
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_superuser(
+            username='moderator',
+            email='mod@example.com',
+            password='modpass123'
+        )
+        self.spammer = User.objects.create_user(username='spammer', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.staff)
+        self.other_post = Post.objects.create(title='Other Post', content='Test content', author=self.staff)
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.spammer, content=f'Spam {i}')
+            Comment.objects.create(post=self.other_post, author=self.spammer, content=f'More spam {i}')
+        self.good = Comment.objects.create(post=self.post, author=self.reader, content='Good comment')
+        self.client.login(username='moderator', password='modpass123')
+
+    def moderate(self, **data):
+        return self.client.post(
+            reverse('api:moderate_comments'), json.dumps(data), content_type='application/json'
+        )
+
+    def test_queryset_approval_updates_counters(self):
+        """approve()/unapprove() run one UPDATE and adjust affected posts"""
+        # Read the changing comments and update them, then for each of the
+        # two posts lock it, find its newest remaining comment and update it
+        # (each in a savepoint).
+        with self.assertNumQueries(14):
+            updated = Comment.objects.filter(author=self.spammer).unapprove()
+        self.assertEqual(updated, 10)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_total, 1)
+        self.assertEqual(list(self.post.get_sorted_comments()), [self.good])
+
+        Comment.objects.filter(post=self.post).approve()
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual((self.post.comment_total, self.other_post.comment_total), (6, 0))
+
+    def test_api_unapprove_everything_by_author(self):
+        """Staff can hide every comment by one author in one call"""
+        response = self.moderate(action='unapprove', author=self.spammer.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['affected'], 10)
+
+        response = self.client.get(reverse('api:post_comments', args=[self.post.pk]))
+        self.assertEqual([c['content'] for c in response.json()['comments']], ['Good comment'])
+
+    def test_api_delete_everything_on_post(self):
+        """Staff can delete every comment on a post"""
+        response = self.moderate(action='delete', post=self.other_post.pk)
+        self.assertEqual(response.json()['affected'], 5)
+        self.assertFalse(Comment.objects.filter(post=self.other_post).exists())
+
+    def test_api_requires_staff_and_filters(self):
+        """Non-staff users are rejected and unfiltered or malformed requests are refused"""
+        self.assertEqual(self.moderate(action='delete').status_code, 400)
+        for body in ('[]', '"delete"'):
+            response = self.client.post(reverse('api:moderate_comments'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+        client = Client()
+        client.login(username='reader', password='testpass123')
+        response = client.post(
+            reverse('api:moderate_comments'),
+            json.dumps({'action': 'delete', 'author': self.spammer.pk}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Comment.objects.count(), 11)
+
+    def test_admin_action_unapprove_by_author(self):
+        """Selecting one spam comment can hide everything by its author"""
+        spam = Comment.objects.filter(author=self.spammer).first()
+        response = self.client.post(reverse('admin:webBlog_comment_changelist'), {
+            'action': 'unapprove_by_author',
+            '_selected_action': [spam.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.filter(is_approved=False).count(), 10)
+        self.assertTrue(Comment.objects.get(pk=self.good.pk).is_approved)
+
+    def test_admin_action_delete_on_post(self):
+        """Selecting one comment can delete everything on its post"""
+        response = self.client.post(reverse('admin:webBlog_comment_changelist'), {
+            'action': 'delete_on_post',
+            '_selected_action': [self.good.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+        self.assertEqual(Comment.objects.filter(post=self.other_post).count(), 5)
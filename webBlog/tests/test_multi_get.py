@@ -0,0 +1,81 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from webBlog.models import Post, Comment
+from webBlog.view_counter import view_counter
+
+
+class MultiGetTest(TestCase):
+    """Test fetching many posts by id in one request"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content=f'Content {i}', author=self.user)
+            for i in range(3)
+        ]
+        cache.clear()
+        self.addCleanup(cache.clear)
+        view_counter.reset()
+        self.addCleanup(view_counter.reset)
+
+    def ids(self, *posts):
+        return ','.join(str(post.pk) for post in posts)
+
+    def test_request_order_and_missing_ids(self):
+        """Posts come back in request order and unknown ids are reported"""
+        first, second, third = self.posts
+        response = self.client.get('/api/posts/', {'ids': f'{third.pk},999999,{first.pk},{third.pk}'})
+        data = response.json()
+        self.assertEqual([post['id'] for post in data['posts']], [third.pk, first.pk])
+        self.assertEqual(data['missing'], [999999])
+        self.assertEqual(data['posts'][0]['author'], 'testuser')
+
+    def test_single_query_then_cache(self):
+        """One query loads every post; a repeat is served from the cache"""
+        with self.assertNumQueries(1):
+            self.client.get('/api/posts/', {'ids': self.ids(*self.posts)})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/posts/', {'ids': self.ids(*self.posts)})
+        self.assertEqual(len(response.json()['posts']), 3)
+
+    def test_cache_follows_changes(self):
+        """Editing a post or commenting on it refreshes only its entry"""
+        first, second, _ = self.posts
+        self.client.get('/api/posts/', {'ids': self.ids(first, second)})
+        first.title = 'Renamed'
+        first.save()
+        Comment.objects.create(post=second, author=self.user, content='Comment')
+        with self.assertNumQueries(1):
+            posts = self.client.get('/api/posts/', {'ids': self.ids(first, second)}).json()['posts']
+        self.assertEqual(posts[0]['title'], 'Renamed')
+        self.assertEqual(posts[1]['comment_count'], 1)
+
+    def test_pending_views_and_fields(self):
+        """Pending views are added and fields narrow the posts"""
+        view_counter.add(self.posts[0].pk)
+        posts = self.client.get(
+            '/api/posts/', {'ids': self.ids(self.posts[0]), 'fields': 'title,view_count'}
+        ).json()['posts']
+        self.assertEqual(posts, [{'id': self.posts[0].pk, 'title': 'Post 0', 'view_count': 1}])
+
+    @override_settings(API_MULTI_GET_MAX=2)
+    def test_size_cap_and_invalid_ids(self):
+        """Too many, malformed or out-of-range ids are rejected"""
+        self.assertEqual(self.client.get('/api/posts/', {'ids': self.ids(*self.posts)}).status_code, 400)
+        self.assertEqual(self.client.get('/api/posts/', {'ids': '1,two'}).status_code, 400)
+        for ids in ('1,-1', '0', str(2 ** 63)):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get('/api/posts/', {'ids': ids}).status_code, 400)
+
+    def test_post_body(self):
+        """The batch endpoint takes the ids in a JSON body"""
+        response = self.client.post(
+            '/api/posts/batch/?fields=title', json.dumps({'ids': [self.posts[1].pk]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['posts'], [{'id': self.posts[1].pk, 'title': 'Post 1'}])
+        response = self.client.post('/api/posts/batch/', '{"ids": 5}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from webBlog.models import Post
+from webBlog.pagination import EstimatedCountPaginator, estimated_count
+
+
+class EstimatedCountTest(TestCase):
+    """Test estimated-count pagination and its exact-count fallbacks"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        for i in range(3):
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+
+    def test_exact_count_without_statistics(self):
+        """Backends without table statistics count exactly"""
+        self.assertEqual(estimated_count(Post.objects.all()), (3, False))
+
+    @mock.patch('webBlog.pagination.table_row_estimate', return_value=2_500_000)
+    def test_large_unfiltered_table_is_estimated(self, table_row_estimate):
+        """Large unfiltered tables use the planner estimate"""
+        paginator = EstimatedCountPaginator(Post.objects.order_by('pk'), 10)
+        self.assertEqual(paginator.count, 2_500_000)
+        self.assertTrue(paginator.count_is_estimated)
+
+    @mock.patch('webBlog.pagination.table_row_estimate', return_value=2_500_000)
+    def test_filtered_queryset_is_counted_exactly(self, table_row_estimate):
+        """Filters make the table estimate meaningless, so count exactly"""
+        count = estimated_count(Post.objects.filter(title='Post 1'))
+        self.assertEqual(count, (1, False))
+        table_row_estimate.assert_not_called()
+
+    @mock.patch('webBlog.pagination.table_row_estimate', return_value=50)
+    def test_small_table_is_counted_exactly(self, table_row_estimate):
+        """Estimates under the threshold fall back to an exact count"""
+        self.assertEqual(estimated_count(Post.objects.all()), (3, False))
+
+    @mock.patch('webBlog.pagination.table_row_estimate', return_value=2_500_000)
+    def test_api_marks_total_as_approximate(self, table_row_estimate):
+        """The posts_list pagination block flags approximate totals"""
+        response = Client().get(reverse('api:posts_list'))
+        pagination = response.json()['pagination']
+        self.assertEqual(pagination['total_posts'], 2_500_000)
+        self.assertTrue(pagination['total_is_approximate'])
+        self.assertEqual(len(response.json()['posts']), 3)
@@ -0,0 +1,88 @@
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from webBlog.models import Post
+from webBlog.query_log import QueryStats, SlowQueryLogger, fingerprint, slow_query_stats
+
+
+class FingerprintTest(TestCase):
+    """Test SQL normalization used to group slow queries"""
+
+    def test_literals_are_normalized(self):
+        """Queries differing only in literals share a fingerprint"""
+        first = fingerprint("SELECT * FROM post WHERE id = 1 AND title = 'a'")
+        second = fingerprint("SELECT *  FROM post WHERE id = 42 AND title = 'it''s'")
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'SELECT * FROM post WHERE id = ? AND title = ?')
+
+    def test_in_lists_collapse(self):
+        """IN lists of any length share a fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s)'),
+        )
+
+
+class SlowQueryLoggerTest(TestCase):
+    """Test slow query recording through connection.execute_wrapper"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Post.objects.create(title='Test Post', content='Test content', author=self.user)
+
+    def test_queries_over_threshold_are_aggregated(self):
+        """Repeated slow queries are counted under one fingerprint"""
+        stats = QueryStats()
+        with connection.execute_wrapper(SlowQueryLogger(threshold_ms=0, stats=stats, log=False)):
+            Post.objects.filter(pk=1).first()
+            Post.objects.filter(pk=2).first()
+
+        entries = stats.top()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['count'], 2)
+        self.assertGreaterEqual(entries[0]['max_ms'], 0)
+        self.assertTrue(any('test_query_log.py' in frame for frame in entries[0]['stack']))
+
+    def test_fast_queries_are_ignored(self):
+        """Queries under the threshold are not recorded"""
+        stats = QueryStats()
+        with connection.execute_wrapper(SlowQueryLogger(threshold_ms=10_000, stats=stats)):
+            list(Post.objects.all())
+        self.assertEqual(len(stats), 0)
+
+    @override_settings(SLOW_QUERY_LOG_ENABLED=True, SLOW_QUERY_THRESHOLD_MS=0)
+    def test_middleware_records_view_name(self):
+        """The middleware attributes queries to the resolved view"""
+        slow_query_stats.reset()
+        with self.assertLogs('webBlog.slow_queries', level='WARNING'):
+            response = Client().get(reverse('api:posts_list'))
+        self.assertEqual(response.status_code, 200)
+        views = set()
+        for entry in slow_query_stats.top(limit=100):
+            views.update(entry['views'])
+        self.assertIn('api:posts_list', views)
+        slow_query_stats.reset()
+
+    def test_slow_query_endpoint_requires_staff(self):
+        """Only staff can dump the aggregate"""
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+        response = client.get(reverse('api:slow_queries'))
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = client.get(reverse('api:slow_queries'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries', response.json())
+
+    def test_slow_query_endpoint_rejects_bad_limit(self):
+        """A non-numeric or negative limit is a 400, not a 500"""
+        self.user.is_staff = True
+        self.user.save()
+        client = Client()
+        client.login(username='testuser', password='testpass123')
+        for limit in ('ten', '-1'):
+            response = client.get(reverse('api:slow_queries'), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,123 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from webBlog.models import Post, Comment
+from webBlog.rerender import rerender_markdown
+from webBlog.templatetags.markdown_extras import MARKDOWN_VERSION
+
+
+@override_settings(TASK_WORKERS=0)
+class StoredMarkdownTest(TestCase):
+    """Test stored rendered markdown and the re-render command"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(title='Post', content='Some **bold** text', author=self.user)
+            self.comment = Comment.objects.create(
+                post=self.post, author=self.user, content='[link](http://example.com) *hi*'
+            )
+
+    def test_save_stores_rendered_html(self):
+        """A task renders saved content into content_html at the current version"""
+        self.post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', self.post.content_html)
+        self.assertEqual(self.post.content_html_version, MARKDOWN_VERSION)
+        self.comment.refresh_from_db()
+        self.assertIn('<em>hi</em>', self.comment.content_html)
+        self.assertNotIn('href', self.comment.content_html)
+
+    def test_save_clears_html_until_rendered(self):
+        """Saving new content clears the stored HTML; readers render it meanwhile"""
+        self.post.content = 'New *text*'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.content_html, self.post.content_html_version), ('', 0))
+        self.assertEqual(self.post.rendered_content(), '<p>New <em>text</em></p>')
+        for callback in callbacks:
+            callback()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content_html, '<p>New <em>text</em></p>')
+
+    def test_update_fields_without_content_keeps_html(self):
+        """Saving unrelated fields doesn't re-render"""
+        Post.objects.filter(pk=self.post.pk).update(content_html='stale')
+        self.post.refresh_from_db()
+        self.post.title = 'Renamed'
+        self.post.save(update_fields=['title'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content_html, 'stale')
+
+    def test_unchanged_content_keeps_html(self):
+        """Saving a loaded post or comment without editing its content keeps the stored HTML"""
+        post = Post.objects.get(pk=self.post.pk)
+        post.title = 'Renamed'
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.save()
+        comment = Comment.objects.get(pk=self.comment.pk)
+        comment.is_approved = False
+        with self.captureOnCommitCallbacks() as comment_callbacks:
+            comment.save()
+        self.assertEqual(callbacks + comment_callbacks, [])
+        post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', post.content_html)
+        comment.refresh_from_db()
+        self.assertIn('<em>hi</em>', comment.content_html)
+
+    def test_task_renders_fresh_html(self):
+        """The task renders the content itself rather than reusing cached HTML"""
+        self.post.content = 'New *text*'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.save()
+        with mock.patch('webBlog.caching.cache.get', return_value='<p>cached</p>'):
+            self.assertEqual(self.post.rendered_content(), '<p>cached</p>')
+            for callback in callbacks:
+                callback()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content_html, '<p>New <em>text</em></p>')
+
+    def test_outdated_html_falls_back_to_render(self):
+        """rendered_content ignores HTML stored by an older MARKDOWN_VERSION"""
+        Post.objects.filter(pk=self.post.pk).update(content_html='outdated', content_html_version=0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.rendered_content(), '<p>Some <strong>bold</strong> text</p>')
+
+    def test_rerender_outdated_rows(self):
+        """Only rows rendered by an older version are re-rendered"""
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Post.objects.create(title='Other', content='# Heading', author=self.user)
+        Post.objects.filter(pk=self.post.pk).update(content_html='old', content_html_version=0)
+
+        self.assertEqual(rerender_markdown(Post, workers=1), 1)
+        self.post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', self.post.content_html)
+        self.assertEqual(self.post.content_html_version, MARKDOWN_VERSION)
+
+        self.assertEqual(rerender_markdown(Post, workers=1), 0)
+        self.assertEqual(rerender_markdown(Post, workers=1, force=True), 2)
+        self.assertEqual(rerender_markdown(Post, workers=1, force=True, start_after=self.post.pk), 1)
+        other.refresh_from_db()
+        self.assertIn('<h1>Heading</h1>', other.content_html)
+
+    def test_rerender_reports_resume_position(self):
+        """Progress reports a primary key every earlier row has been written up to"""
+        posts = [Post.objects.create(title=f'P{i}', content=f'{i}', author=self.user) for i in range(4)]
+        Post.objects.update(content_html_version=0)
+        reports = []
+        rerender_markdown(Post, workers=1, chunk_size=2, progress=lambda *args: reports.append(args))
+        self.assertEqual(reports[-1], (5, 5, posts[-1].pk))
+        self.assertFalse(Post.objects.exclude(content_html_version=MARKDOWN_VERSION).exists())
+
+    def test_command(self):
+        """The command re-renders posts and comments"""
+        Comment.objects.update(content_html='', content_html_version=0)
+        out = StringIO()
+        call_command('rerendermarkdown', '--workers', '1', stdout=out)
+        self.assertIn('Rendered 0 Blog Posts', out.getvalue())
+        self.assertIn('Rendered 1 Comments', out.getvalue())
+        self.comment.refresh_from_db()
+        self.assertIn('<em>hi</em>', self.comment.content_html)
@@ -0,0 +1,53 @@
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from webBlog.models import Post
+
+
+class SessionUsageTest(TestCase):
+    """Test that read traffic stays off the django_session table"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        Post.objects.create(title='Test Post', content='Test content', author=self.user)
+
+    def session_queries(self, queries):
+        return [query['sql'] for query in queries if 'django_session' in query['sql']]
+
+    def test_anonymous_reads_do_not_create_sessions(self):
+        """Anonymous GETs to list pages and the API never touch or set a session"""
+        for url in (reverse('blog:post_list'), reverse('api:posts_list'), reverse('api:auth_status')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.session_queries(queries.captured_queries), [])
+            self.assertNotIn('sessionid', response.cookies)
+
+    def test_authenticated_polling_is_served_from_cache(self):
+        """auth_status polls do not SELECT from django_session once cached"""
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(reverse('api:auth_status'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:auth_status'))
+        self.assertTrue(response.json()['authenticated'])
+        self.assertEqual(self.session_queries(queries.captured_queries), [])
+
+    def test_messages_do_not_write_the_session(self):
+        """Flash messages are carried in a cookie rather than the session"""
+        self.client.login(username='testuser', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('blog:post_detail', args=[Post.objects.get().pk]),
+                {'content': 'A comment'}
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('messages', response.cookies)
+        writes = [sql for sql in self.session_queries(queries.captured_queries) if not sql.startswith('SELECT')]
+        self.assertEqual(writes, [])
@@ -0,0 +1,98 @@
+import warnings
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from webBlog.models import Post
+
+
+class SitemapTest(TestCase):
+    """Test the sectioned, streamed and cached sitemap"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+            for i in range(5)
+        ]
+
+    def content(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def test_single_section_is_a_urlset(self):
+        """Small sites get every post in sitemap.xml itself"""
+        response = self.client.get(reverse('blog:sitemap'))
+        body = self.content(response)
+        self.assertEqual(response['Content-Type'], 'application/xml; charset=utf-8')
+        self.assertIn('<urlset', body)
+        for post in self.posts:
+            self.assertIn(f'http://testserver{post.get_absolute_url()}</loc><lastmod>', body)
+        self.assertIn('<loc>http://testserver/</loc>', body)
+
+    @override_settings(SITEMAP_SECTION_SIZE=2)
+    def test_large_sites_get_an_index(self):
+        """Past one section, sitemap.xml indexes sections split by primary key"""
+        body = self.content(self.client.get(reverse('blog:sitemap')))
+        self.assertIn('<sitemapindex', body)
+        self.assertEqual(body.count('<sitemap>'), 3)
+
+        first = self.posts[0].pk
+        section = (first - 1) // 2 + 1
+        body = self.content(self.client.get(reverse('blog:sitemap_section', args=[section])))
+        self.assertIn(self.posts[0].get_absolute_url(), body)
+        self.assertEqual(self.client.get(reverse('blog:sitemap_section', args=[section + 10])).status_code, 404)
+
+    @override_settings(SITEMAP_QUERY_BATCH_SIZE=2)
+    def test_sections_are_streamed_and_cached(self):
+        """The first request streams a section, later ones are served from cache until a post changes"""
+        post = self.posts[-1]
+        post_url = post.get_absolute_url()
+        url = reverse('blog:sitemap_section', args=[(post.pk - 1) // 10_000 + 1])
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.content(response)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertFalse(cached.streaming)
+        self.assertIn(post_url, cached.content.decode())
+
+        post.delete()
+        response = self.client.get(url)
+        self.assertNotIn(f'{post_url}<', self.content(response))
+
+    @override_settings(SITEMAP_QUERY_BATCH_SIZE=2)
+    async def test_asgi_sections_are_streamed(self):
+        """Under ASGI the section is streamed batch by batch, then cached"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            response = await self.async_client.get(reverse('blog:sitemap'))
+            self.assertTrue(response.is_async)
+            chunks = [chunk.decode() async for chunk in response.streaming_content]
+        # Header, static pages, three batches of posts and the closing tag.
+        self.assertEqual(len(chunks), 7)
+        cached = await self.async_client.get(reverse('blog:sitemap'))
+        self.assertEqual(cached.content.decode(), ''.join(chunks))
+
+    @override_settings(SITEMAP_SECTION_SIZE=2)
+    def test_cache_is_per_scheme(self):
+        """http and https requests never get each other's cached URLs"""
+        first = self.posts[0].pk
+        section = reverse('blog:sitemap_section', args=[(first - 1) // 2 + 1])
+        for url in (reverse('blog:sitemap'), section):
+            self.content(self.client.get(url))
+            body = self.content(self.client.get(url, secure=True))
+            self.assertIn('<loc>https://testserver/', body)
+            self.assertNotIn('http://testserver/', body)
+            body = self.content(self.client.get(url))
+            self.assertNotIn('https://testserver/', body)
+
+    def test_robots_txt_points_to_sitemap(self):
+        """robots.txt advertises the sitemap"""
+        response = self.client.get('/robots.txt')
+        self.assertContains(response, 'Sitemap: http://testserver/sitemap.xml')
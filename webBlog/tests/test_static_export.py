@@ -0,0 +1,78 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from webBlog.models import Post, Comment
+from webBlog.static_export import export_site
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class StaticExportTest(TestCase):
+    """Test the incremental static-site export"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content=f'Content **{i}**', author=self.user)
+            for i in range(3)
+        ]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = Path(directory.name)
+
+    def export(self, **kwargs):
+        return export_site(self.output, workers=1, **kwargs)
+
+    def test_full_export_writes_site(self):
+        """Posts, list pages and feeds are rendered with the site templates"""
+        summary = self.export()
+        self.assertEqual(summary, {'posts': 3, 'removed': 0, 'pages': 2})
+
+        post_html = (self.output / 'post' / str(self.posts[0].pk) / 'index.html').read_text()
+        self.assertIn('<strong>0</strong>', post_html)
+        index_html = (self.output / 'index.html').read_text()
+        self.assertIn('Post 2', index_html)
+        self.assertIn('href="/page/2/"', index_html)
+        self.assertIn('Post 0', (self.output / 'page' / '2' / 'index.html').read_text())
+        self.assertIn('<rss', (self.output / 'feeds' / 'rss.xml').read_text())
+        manifest = json.loads((self.output / 'manifest.json').read_text())
+        self.assertEqual(len(manifest['posts']), 3)
+        self.assertTrue(manifest['list_complete'])
+
+    @override_settings(ALLOWED_HOSTS=['blog.example.com'])
+    def test_feeds_use_base_url(self):
+        """Absolute links in exported feeds use the scheme and host of base_url"""
+        self.export(base_url='https://blog.example.com')
+        rss = (self.output / 'feeds' / 'rss.xml').read_text()
+        self.assertIn(f'https://blog.example.com/post/{self.posts[0].pk}/', rss)
+
+    def test_export_is_incremental(self):
+        """Only changed posts are re-rendered, and nothing when nothing changed"""
+        self.export()
+        self.assertEqual(self.export(), {'posts': 0, 'removed': 0, 'pages': 0})
+
+        Comment.objects.create(post=self.posts[1], author=self.user, content='New comment')
+        summary = self.export()
+        self.assertEqual((summary['posts'], summary['pages']), (1, 2))
+        html = (self.output / 'post' / str(self.posts[1].pk) / 'index.html').read_text()
+        self.assertIn('New comment', html)
+
+    def test_deleted_posts_are_removed(self):
+        """Posts deleted since the last export are removed from the mirror"""
+        self.export()
+        pk = self.posts[0].pk
+        self.posts[0].delete()
+        summary = self.export()
+        self.assertEqual(summary['removed'], 1)
+        self.assertFalse((self.output / 'post' / str(pk)).exists())
+        self.assertFalse((self.output / 'page' / '2').exists())
+
+    def test_command_reports_summary(self):
+        """exportsite prints what it exported"""
+        out = StringIO()
+        call_command('exportsite', str(self.output), '--workers', '1', stdout=out)
+        self.assertIn('Exported 3 posts and 2 list pages', out.getvalue())
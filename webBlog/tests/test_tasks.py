@@ -0,0 +1,162 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from webBlog.feeds import warm_feeds
+from webBlog.models import Comment, Post, Task
+from webBlog.tasks import claim, run_pending, run_task, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def explode(value):
+    raise ValueError('boom')
+
+
+@override_settings(TASK_RUNNER='worker', TASK_MAX_ATTEMPTS=2, TASK_RETRY_DELAY=10)
+class TaskQueueTest(TestCase):
+    """Test queueing, deduplicating and retrying background tasks"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        calls.clear()
+
+    def enqueue(self, func, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            func.enqueue(*args)
+
+    @override_settings(TASK_RUNNER='thread', TASK_WORKERS=0)
+    def test_runs_after_commit(self):
+        """Tasks run once the transaction commits, and are removed when done"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.enqueue(1)
+            self.assertEqual(calls, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_rolled_back_writes_queue_nothing(self):
+        """A task queued in a rolled-back transaction is never stored"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record.enqueue(1)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(Task.objects.exists())
+
+    def test_identical_pending_tasks_are_deduplicated(self):
+        """Queueing a task that is already pending is a no-op"""
+        self.enqueue(record, 1)
+        self.enqueue(record, 1)
+        self.enqueue(record, 2)
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(sorted(calls), [1, 2])
+
+        # Once running, a new identical task is queued again.
+        self.enqueue(record, 3)
+        running = claim()
+        self.enqueue(record, 3)
+        self.assertEqual(Task.objects.count(), 2)
+        run_task(running)
+        self.assertEqual(run_pending(), 1)
+
+    def test_failures_are_retried_with_backoff(self):
+        """A failing task is retried after a delay, then kept as failed"""
+        self.enqueue(explode, 1)
+        with self.assertLogs('webBlog.tasks', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('ValueError: boom', failed.last_error)
+        self.assertGreater(failed.run_at, timezone.now() + timedelta(seconds=9))
+        self.assertEqual(run_pending(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('webBlog.tasks', 'ERROR'):
+            self.assertEqual(run_pending(), 1)
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), ('failed', 2))
+        self.assertEqual(run_pending(), 0)
+
+    def test_retry_defers_to_a_newer_duplicate(self):
+        """A failed task is dropped if the same task was queued meanwhile"""
+        self.enqueue(explode, 1)
+        running = claim()
+        self.enqueue(explode, 1)
+        run_task(running)
+        self.assertEqual(list(Task.objects.values_list('status', 'attempts')), [('pending', 0)])
+
+    def test_abandoned_tasks_are_claimed_again(self):
+        """A running task is claimed again once its lock has expired"""
+        self.enqueue(record, 1)
+        first = claim()
+        self.assertIsNone(claim())
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        second = claim()
+        self.assertEqual((second.pk, second.attempts), (first.pk, 2))
+
+    @override_settings(TASK_RUNNER='thread', TASK_WORKERS=0)
+    def test_saving_queues_rendering(self):
+        """Saving posts and comments renders their HTML once committed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='Post', content='*post*', author=self.user)
+            comment = Comment.objects.create(post=post, author=self.user, content='*comment*')
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(post.content_html, '<p><em>post</em></p>')
+        self.assertEqual(comment.content_html, '<p><em>comment</em></p>')
+
+    @override_settings(FEED_BASE_URL='http://example.com', ALLOWED_HOSTS=['example.com', 'testserver'])
+    def test_warm_feeds(self):
+        """Feeds of a changed post are rendered into the cache ahead of pollers"""
+        cache.clear()
+        post = Post.objects.create(title='Post', content='Text', author=self.user)
+        warm_feeds(post.pk)
+        for url in (reverse('blog:posts_rss'), reverse('blog:comments_atom', args=[post.pk])):
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_HOST='example.com')
+            self.assertContains(response, f'http://example.com/post/{post.pk}/')
+
+    @override_settings(FEED_BASE_URL='https://example.com:8443', ALLOWED_HOSTS=['example.com'])
+    def test_warm_feeds_for_https_base_url(self):
+        """Warmed feeds use the scheme and port of FEED_BASE_URL"""
+        cache.clear()
+        post = Post.objects.create(title='Post', content='Text', author=self.user)
+        warm_feeds(post.pk)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog:posts_rss'), HTTP_HOST='example.com:8443', secure=True)
+        self.assertContains(response, f'https://example.com:8443/post/{post.pk}/')
+
+
+@override_settings(TASK_RUNNER='worker')
+class RunTasksCommandTest(TransactionTestCase):
+    """Test the runtasks worker command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_due_tasks_once(self):
+        """--once runs every due task and exits"""
+        for value in range(3):
+            record.enqueue(value)
+        out = StringIO()
+        call_command('runtasks', '--once', '--concurrency', '1', stdout=out)
+        self.assertIn('Ran 3 tasks', out.getvalue())
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Task.objects.exists())
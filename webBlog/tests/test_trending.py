@@ -0,0 +1,122 @@
+import math
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.db.backends.sqlite3._functions import _sqlite_exp
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from webBlog.models import Post, Comment
+from webBlog.trending import score_from_times
+
+
+class TrendingSortTest(TestCase):
+    """Test the incrementally maintained trending and active sorts"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.now = timezone.now()
+        with mock.patch('django.utils.timezone.now', return_value=self.now - timedelta(days=30)):
+            self.quiet = Post.objects.create(title='Quiet', content='Test content', author=self.user)
+        with mock.patch('django.utils.timezone.now', return_value=self.now - timedelta(days=40)):
+            self.busy_last_week = Post.objects.create(title='Busy last week', content='Test content', author=self.user)
+            self.active = Post.objects.create(title='Active', content='Test content', author=self.user)
+        for _ in range(5):
+            self.comment(self.busy_last_week, days_ago=7)
+        self.comment(self.active, days_ago=0)
+
+    def comment(self, post, days_ago, **kwargs):
+        with mock.patch('django.utils.timezone.now', return_value=self.now - timedelta(days=days_ago)):
+            return Comment.objects.create(post=post, author=self.user, content='Comment', **kwargs)
+
+    def titles(self, url):
+        return [post['title'] for post in self.client.get(url).json()['posts']]
+
+    def test_incremental_score_matches_full_recompute(self):
+        """Scores updated per comment equal the score computed from all comments"""
+        self.comment(self.active, days_ago=2)
+        self.active.refresh_from_db()
+        times = Comment.objects.filter(post=self.active).values_list('created_at', flat=True)
+        self.assertAlmostEqual(self.active.trending_score, score_from_times(times))
+        self.assertEqual(self.active.last_comment_at, self.now)
+
+    def test_recent_activity_outranks_decayed_activity(self):
+        """One comment today beats five comments a week ago"""
+        self.assertEqual(
+            self.titles(reverse('api:posts_list') + '?sort=trending'),
+            ['Active', 'Busy last week', 'Quiet'],
+        )
+        for _ in range(3):
+            self.comment(self.busy_last_week, days_ago=0)
+        self.assertEqual(self.titles(reverse('api:posts_list') + '?sort=trending')[0], 'Busy last week')
+
+    def test_active_sort_uses_last_comment(self):
+        """Posts are ordered by their latest comment, or creation if they have none"""
+        self.assertEqual(
+            self.titles(reverse('api:posts_list') + '?sort=active'),
+            ['Active', 'Busy last week', 'Quiet'],
+        )
+        response = self.client.get(reverse('blog:post_list') + '?sort=active')
+        self.assertEqual([post.title for post in response.context['posts']], ['Active', 'Busy last week', 'Quiet'])
+
+    def test_unapproving_removes_activity(self):
+        """Hidden comments no longer count toward trending or activity"""
+        Comment.objects.filter(post=self.active).unapprove()
+        self.active.refresh_from_db()
+        self.assertIsNone(self.active.last_comment_at)
+        self.assertEqual(self.active.trending_score, 0)
+        self.assertEqual(self.titles(reverse('api:posts_list') + '?sort=trending')[0], 'Busy last week')
+
+    def test_unapproved_comment_is_not_activity(self):
+        """Comments created unapproved do not bump the post"""
+        self.comment(self.quiet, days_ago=0, is_approved=False)
+        self.quiet.refresh_from_db()
+        self.assertIsNone(self.quiet.last_comment_at)
+
+    def test_deleting_comments_matches_full_recompute(self):
+        """Removing comments, including the one dominating the score, keeps it exact"""
+        older = self.comment(self.active, days_ago=3)
+        self.comment(self.active, days_ago=90)
+        newest = Comment.objects.get(post=self.active, created_at=self.now)
+        for comment in (older, newest):
+            comment.delete()
+            self.active.refresh_from_db()
+            times = list(Comment.objects.filter(post=self.active).values_list('created_at', flat=True))
+            self.assertAlmostEqual(self.active.trending_score, score_from_times(times))
+            self.assertEqual(self.active.last_comment_at, max(times))
+            self.assertEqual(self.active.comment_total, len(times))
+
+    def test_delete_does_not_read_the_thread(self):
+        """Deleting a comment costs the same however many comments the post has"""
+        def delete_query_count():
+            comment = self.comment(self.busy_last_week, days_ago=0)
+            with CaptureQueriesContext(connection) as queries:
+                comment.delete()
+            return len(queries)
+
+        before = delete_query_count()
+        for _ in range(20):
+            self.comment(self.busy_last_week, days_ago=1)
+        self.assertEqual(delete_query_count(), before)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=0.01)
+    def test_large_score_gap_does_not_underflow(self):
+        """Scores far apart add up without exp() underflowing, as it raises on PostgreSQL"""
+        if connection.vendor == 'sqlite':
+            def strict_exp(value):
+                if value is not None and value < -745:
+                    raise ValueError('value out of range: underflow')
+                return None if value is None else math.exp(value)
+
+            connection.ensure_connection()
+            connection.connection.create_function('EXP', 1, strict_exp, deterministic=True)
+            self.addCleanup(connection.connection.create_function, 'EXP', 1, _sqlite_exp, deterministic=True)
+        post = Post.objects.create(title='New', content='Test content', author=self.user)
+        comment = self.comment(post, days_ago=0)
+        post.refresh_from_db()
+        self.assertAlmostEqual(post.trending_score, score_from_times([comment.created_at]))
+        self.assertGreater(post.trending_score, 745)
@@ -0,0 +1,134 @@
+import hashlib
+import tempfile
+import warnings
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from webBlog.models import MediaFile
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+
+class MediaUploadTest(TestCase):
+    """Test content-addressed uploads and how they are served"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = Path(directory.name)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, UPLOAD_MAX_BYTES=4096)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.login(username='testuser', password='testpass123')
+
+    def upload(self, content=PNG, name='image.png'):
+        return self.client.post('/api/media/', {'file': SimpleUploadedFile(name, content)})
+
+    def test_upload_is_stored_by_hash(self):
+        """Uploads are stored under their SHA-256 and identical content is stored once"""
+        response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        digest = hashlib.sha256(PNG).hexdigest()
+        self.assertEqual(response.json()['url'], f'/media/uploads/{digest[:2]}/{digest}.png')
+        self.assertEqual((self.media_root / 'uploads' / digest[:2] / f'{digest}.png').read_bytes(), PNG)
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_login(other)
+        response = self.upload(name='copy.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['created'])
+        self.assertEqual(MediaFile.objects.count(), 1)
+        self.assertEqual(list((self.media_root / 'uploads' / '.incoming').iterdir()), [])
+
+    def test_rejected_uploads(self):
+        """Non-images, oversized files and anonymous uploads are refused"""
+        self.assertEqual(self.upload(b'<html>not an image</html>', 'page.png').status_code, 415)
+        self.assertEqual(self.upload(PNG * 4).status_code, 413)
+        self.assertEqual(self.client.post('/api/media/', {}).status_code, 400)
+        self.assertEqual(list((self.media_root / 'uploads' / '.incoming').iterdir()), [])
+        self.client.logout()
+        self.assertEqual(self.upload().status_code, 302)
+
+    def test_unused_files_are_discarded(self):
+        """Files under other field names, or extra files, leave nothing behind"""
+        incoming = self.media_root / 'uploads' / '.incoming'
+        response = self.client.post('/api/media/', {'image': SimpleUploadedFile('image.png', PNG)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(incoming.iterdir()), [])
+
+        response = self.client.post('/api/media/', {
+            'file': SimpleUploadedFile('image.png', PNG),
+            'extra': SimpleUploadedFile('other.png', PNG + b'other'),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(incoming.iterdir()), [])
+
+        response = self.client.post('/api/media/', {
+            'file': SimpleUploadedFile('huge.png', PNG * 4),
+            'extra': SimpleUploadedFile('other.png', PNG),
+        })
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(list(incoming.iterdir()), [])
+
+    def test_download_headers_and_conditional_get(self):
+        """Downloads are immutable with a strong ETag"""
+        url = self.upload().json()['url']
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), PNG)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(PNG).hexdigest()}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_range_requests(self):
+        """Single byte ranges are answered with 206 or 416"""
+        url = self.upload().json()['url']
+        response = self.client.get(url, HTTP_RANGE='bytes=8-15')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 8-15/{len(PNG)}')
+        self.assertEqual(b''.join(response.streaming_content), PNG[8:16])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), PNG[-4:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(PNG)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PNG)}')
+
+        # A stale If-Range gets the whole file.
+        response = self.client.get(url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_asgi_range_is_streamed(self):
+        """Under ASGI the body is read in blocks, never all at once"""
+        url = (await sync_to_async(self.upload)()).json()['url']
+        with mock.patch('webBlog.uploads.STREAM_BLOCK_SIZE', 256):
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                response = await self.async_client.get(url, headers={'Range': 'bytes=8-'})
+                self.assertEqual(response.status_code, 206)
+                self.assertTrue(response.is_async)
+                chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(b''.join(chunks), PNG[8:])
+        self.assertEqual([len(chunk) for chunk in chunks], [256] * 4)
+
+    def test_unknown_files_are_not_served(self):
+        """Only well-formed names of stored files are served"""
+        digest = hashlib.sha256(PNG).hexdigest()
+        self.assertEqual(self.client.get(f'/media/uploads/{digest[:2]}/{digest}.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/uploads/ab/notahash.png').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect', MEDIA_ACCEL_PREFIX='/protected/')
+    def test_accel_redirect(self):
+        """With X-Accel-Redirect the front server sends the file"""
+        url = self.upload().json()['url']
+        response = self.client.get(url)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + url[len('/media/'):])
+        self.assertIn('immutable', response['Cache-Control'])
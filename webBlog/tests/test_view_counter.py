@@ -0,0 +1,146 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.urls import reverse
+from webBlog.models import Post
+from webBlog.view_counter import ViewCountBuffer, view_counter
+
+
+class ViewCountBufferTest(TestCase):
+    """Test batching of post view counts"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+            for i in range(3)
+        ]
+
+    def counts(self):
+        return list(Post.objects.order_by('pk').values_list('view_count', flat=True))
+
+    def test_flush_writes_one_update(self):
+        """Pending views for many posts are written with a single UPDATE"""
+        buffer = ViewCountBuffer(backend='local', flush_interval=3600, flush_threshold=100)
+        for post, views in zip(self.posts, (5, 1, 3)):
+            for _ in range(views):
+                buffer.add(post.pk)
+        self.assertEqual(self.counts(), [0, 0, 0])
+        self.assertEqual(buffer.pending([self.posts[0].pk]), {self.posts[0].pk: 5})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 9)
+        self.assertEqual(self.counts(), [5, 1, 3])
+        self.assertEqual(buffer.pending(post.pk for post in self.posts), {})
+
+    def test_threshold_triggers_flush(self):
+        """Reaching the size threshold flushes without waiting for the interval"""
+        buffer = ViewCountBuffer(backend='local', flush_interval=3600, flush_threshold=4)
+        for _ in range(4):
+            buffer.add(self.posts[1].pk)
+        self.assertEqual(self.counts(), [0, 4, 0])
+
+    def test_interval_does_not_flush_in_add(self):
+        """Without the flush thread, an elapsed interval never flushes inside add()"""
+        buffer = ViewCountBuffer(backend='local', flush_interval=0, flush_threshold=100)
+        buffer.add(self.posts[0].pk)
+        self.assertEqual(self.counts(), [0, 0, 0])
+        self.assertEqual(buffer.pending([self.posts[0].pk]), {self.posts[0].pk: 1})
+
+    def test_flush_thread_writes_views(self):
+        """The flush thread writes pending views after the interval and at the threshold"""
+        written = []
+        flushed = threading.Event()
+
+        def write(counts):
+            written.append(dict(counts))
+            flushed.set()
+
+        buffer = ViewCountBuffer(backend='local', flush_interval=3600, flush_threshold=3)
+        with mock.patch('webBlog.view_counter.write_view_counts', side_effect=write):
+            buffer.start()
+            self.addCleanup(buffer.stop)
+            buffer.add(self.posts[0].pk, 2)
+            self.assertFalse(flushed.wait(0.2))
+            buffer.add(self.posts[1].pk)
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(written, [{self.posts[0].pk: 2, self.posts[1].pk: 1}])
+
+        buffer.stop()
+        buffer = ViewCountBuffer(backend='local', flush_interval=0.05, flush_threshold=100)
+        flushed.clear()
+        with mock.patch('webBlog.view_counter.write_view_counts', side_effect=write):
+            buffer.start()
+            self.addCleanup(buffer.stop)
+            buffer.add(self.posts[2].pk)
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(written[-1], {self.posts[2].pk: 1})
+
+    def test_failed_flush_keeps_views(self):
+        """Views from a failed flush are retried on the next one"""
+        buffer = ViewCountBuffer(backend='local', flush_interval=3600, flush_threshold=100)
+        buffer.add(self.posts[0].pk, 2)
+        with mock.patch('webBlog.view_counter.write_view_counts', side_effect=RuntimeError):
+            with self.assertLogs('webBlog.view_counter', 'ERROR'):
+                self.assertEqual(buffer.flush(), 0)
+        buffer.add(self.posts[0].pk)
+        buffer.flush()
+        self.assertEqual(self.counts(), [3, 0, 0])
+
+    def test_cache_backend_shares_pending_views(self):
+        """Workers using the cache backend see and flush each other's views"""
+        worker_a = ViewCountBuffer(backend='cache', flush_interval=3600, flush_threshold=100)
+        worker_b = ViewCountBuffer(backend='cache', flush_interval=3600, flush_threshold=100)
+        self.addCleanup(worker_a.reset)
+        worker_a.add(self.posts[2].pk, 2)
+        worker_b.add(self.posts[2].pk)
+        self.assertEqual(worker_a.pending([self.posts[2].pk]), {self.posts[2].pk: 3})
+
+        worker_b.flush()
+        self.assertEqual(self.counts(), [0, 0, 3])
+        self.assertEqual(worker_a.pending([self.posts[2].pk]), {})
+        self.assertEqual(worker_a.flush(), 0)
+
+
+class PostViewCountTest(TestCase):
+    """Test that post pages count views and show them"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.user)
+        view_counter.reset()
+        self.addCleanup(view_counter.reset)
+
+    def test_detail_views_are_counted_without_writes(self):
+        """Viewing a post buffers the view instead of updating the row"""
+        self.client.get(reverse('blog:post_detail', args=[self.post.pk]))
+        self.client.get(reverse('api:post_detail', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+
+        response = self.client.get(reverse('api:posts_list'))
+        self.assertEqual(response.json()['posts'][0]['view_count'], 2)
+        response = self.client.get(reverse('blog:post_detail', args=[self.post.pk]))
+        self.assertContains(response, '2 views')
+
+        view_counter.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+
+    def test_comment_fetches_are_not_views(self):
+        """Loading a post's comments through the API does not count a view"""
+        self.client.get(reverse('api:post_comments', args=[self.post.pk]))
+        self.assertEqual(view_counter.pending([self.post.pk]), {})
+
+    def test_save_does_not_overwrite_view_count(self):
+        """Saving a stale post instance keeps counts written by a flush"""
+        stale = Post.objects.get(pk=self.post.pk)
+        view_counter.add(self.post.pk, 5)
+        view_counter.flush()
+        stale.title = 'Edited'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 5)
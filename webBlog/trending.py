@@ -0,0 +1,97 @@
+"""Time-decayed comment activity score for the trending post sort.
+
+Each approved comment contributes ``2 ** ((t - now) / half_life)``, so a
+comment is worth half as much after every ``TRENDING_HALF_LIFE_HOURS``. Since
+every post decays at the same rate, posts can be ranked by the sum measured
+against a fixed ``EPOCH`` instead of ``now``, which never changes, so the
+stored score only has to be updated when a comment arrives. It is kept as
+the log of that sum (``log(sum(exp(x)))``) so that it does not overflow.
+
+Removing comments subtracts their weight the same way. When they made up
+nearly all of the score the subtraction loses its precision, and the score
+is recomputed from the comments of the last ``WINDOW_HALF_LIVES`` half-lives
+before the newest remaining one; anything older weighs less than the
+rounding error of a float.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+# Lower bound for the argument of SQL exp(): PostgreSQL raises an underflow
+# error below about -745 rather than returning 0. exp(-700) is already far
+# below the precision of a float next to 1.
+MIN_EXP_ARGUMENT = -700.0
+WINDOW_HALF_LIVES = 64
+# Smallest fraction of the score that may remain after a subtraction
+# before it is recomputed instead.
+MIN_REMAINING = 1e-6
+
+
+def _half_life_hours():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24)
+
+
+def decay_exponent(when):
+    """Log of the weight of a comment made at ``when``."""
+    return (when - EPOCH).total_seconds() * math.log(2) / (_half_life_hours() * 3600)
+
+
+def combined_exponent(times):
+    """Log of the total weight of comments made at ``times`` (not empty)."""
+    exponents = [decay_exponent(when) for when in times]
+    peak = max(exponents)
+    return peak + math.log(sum(math.exp(x - peak) for x in exponents))
+
+
+def window_start(latest):
+    """Oldest comment time that still matters next to one made at ``latest``."""
+    return latest - timedelta(hours=_half_life_hours() * WINDOW_HALF_LIVES)
+
+
+def score_from_times(times):
+    """Trending score of a post with approved comments made at ``times``.
+
+    Matches applying ``add_comment_expression`` for each comment to the
+    column default of 0.
+    """
+    exponents = [0.0] + [decay_exponent(when) for when in times]
+    peak = max(exponents)
+    return peak + math.log(sum(math.exp(x - peak) for x in exponents))
+
+
+def add_comments_expression(times, field='trending_score'):
+    """SQL for ``field`` with more comments made at ``times``.
+
+    ``log(exp(a) + exp(b)) == max(a, b) + log(1 + exp(-|a - b|))``, with the
+    argument of ``exp`` clamped to ``MIN_EXP_ARGUMENT``. Exponents keep
+    growing with time since ``EPOCH``, so a post far behind (or ahead of)
+    the new comments, such as one without any yet, has an arbitrarily large
+    ``|a - b|``; the clamp keeps the result exact while only the difference
+    matters, never the absolute size of the exponents.
+    """
+    exponent = Value(combined_exponent(times), output_field=FloatField())
+    return Greatest(F(field), exponent) + Ln(
+        1 + Exp(Greatest(-Abs(F(field) - exponent), Value(MIN_EXP_ARGUMENT, output_field=FloatField())))
+    )
+
+
+def add_comment_expression(when, field='trending_score'):
+    """SQL for ``field`` with one more comment made at ``when``."""
+    return add_comments_expression([when], field)
+
+
+def remove_comments_from_score(score, times):
+    """``score`` without comments made at ``times``, or None if imprecise.
+
+    ``log(exp(a) - exp(b)) == a + log(1 - exp(b - a))``; None means the
+    removed comments were nearly the whole score and it must be recomputed.
+    """
+    remaining = -math.expm1(min(combined_exponent(times) - score, 0))
+    if remaining < MIN_REMAINING:
+        return None
+    # The empty sum is exp(0); rounding must not take the score below it.
+    return max(score + math.log(remaining), 0.0)
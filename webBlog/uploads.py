@@ -0,0 +1,258 @@
+"""Content-addressed media uploads.
+
+Uploaded files are stored under ``MEDIA_ROOT/uploads/<aa>/<sha256><ext>``,
+named by the SHA-256 of their content, so uploading the same image again
+only returns the existing URL. ``HashingUploadHandler`` writes each chunk to
+a temporary file as it arrives and hashes it on the way, so uploads are never
+held in memory and never read twice.
+
+Because a URL's content can never change, downloads carry a strong ``ETag``
+and ``Cache-Control: immutable``. ``serve_upload`` answers ``Range``
+requests itself, reading the file a block at a time under either server
+(see ``webBlog/streaming.py``), or hands the file to the front server when
+``MEDIA_SENDFILE_HEADER`` is set (``X-Accel-Redirect`` for nginx,
+``X-Sendfile`` for Apache and lighttpd).
+"""
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_http_methods
+
+from .streaming import streaming_response
+
+UPLOADS_DIR = 'uploads'
+TEMP_DIR = '.incoming'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Leading bytes of each accepted type; uploads are identified by content,
+# never by the client's filename or Content-Type.
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'GIF87a', 'image/gif', '.gif'),
+    (b'GIF89a', 'image/gif', '.gif'),
+]
+CONTENT_TYPES = {extension: content_type for _, content_type, extension in SIGNATURES}
+CONTENT_TYPES['.webp'] = 'image/webp'
+
+_NAME = re.compile(r'^([0-9a-f]{64})(\.[a-z]+)$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def sniff(head):
+    """Return ``(content_type, extension)`` for the file starting with ``head``, or None."""
+    for signature, content_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', '.webp'
+    return None
+
+
+def upload_path(digest, extension):
+    """Path of a stored upload relative to MEDIA_ROOT."""
+    return f'{UPLOADS_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+def upload_url(digest, extension):
+    return settings.MEDIA_URL + upload_path(digest, extension)
+
+
+class HashedUpload(UploadedFile):
+    """A file the handler has already written to a temporary path and hashed."""
+
+    def __init__(self, temp_path, size, sha256, name, content_type, charset, content_type_extra):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.temp_path = temp_path
+        self.sha256 = sha256
+
+    def discard(self):
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Streams each uploaded file to disk while hashing it.
+
+    Files bigger than ``UPLOAD_MAX_BYTES`` are skipped and flagged in
+    ``too_large``.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.too_large = False
+        self.temp_file = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length and self.content_length > settings.UPLOAD_MAX_BYTES + 64 * 1024:
+            self.too_large = True
+            raise SkipFile()
+        directory = Path(settings.MEDIA_ROOT) / UPLOADS_DIR / TEMP_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        # Created next to the final location so that storing it is a rename.
+        self.temp_file = tempfile.NamedTemporaryFile(dir=directory, suffix='.upload', delete=False)
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.UPLOAD_MAX_BYTES:
+            self.too_large = True
+            self._discard()
+            raise SkipFile()
+        self.hash.update(raw_data)
+        self.temp_file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.temp_file.close()
+        upload = HashedUpload(
+            self.temp_file.name, self.size, self.hash.hexdigest(), self.file_name,
+            self.content_type, self.charset, self.content_type_extra,
+        )
+        self.temp_file = None
+        return upload
+
+    def upload_interrupted(self):
+        self._discard()
+
+    def _discard(self):
+        if self.temp_file is not None:
+            self.temp_file.close()
+            os.unlink(self.temp_file.name)
+            self.temp_file = None
+
+
+def store_upload(upload, user):
+    """Move a ``HashedUpload`` into content-addressed storage.
+
+    Returns:
+        tuple: ``(media_file, created)``; ``media_file`` is None if the
+            content isn't an accepted image type.
+    """
+    from .models import MediaFile
+
+    try:
+        with open(upload.temp_path, 'rb') as file:
+            detected = sniff(file.read(16))
+        if detected is None:
+            return None, False
+        content_type, extension = detected
+        destination = Path(settings.MEDIA_ROOT) / upload_path(upload.sha256, extension)
+        if not destination.exists():
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(upload.temp_path, 0o644)
+            # Concurrent uploads of the same content replace it with
+            # identical bytes.
+            os.replace(upload.temp_path, destination)
+        return MediaFile.objects.get_or_create(
+            sha256=upload.sha256,
+            defaults={
+                'size': upload.size,
+                'content_type': content_type,
+                'extension': extension,
+                'uploaded_by': user,
+            },
+        )
+    finally:
+        upload.discard()
+
+
+def discard_uploads(files):
+    """Delete the temporary files of every ``HashedUpload`` in ``files`` (a ``request.FILES``)."""
+    for _, uploads in files.lists():
+        for upload in uploads:
+            if isinstance(upload, HashedUpload):
+                upload.discard()
+
+
+def _parse_range(header, size):
+    """Return ``(start, end)`` (inclusive) for a single-range header.
+
+    None means the header should be ignored and the whole file sent; an
+    unsatisfiable range raises ValueError.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: serving the whole file is allowed.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('range not satisfiable')
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                return
+            length -= len(block)
+            yield block
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_upload(request, shard, name):
+    match = _NAME.match(name)
+    if not match or shard != name[:2] or match.group(2) not in CONTENT_TYPES:
+        raise Http404('No such file')
+    relative = f'{UPLOADS_DIR}/{shard}/{name}'
+    path = Path(settings.MEDIA_ROOT) / relative
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        raise Http404('No such file')
+
+    etag = f'"{match.group(1)}"'
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL, 'Accept-Ranges': 'bytes'}
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        return HttpResponseNotModified(headers=headers)
+
+    content_type = CONTENT_TYPES[match.group(2)]
+    sendfile = settings.MEDIA_SENDFILE_HEADER
+    if sendfile:
+        # The front server answers Range and conditional requests itself.
+        target = settings.MEDIA_ACCEL_PREFIX + relative if sendfile == 'X-Accel-Redirect' else str(path)
+        return HttpResponse(content_type=content_type, headers={**headers, sendfile: target})
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    headers['Content-Length'] = str(length)
+    status = 200
+    if byte_range:
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    body = [] if request.method == 'HEAD' else _read_range(path, start, length)
+    # Read a block at a time under ASGI too, rather than the whole range at once.
+    return streaming_response(request, body, status=status, content_type=content_type, headers=headers)
@@ -1,11 +1,28 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import comment_stream, feeds, sitemaps, uploads, views
 
 app_name = 'blog'
 
 urlpatterns = [
     path('', views.PostListView.as_view(), name='post_list'),
     path('post/<int:pk>/', views.PostDetailView.as_view(), name='post_detail'),
+    path('post/<int:pk>/comments/rss/', feeds.comments_rss, name='comments_rss'),
+    path('post/<int:pk>/comments/atom/', feeds.comments_atom, name='comments_atom'),
+    path('post/<int:pk>/comments/stream/', comment_stream.comment_stream, name='comment_stream'),
+    path('post/<int:pk>/comments/poll/', comment_stream.comment_poll, name='comment_poll'),
+    path('feeds/rss/', feeds.posts_rss, name='posts_rss'),
+    path('feeds/atom/', feeds.posts_atom, name='posts_atom'),
+    path('feeds/author/<str:username>/rss/', feeds.author_rss, name='author_rss'),
+    path('feeds/author/<str:username>/atom/', feeds.author_atom, name='author_atom'),
+    path('sitemap.xml', sitemaps.sitemap, name='sitemap'),
+    path('sitemap-<int:section>.xml', sitemaps.sitemap_section, name='sitemap_section'),
+    path('robots.txt', sitemaps.robots_txt, name='robots_txt'),
+    path(
+        f'{settings.MEDIA_URL.strip("/")}/{uploads.UPLOADS_DIR}/<str:shard>/<str:name>',
+        uploads.serve_upload,
+        name='media_upload',
+    ),
     path('markdown-guide/', views.MarkdownGuideView.as_view(), name='markdown_guide'),
     path('login/', views.CustomLoginView.as_view(), name='login'),
     path('logout/', views.CustomLogoutView.as_view(), name='logout'),
@@ -0,0 +1,248 @@
+"""Write-behind buffer for ``Post.view_count``.
+
+Counting a view with ``UPDATE ... SET view_count = view_count + 1`` would turn
+every page read into a write that serializes on popular rows. Views are
+instead added to a buffer and written out by ``flush()`` as one
+``UPDATE ... CASE`` statement covering every post. In a serving process a
+background thread flushes every ``VIEW_COUNT_FLUSH_INTERVAL`` seconds, and
+early once ``VIEW_COUNT_FLUSH_THRESHOLD`` views are pending, and again when
+the process exits; requests never wait for a flush.
+
+With ``VIEW_COUNT_BUFFER = 'local'`` pending views live in the worker's
+memory. With ``'cache'`` they are accumulated with ``cache.incr`` so that all
+workers see the same pending counts, and views left behind by a worker that
+died are written out the next time any worker flushes that post.
+
+Counts are at least once: if a flush fails, its views are put back and
+retried on the next flush.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Case, F, PositiveBigIntegerField, Value, When
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'post-views'
+
+
+def _cache_key(post_id):
+    return f'{CACHE_KEY_PREFIX}:{post_id}'
+
+
+def write_view_counts(counts):
+    """Add ``{post_id: views}`` to ``Post.view_count`` in one UPDATE."""
+    if not counts:
+        return 0
+    increment = Case(
+        *[When(pk=post_id, then=Value(views)) for post_id, views in counts.items()],
+        default=Value(0),
+        output_field=PositiveBigIntegerField(),
+    )
+    return Post.objects.filter(pk__in=list(counts)).update(view_count=F('view_count') + increment)
+
+
+class ViewCountBuffer:
+    """Aggregate post views and write them out in batches.
+
+    Args:
+        backend (str): ``'local'`` or ``'cache'``; defaults to
+            ``settings.VIEW_COUNT_BUFFER``.
+        flush_interval (float): seconds between flushes; defaults to
+            ``settings.VIEW_COUNT_FLUSH_INTERVAL``.
+        flush_threshold (int): pending views that trigger an early flush;
+            defaults to ``settings.VIEW_COUNT_FLUSH_THRESHOLD``.
+    """
+
+    def __init__(self, backend=None, flush_interval=None, flush_threshold=None):
+        self._backend = backend
+        self._flush_interval = flush_interval
+        self._flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Local backend: post_id -> pending views. Cache backend: the posts
+        # this worker has added views to, with the views it added.
+        self._pending = {}
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def backend(self):
+        return self._backend or getattr(settings, 'VIEW_COUNT_BUFFER', 'local')
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+
+    @property
+    def flush_threshold(self):
+        if self._flush_threshold is not None:
+            return self._flush_threshold
+        return getattr(settings, 'VIEW_COUNT_FLUSH_THRESHOLD', 1000)
+
+    def add(self, post_id, views=1):
+        """Record ``views`` views of ``post_id``.
+
+        Reaching the threshold wakes the flush thread; without one (in tests
+        and management commands) it flushes right away.
+        """
+        if self.backend == 'cache':
+            key = _cache_key(post_id)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, views)
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + views
+            self._pending_total += views
+            due = self._pending_total >= self.flush_threshold
+        if due:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def pending(self, post_ids):
+        """Return ``{post_id: views}`` not yet written to the database."""
+        post_ids = list(post_ids)
+        if self.backend == 'cache':
+            values = cache.get_many([_cache_key(post_id) for post_id in post_ids])
+            return {
+                post_id: values[_cache_key(post_id)]
+                for post_id in post_ids if values.get(_cache_key(post_id))
+            }
+        with self._lock:
+            return {post_id: self._pending[post_id] for post_id in post_ids if post_id in self._pending}
+
+    def apply_pending(self, posts):
+        """Add pending views to ``view_count`` on already loaded posts."""
+        posts = list(posts)
+        pending = self.pending(post.pk for post in posts)
+        for post in posts:
+            post.view_count += pending.get(post.pk, 0)
+        return posts
+
+    def flush(self):
+        """Write all pending views to the database.
+
+        Returns:
+            int: number of views written.
+        """
+        # Flushes are serialized so a slow one is not overlapped by the next;
+        # callers that find one running simply skip.
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                local, self._pending = self._pending, {}
+                self._pending_total = 0
+                self._last_flush = time.monotonic()
+            if self.backend == 'cache':
+                counts = self._take_from_cache(local)
+            else:
+                counts = local
+            try:
+                write_view_counts(counts)
+            except Exception:
+                logger.exception('Could not write %d post view counts, retrying later', len(counts))
+                self._restore(counts)
+                return 0
+            return sum(counts.values())
+        finally:
+            self._flush_lock.release()
+
+    def _take_from_cache(self, local):
+        values = cache.get_many([_cache_key(post_id) for post_id in local])
+        counts = {}
+        for post_id in local:
+            views = values.get(_cache_key(post_id))
+            if views:
+                # decr rather than delete, so views added by other workers
+                # since get_many are kept for the next flush.
+                cache.decr(_cache_key(post_id), views)
+                counts[post_id] = views
+        return counts
+
+    def _restore(self, counts):
+        for post_id, views in counts.items():
+            if self.backend == 'cache':
+                cache.add(_cache_key(post_id), 0, timeout=None)
+                cache.incr(_cache_key(post_id), views)
+        with self._lock:
+            for post_id, views in counts.items():
+                self._pending[post_id] = self._pending.get(post_id, 0) + views
+                self._pending_total += views
+
+    def start(self):
+        """Flush from a background thread from now on (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread without flushing."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                wait = self._last_flush + self.flush_interval - time.monotonic()
+            self._wake.wait(max(wait, 0))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not flush post view counts')
+            finally:
+                close_old_connections()
+
+    def reset(self):
+        with self._lock:
+            post_ids = list(self._pending)
+            self._pending = {}
+            self._pending_total = 0
+            self._last_flush = time.monotonic()
+        if self.backend == 'cache':
+            cache.delete_many([_cache_key(post_id) for post_id in post_ids])
+
+
+view_counter = ViewCountBuffer()
+
+
+def _flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception:
+        logger.exception('Could not write post view counts on exit')
+
+
+def register_exit_flush():
+    """Start the flush thread and flush pending views when the process exits.
+
+    Called from the WSGI/ASGI entry points rather than at import time, so
+    that management commands and the test runner never flush views into a
+    database they did not serve them from.
+    """
+    view_counter.start()
+    atexit.unregister(_flush_on_exit)
+    atexit.register(_flush_on_exit)
@@ -1,11 +1,17 @@
+from django.conf import settings
+from django.core.paginator import Page
 from django.shortcuts import redirect
 from django.contrib.auth.views import LoginView, LogoutView
 from django.views.generic import ListView, DetailView, TemplateView, CreateView
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.contrib.auth import login, logout
+from .caching import POST_STATS, POSTS, cached_or_stale
+from .comment_stream import live_comments_available
 from .models import Post, Comment
 from .forms import CommentForm, CustomAuthenticationForm, CustomUserCreationForm
+from .pagination import EstimatedCountPaginator
+from .view_counter import view_counter
 
 
 class PostListView(ListView):
@@ -13,9 +19,13 @@ class PostListView(ListView):
     template_name = 'webBlog/post_list.html'
     context_object_name = 'posts'
     ordering = ['-created_at']
+    paginator_class = EstimatedCountPaginator
+    
+    def get_paginate_by(self, queryset):
+        return settings.POSTS_PER_PAGE
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('author')
         sort_by = self.request.GET.get('sort', 'newest')
         
         if sort_by == 'oldest':
@@ -24,14 +34,45 @@ class PostListView(ListView):
             queryset = queryset.order_by('-updated_at')
         elif sort_by == 'updated_oldest':
             queryset = queryset.order_by('updated_at')
+        elif sort_by == 'trending':
+            queryset = queryset.trending()
+        elif sort_by == 'active':
+            queryset = queryset.recently_active()
         else:  # default to 'newest'
             queryset = queryset.order_by('-created_at')
             
         return queryset
     
+    def paginate_queryset(self, queryset, page_size):
+        # Pages are cached without their queryset (see cached_or_stale()), so
+        # an expired page is recomputed by one request while others get the
+        # previous one.
+        def compute():
+            paginator, page, posts, _ = super(PostListView, self).paginate_queryset(queryset, page_size)
+            return {
+                'count': paginator.count,
+                'count_is_estimated': paginator.count_is_estimated,
+                'number': page.number,
+                'posts': list(posts),
+            }
+
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        cached = cached_or_stale(
+            'post-list-page', [POSTS, POST_STATS], compute, self.request.GET.get('sort', 'newest'), page_number, page_size,
+        )
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        paginator.count = cached['count']
+        paginator.count_is_estimated = cached['count_is_estimated']
+        page = Page(cached['posts'], cached['number'], paginator)
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_sort'] = self.request.GET.get('sort', 'newest')
+        context['posts'] = view_counter.apply_pending(context['posts'])
         return context
 
 
@@ -40,15 +81,28 @@ class PostDetailView(DetailView):
     template_name = 'webBlog/post_detail.html'
     context_object_name = 'post'
     
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        view_counter.add(self.object.pk)
+        return response
+    
+    def get_object(self, queryset=None):
+        post = super().get_object(queryset)
+        view_counter.apply_pending([post])
+        return post
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Handle comment sorting
         comment_sort = self.request.GET.get('comment_sort', 'oldest')
-        comments = self.object.get_sorted_comments(comment_sort)
+        comments = self.object.get_sorted_comments(comment_sort).select_related('author')
             
         context['comments'] = comments
         context['current_comment_sort'] = comment_sort
+        # Where the live comment stream picks up.
+        context['last_comment_id'] = max((comment.pk for comment in comments), default=0)
+        context['live_comments'] = live_comments_available(self.request)
         
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()